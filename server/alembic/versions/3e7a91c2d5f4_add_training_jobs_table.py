@@ -0,0 +1,53 @@
+"""add_training_jobs_table
+
+Revision ID: 3e7a91c2d5f4
+Revises: c9e54939e25d
+Create Date: 2026-10-18 10:12:37.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a91c2d5f4'
+down_revision: Union[str, None] = 'c9e54939e25d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('training_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('job_type', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('dedup_key', sa.String(), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('progress', sa.JSON(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_training_jobs_id'), 'training_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_training_jobs_job_type'), 'training_jobs', ['job_type'], unique=False)
+    op.create_index(op.f('ix_training_jobs_status'), 'training_jobs', ['status'], unique=False)
+    op.create_index('ix_training_jobs_active_dedup_key', 'training_jobs', ['dedup_key'], unique=True, postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_training_jobs_active_dedup_key', table_name='training_jobs', postgresql_where=sa.text("status IN ('queued', 'running')"))
+    op.drop_index(op.f('ix_training_jobs_status'), table_name='training_jobs')
+    op.drop_index(op.f('ix_training_jobs_job_type'), table_name='training_jobs')
+    op.drop_index(op.f('ix_training_jobs_id'), table_name='training_jobs')
+    op.drop_table('training_jobs')
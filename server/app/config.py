@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, List
 
 class Settings(BaseSettings):
     #Project Settings
@@ -7,11 +7,51 @@ class Settings(BaseSettings):
     
     #Historical Data Path
     HISTORICAL_DATA_PATH: str = "data/filtered_csvs"
+    # Catalog of the datasets in HISTORICAL_DATA_PATH (symbol -> file, rows, date range, checksum),
+    # re-checked against the directory at most this often
+    SYMBOL_CATALOG_PATH: str = "data/symbol_catalog.json"
+    SYMBOL_CATALOG_REFRESH_SECONDS: int = 60
+    # Precomputed day x bar pattern tensors (memory-mapped .npy files, rebuilt when a CSV changes)
+    PATTERN_INDEX_PATH: str = "data/pattern_index"
+    # Shared store: binary columnar copy of each CSV (int64 epoch-ns dates + typed columns) plus a manifest,
+    # memory-mapped read-only by every worker and republished when a CSV changes (e.g. /dev/shm/stocker for RAM)
+    COLUMNAR_CACHE_PATH: str = "data/columnar_cache"
+    COLUMNAR_CACHE_ENABLED: bool = True
+    # Byte budget of the in-memory historical data cache (frames, day indexes, pyramids, derived columns);
+    # least recently used symbols are evicted beyond it
+    HISTORICAL_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
     # Defaults for Comparison API
     DEFAULT_COMPARISON_START_TIME: str = "09:15" 
     DEFAULT_COMPARISON_END_TIME: str = "09:45"   
     DEFAULT_COMPARISON_N_RESULTS: int = 5
     DEFAULT_COMPARISON_SIMILARITY_THRESHOLD: float = 0.90
+    # Worker processes used to fan a cross-symbol pattern search out over the library
+    COMPARISON_SEARCH_WORKERS: int = 4
+    # zeuclidean/dtw metrics: minimum share of a window's bars a day must have, and DTW band width
+    COMPARISON_MIN_BAR_COVERAGE: float = 0.5
+    COMPARISON_DTW_WINDOW_RATIO: float = 0.1
+    # Coarse-to-fine cosine search: pyramid block sizes (minutes) built at load, and the window
+    # length (bars) from which the coarse pruning pass is used
+    COMPARISON_PYRAMID_LEVELS: List[int] = [15, 30, 60]
+    COMPARISON_COARSE_MIN_BARS: int = 24
+    # Byte budget of the per-process cache of window block statistics used by the coarse pass
+    COMPARISON_WINDOW_UNITS_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    # Log per-request pruning statistics of the search engines (debugging; off in production)
+    COMPARISON_DEBUG_STATS: bool = False
+    # Optional approximate (LSH) pattern index: persisted next to the CSVs, rebuilt when they change
+    ANN_INDEX_PATH: str = "data/ann_index"
+    ANN_NUM_TABLES: int = 8
+    ANN_BITS_PER_TABLE: int = 10
+    ANN_DEFAULT_PROBE_RADIUS: int = 1 # Recall/latency knob: bit flips probed per table (0-2)
+    # Offline matrix profiles (motifs / unusual sessions), one file per symbol and window length in bars
+    MATRIX_PROFILE_PATH: str = "data/matrix_profile"
+    MATRIX_PROFILE_WINDOWS: List[int] = [6, 12, 24]
+    # All-pairs day x day similarity matrices per symbol and time window (compressed row blocks)
+    DAY_SIMILARITY_PATH: str = "data/day_similarity"
+    # Recorded query days for offline replay (query_source="fixture"); with recording on, every
+    # yfinance query day fetched is saved there
+    QUERY_FIXTURE_PATH: str = "data/query_fixtures"
+    QUERY_FIXTURE_RECORD: bool = False
 
 
     # Frontend URL
@@ -46,6 +86,35 @@ class Settings(BaseSettings):
     DEFAULT_LSTM_NUM_LAYERS: int = 3
     DEFAULT_PREDICTION_LR: float = 0.001
     DEFAULT_PREDICTION_TEST_SIZE: float = 0.1 
+    # Training loop: "tensor" keeps the sequences in one contiguous tensor and slices shuffled batches from
+    # it (used up to TRAINING_TENSOR_MAX_SEQUENCES sequences), "dataloader" batches through a torch DataLoader
+    TRAINING_ENGINE: str = "tensor"
+    TRAINING_TENSOR_MAX_SEQUENCES: int = 50000
+    TORCH_NUM_THREADS: int = 0 # Intra-op threads of training processes: job workers, refresh CLI (0: torch default)
+    # Early stopping: hold out the last DEFAULT_PREDICTION_TEST_SIZE of the sequences and stop after this
+    # many epochs without a better loss on them, keeping the best weights (0: off, train on every sequence)
+    TRAINING_EARLY_STOPPING_PATIENCE: int = 0
+    # Trained forecast models, reused until the market data has a day they have not seen (then refreshed,
+    # see below); one whose data is over MODEL_MAX_AGE_DAYS behind is retrained rather than fine-tuned
+    MODEL_REGISTRY_PATH: str = "data/model_registry"
+    MODEL_MAX_AGE_DAYS: int = 7
+    MODEL_REGISTRY_KEEP_VERSIONS: int = 3 # Per symbol and training config
+    # Background training/forecast jobs: worker processes, how long a running job may go without a
+    # progress update before it is marked failed, and the lock file that lets one server process recover jobs
+    TRAINING_JOB_WORKERS: int = 2
+    TRAINING_JOB_STALE_SECONDS: int = 900
+    TRAINING_JOB_LOCK_PATH: str = "data/training_jobs.lock"
+    # Refreshing a model on new days: fine-tune it on the new days (plus a replay sample of REPLAY_RATIO older
+    # sequences per new one) unless it has drifted - recent feature medians more than DRIFT_MAX_FEATURE_SHIFT
+    # interquartile ranges off, or loss on the last DRIFT_WINDOW_ROWS days above DRIFT_MAX_LOSS_RATIO x its
+    # training loss - or has been fine-tuned FINE_TUNE_MAX_CHAIN times; then it is retrained from scratch
+    FINE_TUNE_EPOCHS: int = 5
+    FINE_TUNE_LR: float = 0.0005
+    FINE_TUNE_REPLAY_RATIO: float = 4.0
+    FINE_TUNE_MAX_CHAIN: int = 20
+    DRIFT_WINDOW_ROWS: int = 20
+    DRIFT_MAX_FEATURE_SHIFT: float = 1.5
+    DRIFT_MAX_LOSS_RATIO: float = 1.5
    
     model_config = SettingsConfigDict(env_file=".env", extra="ignore") 
 
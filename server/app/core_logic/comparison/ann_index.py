@@ -0,0 +1,208 @@
+# backend/app/core_logic/comparison/ann_index.py
+import hashlib
+import itertools
+import json
+import threading
+import numpy as np
+from datetime import time as dt_time, date as dt_date
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+from ...config import settings
+from . import pattern_index
+from .shared_store import atomic_write
+
+# Loaded indexes for this process, keyed by the same key as the file name
+_ann_cache: Dict[str, "PatternANNIndex"] = {}
+_ann_cache_lock = threading.Lock() # Searches run on threadpool threads
+
+
+class PatternANNIndex:
+    """
+    Random-projection LSH over the normalized OHLC window vectors of a set of symbols for one time window.
+
+    Each of `num_tables` tables hashes a (mean-centered) vector to `bits` sign bits. A query looks up its
+    own bucket plus every bucket within `probe_radius` bit flips in each table; the union of those days is
+    then rescored exactly, so returned scores and the similarity threshold mean the same as in the exact engine.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        self.vectors = arrays["vectors"] # (n, bars * 4) normalized windows, used for exact rescoring
+        self.symbol_ids = arrays["symbol_ids"]
+        self.dates = arrays["dates"] # datetime64[D]
+        self.center = arrays["center"]
+        self.hyperplanes = arrays["hyperplanes"] # (tables, bits, dim)
+        self.sorted_codes = arrays["sorted_codes"] # (tables, n)
+        self.code_order = arrays["code_order"] # (tables, n)
+        self.meta = meta
+        self.symbols: List[str] = meta["symbols"]
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def candidates(self, query_pattern: np.ndarray, probe_radius: int = 1) -> np.ndarray:
+        """Positions of every stored day sharing a bucket (up to probe_radius flipped bits) with the query."""
+        num_bits = self.hyperplanes.shape[1]
+        flip_masks = [0]
+        for radius in range(1, probe_radius + 1):
+            flip_masks += [sum(1 << bit for bit in bits) for bits in itertools.combinations(range(num_bits), radius)]
+        flip_masks = np.array(flip_masks, dtype=np.int64)
+
+        query_codes = _bucket_codes(self.hyperplanes, self.center, query_pattern[None, :])[:, 0]
+        found = []
+        for table, query_code in enumerate(query_codes):
+            probe_codes = query_code ^ flip_masks
+            starts = np.searchsorted(self.sorted_codes[table], probe_codes, side="left")
+            ends = np.searchsorted(self.sorted_codes[table], probe_codes, side="right")
+            for start, end in zip(starts, ends):
+                if end > start:
+                    found.append(self.code_order[table, start:end])
+        if not found:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(
+        self,
+        query_pattern: np.ndarray,
+        similarity_threshold: float,
+        num_results: int,
+        exclude_date: Optional[dt_date] = None,
+        probe_radius: int = 1
+    ) -> List[Tuple[str, dt_date, float]]:
+        """Approximate top-k (symbol, date, exact cosine score) above the threshold, best first."""
+        # Imported here: pattern_matcher imports this module
+        from .pattern_matcher import _cosine_similarity_batch, _select_top_k
+
+        candidate_positions = self.candidates(query_pattern, probe_radius=probe_radius)
+        if exclude_date is not None and len(candidate_positions):
+            candidate_positions = candidate_positions[self.dates[candidate_positions] != np.datetime64(exclude_date, "D")]
+        scores = _cosine_similarity_batch(self.vectors[candidate_positions], query_pattern)
+        top = _select_top_k(scores, similarity_threshold, num_results)
+        return [
+            (self.symbols[self.symbol_ids[candidate_positions[i]]], self.dates[candidate_positions[i]].item(), float(scores[i]))
+            for i in top
+        ]
+
+
+def _bucket_codes(hyperplanes: np.ndarray, center: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """(tables, n) integer bucket codes: one sign bit per hyperplane of the mean-centered vectors."""
+    projections = np.einsum("tbd,nd->tnb", hyperplanes, vectors - center)
+    bit_weights = 1 << np.arange(hyperplanes.shape[1], dtype=np.int64)
+    return (projections > 0).astype(np.int64) @ bit_weights
+
+
+def _index_key(symbols: List[str], start_time: dt_time, end_time: dt_time, pattern_length: int, num_tables: int, bits: int) -> str:
+    raw = f"{','.join(symbols)}|{start_time.strftime('%H:%M')}|{end_time.strftime('%H:%M')}|{pattern_length}|{num_tables}|{bits}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _index_path(key: str) -> Path:
+    return Path(".") / settings.ANN_INDEX_PATH / f"{key}.npz"
+
+
+def _source_signatures(symbols: List[str]) -> Dict[str, list]:
+    """(mtime, size) of every symbol's pattern index source, to detect a stale ANN index."""
+    signatures = {}
+    for symbol in symbols:
+        index = pattern_index.get_pattern_index(symbol)
+        if index is not None:
+            signatures[symbol] = [index.meta["source_mtime_ns"], index.meta["source_size"]]
+    return signatures
+
+
+def build_ann_index(
+    symbols: List[str],
+    start_time: dt_time,
+    end_time: dt_time,
+    pattern_length: int,
+    num_tables: int = None,
+    bits: int = None,
+    seed: int = 42
+) -> Optional[PatternANNIndex]:
+    """Builds and persists the LSH index for a symbol set and time window (days with exactly pattern_length bars)."""
+    # Imported here: pattern_matcher imports this module
+    from .pattern_matcher import day_window_vectors
+
+    symbols = sorted(s.upper() for s in symbols)
+    num_tables = num_tables or settings.ANN_NUM_TABLES
+    bits = bits or settings.ANN_BITS_PER_TABLE
+
+    vector_blocks, symbol_id_blocks, date_blocks = [], [], []
+    for symbol_id, symbol in enumerate(symbols):
+        day_dates, vectors = day_window_vectors(symbol, start_time, end_time, pattern_length)
+        if not day_dates:
+            continue
+        vector_blocks.append(vectors)
+        symbol_id_blocks.append(np.full(len(day_dates), symbol_id, dtype=np.int32))
+        date_blocks.append(np.array(day_dates, dtype="datetime64[D]"))
+    if not vector_blocks:
+        return None
+
+    vectors = np.concatenate(vector_blocks)
+    # Days with NaN bars can never pass the threshold in the exact engine, so they are left out here too
+    finite = np.isfinite(vectors).all(axis=1)
+    vectors = vectors[finite]
+    rng = np.random.default_rng(seed)
+    arrays = {
+        "vectors": vectors,
+        "symbol_ids": np.concatenate(symbol_id_blocks)[finite],
+        "dates": np.concatenate(date_blocks)[finite],
+        "center": vectors.mean(axis=0),
+        "hyperplanes": rng.standard_normal((num_tables, bits, vectors.shape[1])),
+    }
+    codes = _bucket_codes(arrays["hyperplanes"], arrays["center"], vectors)
+    arrays["code_order"] = np.argsort(codes, axis=1, kind="stable")
+    arrays["sorted_codes"] = np.take_along_axis(codes, arrays["code_order"], axis=1)
+
+    meta = {
+        "symbols": symbols,
+        "start_time": start_time.strftime("%H:%M"),
+        "end_time": end_time.strftime("%H:%M"),
+        "pattern_length": pattern_length,
+        "num_tables": num_tables,
+        "bits": bits,
+        "sources": _source_signatures(symbols),
+    }
+    key = _index_key(symbols, start_time, end_time, pattern_length, num_tables, bits)
+    path = _index_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as tmp_path, open(tmp_path, "wb") as f:
+        np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    print(f"Built ANN index {key} for {len(symbols)} symbols, window {meta['start_time']}-{meta['end_time']}: {len(vectors)} days.")
+    index = PatternANNIndex(arrays, meta)
+    with _ann_cache_lock:
+        _ann_cache[key] = index
+    return index
+
+
+def get_ann_index(
+    symbols: List[str],
+    start_time: dt_time,
+    end_time: dt_time,
+    pattern_length: int
+) -> Optional[PatternANNIndex]:
+    """Returns the persisted LSH index for this symbol set and window, building it if missing or stale."""
+    symbols = sorted(s.upper() for s in symbols)
+    key = _index_key(symbols, start_time, end_time, pattern_length, settings.ANN_NUM_TABLES, settings.ANN_BITS_PER_TABLE)
+    with _ann_cache_lock:
+        index = _ann_cache.get(key)
+    if index is None and _index_path(key).exists():
+        try:
+            with np.load(_index_path(key)) as stored:
+                arrays = {name: stored[name] for name in stored.files if name != "meta"}
+                meta = json.loads(str(stored["meta"]))
+            index = PatternANNIndex(arrays, meta)
+            with _ann_cache_lock:
+                _ann_cache[key] = index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load ANN index {key}: {e}")
+            index = None
+    if index is not None and index.meta.get("sources") == _source_signatures(symbols):
+        return index
+    return build_ann_index(symbols, start_time, end_time, pattern_length)
+
+
+def clear_ann_cache():
+    """Drops the in-process ANN indexes (files on disk are kept)."""
+    with _ann_cache_lock:
+        _ann_cache.clear()
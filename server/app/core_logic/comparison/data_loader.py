@@ -1,75 +1,540 @@
 # backend/app/core_logic/comparison/data_loader.py
 import pandas as pd
+import numpy as np
 import os
+import threading
+import datetime as dt
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple, Callable, Any
 from ...config import settings
+from . import shared_store, symbol_catalog
 
-# Simple in-memory cache for DataFrames
-_df_cache: Dict[str, pd.DataFrame] = {}
+PYRAMID_COLUMNS = ["open", "high", "low", "close"]
+MINUTES_PER_DAY = 1440
 
-def load_historical_data(stock_symbol: str) -> Optional[pd.DataFrame]:
+
+class DayRowIndex:
     """
-    Loads historical intraday data for a given stock symbol from a CSV file.
-    Implements a simple in-memory cache.
-    Assumes CSV filenames match the stock symbol (e.g., AAPL.csv or needs a mapping).
+    Sorted trading day -> [start_row, end_row) positions in a date-sorted historical DataFrame,
+    so per-day access is a positional slice instead of a full-frame scan.
     """
-    stock_symbol_upper = stock_symbol.upper()
 
-    if stock_symbol_upper in _df_cache:
-        # print(f"Loading {stock_symbol_upper} from cache.")
-        return _df_cache[stock_symbol_upper].copy() # Return a copy to prevent modification of cached df
-
-    # Construct filename - this part needs to be robust based on your CSV naming
-    # Option 1: Direct match (e.g., AAPL.csv)
-    # filename = f"{stock_symbol_upper}.csv"
-    # Option 2: Handling your specific filename "HEROMOTOCO_with_indicators_.csv"
-    # This needs a more generic way if you have many stocks
-    if stock_symbol_upper == "HEROMOTOCO": # Temporary specific handling
-        filename = "HEROMOTOCO_with_indicators_.csv"
-    else:
-        # Generic fallback, assuming STOCK_SYMBOL.csv - this will likely fail for other stocks
-        # TODO: Implement a robust way to map symbol to filename or standardize filenames
-        filename = f"filtered_{stock_symbol_upper}_with_indicators_.csv"
-        print(f"Warning: Using generic filename {filename} for {stock_symbol_upper}. Ensure this file exists or update mapping.")
-
-
-    # Get the absolute path to the backend directory
-    # This assumes the script/app is run from a context where `Path(__file__).resolve().parents[X]` makes sense
-    # For FastAPI, it's usually relative to where Uvicorn is started.
-    # settings.HISTORICAL_DATA_PATH is relative to the backend project root.
-    
-    # Assuming backend root is where .env is, and uvicorn runs from there
-    base_path = Path(".") # Current working directory (where uvicorn is run, typically 'backend/')
-    file_path = base_path / settings.HISTORICAL_DATA_PATH / filename
-    
-    # Alternative if HISTORICAL_DATA_PATH is absolute or needs more robust pathing
-    # project_root = Path(__file__).resolve().parents[3] # Adjust based on file location
-    # file_path = project_root / settings.HISTORICAL_DATA_PATH / filename
+    def __init__(self, dates: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        self.dates = dates # datetime.date objects, ascending
+        self.starts = starts
+        self.ends = ends
+        self.day_numbers = np.array(dates, dtype="datetime64[D]").astype(np.int64) # Days since the epoch
+        self._positions: Dict[dt.date, int] = {day: i for i, day in enumerate(dates)}
 
-    print(f"Attempting to load historical data from: {file_path.resolve()}")
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DayRowIndex":
+        """Builds the index from a DataFrame sorted by its 'date' column."""
+        if df.empty:
+            empty = np.array([], dtype=np.int64)
+            return cls(np.array([], dtype=object), empty, empty)
+        timestamps = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else pd.to_datetime(df["date"])
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_localize(None) # Local wall-clock time, as .dt.date would use
+        day_values = timestamps.to_numpy().astype("datetime64[D]")
+        # Rows of a day are contiguous, so a new day starts wherever the date changes
+        boundaries = np.flatnonzero(day_values[1:] != day_values[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)).astype(np.int64)
+        ends = np.concatenate((boundaries, [len(day_values)])).astype(np.int64)
+        return cls(day_values[starts].astype(object), starts, ends)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __contains__(self, day: dt.date) -> bool:
+        return day in self._positions
+
+    def position(self, day: dt.date) -> Optional[int]:
+        """Ordinal of a day in `dates`, or None if the day is not in the data."""
+        return self._positions.get(day)
+
+    def row_range(self, day: dt.date) -> Optional[Tuple[int, int]]:
+        """Half-open (start_row, end_row) of a day, or None if the day is not in the data."""
+        position = self.position(day)
+        if position is None:
+            return None
+        return int(self.starts[position]), int(self.ends[position])
+
+    def window_ranges(self, day_minute: np.ndarray, first_minute: int, last_minute: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Per-day half-open (start_row, end_row) of the bars with first_minute <= minute of day <= last_minute,
+        found by binary search in the frame's ascending 'day_minute' key (see DERIVED_COLUMNS) instead of
+        a full-frame mask. Days without such bars get start_row == end_row.
+        """
+        day_base = self.day_numbers * MINUTES_PER_DAY
+        starts = np.searchsorted(day_minute, day_base + first_minute, side="left")
+        ends = np.searchsorted(day_minute, day_base + last_minute, side="right")
+        return starts, np.maximum(ends, starts)
+
+    def day_slice(self, df: pd.DataFrame, day: dt.date) -> pd.DataFrame:
+        """Rows of `day` from the DataFrame this index was built for (empty if the day is missing)."""
+        rows = self.row_range(day)
+        if rows is None:
+            return df.iloc[0:0]
+        return df.iloc[rows[0]:rows[1]]
+
+
+class PyramidLevel:
+    """
+    Per-day statistics of the OHLC columns over fixed clock blocks of `minutes` (block k covers
+    minutes-of-day [k * minutes, (k + 1) * minutes)), as dense (days, blocks[, 4]) arrays:
+    bar count, mean, sum of squared deviations from the mean (m2), min and max.
+    Empty blocks have count 0, mean/m2 0, min +inf and max -inf.
+    """
+
+    def __init__(self, minutes: int, first_block: int, count: np.ndarray, mean: np.ndarray, m2: np.ndarray, minimum: np.ndarray, maximum: np.ndarray):
+        self.minutes = minutes
+        self.first_block = first_block
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @property
+    def num_blocks(self) -> int:
+        return self.count.shape[1]
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        day_row_index: DayRowIndex,
+        minute_of_day: np.ndarray,
+        minutes: int,
+        block_range: Optional[Tuple[int, int]] = None
+    ) -> Optional["PyramidLevel"]:
+        """
+        Builds the level from a date-sorted DataFrame (rows of a block are contiguous).
+        block_range = (first_block, num_blocks) fixes the block axis; None if a bar falls outside it.
+        """
+        blocks = minute_of_day // minutes
+        day_ids = np.repeat(np.arange(len(day_row_index)), day_row_index.ends - day_row_index.starts)
+        if block_range is None:
+            first_block, num_blocks = int(blocks.min()), int(blocks.max() - blocks.min() + 1)
+        else:
+            first_block, num_blocks = block_range
+            if blocks.min() < first_block or blocks.max() >= first_block + num_blocks:
+                return None
+        keys = day_ids * num_blocks + (blocks - first_block)
+
+        # One segment per (day, block) that has bars; reduceat works on segment starts
+        segment_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        segment_keys = keys[segment_starts]
+        counts = np.diff(np.concatenate((segment_starts, [len(keys)])))
+        values = df[PYRAMID_COLUMNS].to_numpy(dtype=np.float64)
+        means = np.add.reduceat(values, segment_starts, axis=0) / counts[:, None]
+        deviations = values - np.repeat(means, counts, axis=0)
+        m2 = np.add.reduceat(deviations ** 2, segment_starts, axis=0)
+
+        shape = (len(day_row_index), num_blocks)
+        dense_count = np.zeros(shape, dtype=np.int32)
+        dense_mean, dense_m2 = np.zeros(shape + (4,)), np.zeros(shape + (4,))
+        dense_min, dense_max = np.full(shape + (4,), np.inf), np.full(shape + (4,), -np.inf)
+        day_positions, block_positions = np.divmod(segment_keys, num_blocks)
+        dense_count[day_positions, block_positions] = counts
+        dense_mean[day_positions, block_positions] = means
+        dense_m2[day_positions, block_positions] = m2
+        dense_min[day_positions, block_positions] = np.minimum.reduceat(values, segment_starts, axis=0)
+        dense_max[day_positions, block_positions] = np.maximum.reduceat(values, segment_starts, axis=0)
+        return cls(minutes, first_block, dense_count, dense_mean, dense_m2, dense_min, dense_max)
+
+
+class ResolutionPyramid:
+    """Coarse views of a symbol's 5-minute history, one PyramidLevel per block size, on the DayRowIndex day axis."""
+
+    def __init__(self, dates: np.ndarray, levels: Dict[int, PyramidLevel]):
+        self.dates = dates
+        self.day_dates = np.array(dates, dtype="datetime64[D]")
+        self.levels = levels
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for level in self.levels.values() for a in (level.count, level.mean, level.m2, level.minimum, level.maximum))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, day_row_index: DayRowIndex, level_minutes: List[int], minute_of_day: Optional[np.ndarray] = None) -> "ResolutionPyramid":
+        if df.empty:
+            return cls(day_row_index.dates, {})
+        if minute_of_day is None:
+            minute_of_day = _minute_of_day(df)
+        minute_of_day = minute_of_day.astype(np.int64) # Block keys below are day * blocks + block
+        return cls(day_row_index.dates, {minutes: PyramidLevel.from_frame(df, day_row_index, minute_of_day, minutes) for minutes in level_minutes})
+
+    def extended(self, df: pd.DataFrame, day_row_index: DayRowIndex, minute_of_day: np.ndarray, from_day: int) -> Optional["ResolutionPyramid"]:
+        """
+        The pyramid of a longer (appended) history whose days before `from_day` are unchanged: only the
+        rows from that day on are aggregated. None if new bars fall outside the existing blocks.
+        """
+        first_row = int(day_row_index.starts[from_day])
+        tail_index = DayRowIndex(day_row_index.dates[from_day:], day_row_index.starts[from_day:] - first_row, day_row_index.ends[from_day:] - first_row)
+        tail_minutes = minute_of_day[first_row:].astype(np.int64)
+        levels = {}
+        for minutes, level in self.levels.items():
+            tail = PyramidLevel.from_frame(df.iloc[first_row:], tail_index, tail_minutes, minutes, block_range=(level.first_block, level.num_blocks))
+            if tail is None:
+                return None
+            stats = [np.concatenate((old[:from_day], new)) for old, new in zip(
+                (level.count, level.mean, level.m2, level.minimum, level.maximum),
+                (tail.count, tail.mean, tail.m2, tail.minimum, tail.maximum)
+            )]
+            levels[minutes] = PyramidLevel(minutes, level.first_block, *stats)
+        return ResolutionPyramid(day_row_index.dates, levels)
+
+
+def _minute_of_day(df: pd.DataFrame) -> np.ndarray:
+    timestamps = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else pd.to_datetime(df["date"])
+    return (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy(dtype=np.int16)
+
+def _day_minute(df: pd.DataFrame) -> np.ndarray:
+    timestamps = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else pd.to_datetime(df["date"])
+    local_timestamps = timestamps.dt.tz_localize(None) if timestamps.dt.tz is not None else timestamps
+    day_numbers = local_timestamps.to_numpy().astype("datetime64[D]").astype(np.int32)
+    return day_numbers * np.int32(MINUTES_PER_DAY) + _minute_of_day(df)
+
+def minute_bounds(start_time: dt.time, end_time: dt.time) -> Tuple[int, int]:
+    """Inclusive minute-of-day bounds equivalent to start_time <= time <= end_time for bars on whole minutes."""
+    first_minute = start_time.hour * 60 + start_time.minute + (1 if start_time.second or start_time.microsecond else 0)
+    return first_minute, end_time.hour * 60 + end_time.minute
+
+# Per-row columns computed once per cached symbol (get_derived_column), instead of on every request
+DERIVED_COLUMNS: Dict[str, Callable[[pd.DataFrame], np.ndarray]] = {
+    "minute_of_day": _minute_of_day, # int16 minutes since midnight (local wall clock)
+    "day_minute": _day_minute, # int32 local day number * 1440 + minute of day, ascending: time windows are binary searches
+}
+
+
+def _read_only(values: np.ndarray) -> np.ndarray:
+    if values.flags.writeable:
+        values = values.copy() # Never freeze an array someone else may still write through
+        values.flags.writeable = False
+    return values
+
+def _read_only_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rebuilds a frame on read-only column arrays (memory-mapped columns are used as they are), so any
+    in-place write into the shared cached data raises instead of leaking into other requests.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name].array
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            # Datetime (incl. tz-aware) columns: the naive datetime64 values as a read-only array, viewed back with the column's dtype
+            naive = np.asarray(values.view(f"M8[{values.unit}]"))
+            values = pd.array(_read_only(naive), copy=False).view(values.dtype)
+        else:
+            values = _read_only(df[name].to_numpy())
+        columns[name] = pd.Series(values, index=df.index, name=name, copy=False)
+    return pd.DataFrame(columns, copy=False)
+
+
+class CachedHistory:
+    """A symbol's loaded history plus everything derived from it, shared read-only by every request."""
+
+    def __init__(self, frame: pd.DataFrame, day_row_index: DayRowIndex, source_sha1: Optional[str] = None):
+        self.frame = frame
+        self.day_row_index = day_row_index
+        self.source_sha1 = source_sha1 # Checksum of the CSV it was read from, compared against the symbol catalog
+        self.pyramid: Optional[ResolutionPyramid] = None # Built on first use
+        self.derived: Dict[str, np.ndarray] = {}
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate footprint: column arrays (memory-mapped ones at full size), indexes and derived arrays.
+        Object arrays are counted by pointer; the date/time objects they point to are few and shared.
+        """
+        total = int(self.frame.memory_usage(index=True, deep=False).sum())
+        total += self.day_row_index.dates.nbytes + self.day_row_index.starts.nbytes + self.day_row_index.ends.nbytes
+        total += sum(values.nbytes for values in self.derived.values())
+        if self.pyramid is not None:
+            total += self.pyramid.nbytes
+        return total
+
+
+class HistoricalDataCache:
+    """
+    Symbol -> CachedHistory under a byte budget (HISTORICAL_CACHE_MAX_BYTES), least recently used
+    symbol evicted first. The symbol just loaded is always kept, even when it alone exceeds the budget.
+    Hits and misses count frame loads (get_historical_frame), not the accessors reading the same entry.
+    Safe to share between the threadpool threads requests run on.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CachedHistory]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._entries
+
+    def peek(self, symbol: str) -> Optional[CachedHistory]:
+        """The symbol's entry without counting a lookup or refreshing its recency."""
+        return self._entries.get(symbol)
+
+    def get(self, symbol: str, source_sha1: Optional[str] = None, count: bool = True) -> Optional[CachedHistory]:
+        """
+        The symbol's entry, or None (a miss). With source_sha1, an entry read from other CSV content is dropped.
+        count=False leaves the hit/miss counters alone.
+        """
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and source_sha1 is not None and entry.source_sha1 not in (None, source_sha1):
+                self.remove(symbol)
+                entry = None
+            if entry is None:
+                self.misses += count
+                return None
+            self.hits += count
+            self._entries.move_to_end(symbol)
+            return entry
+
+    def put(self, symbol: str, entry: CachedHistory):
+        with self._lock:
+            self._entries[symbol] = entry
+            self._entries.move_to_end(symbol)
+            self.resize(symbol)
+
+    def resize(self, symbol: str):
+        """Re-measures an entry after something was added to it, then evicts down to the budget."""
+        with self._lock:
+            if symbol not in self._entries: # Evicted or removed by another thread meanwhile
+                return
+            self._sizes[symbol] = self._entries[symbol].nbytes
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted = next(iter(self._entries))
+                if evicted == symbol:
+                    break
+                del self._entries[evicted]
+                freed = self._sizes.pop(evicted)
+                self.evictions += 1
+                print(f"Historical data cache: evicted {evicted} ({freed / 1e6:.1f} MB), {self.total_bytes / 1e6:.1f} MB in use.")
+
+    def remove(self, symbol: str):
+        with self._lock:
+            self._entries.pop(symbol, None)
+            self._sizes.pop(symbol, None)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
 
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "symbols": list(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+
+_history_cache = HistoricalDataCache(settings.HISTORICAL_CACHE_MAX_BYTES)
+
+
+def resolve_data_file(stock_symbol: str) -> Path:
+    """
+    Maps a stock symbol to its historical CSV path from the symbol catalog. Symbols that are not in
+    the catalog get the conventional filtered_{SYMBOL}_with_indicators_.csv path (which does not exist).
+    """
+    stock_symbol_upper = stock_symbol.upper()
+    catalog_path = symbol_catalog.get_catalog().path(stock_symbol_upper)
+    if catalog_path is not None:
+        return catalog_path
+    # settings.HISTORICAL_DATA_PATH is relative to the backend project root (where uvicorn is run, typically 'backend/')
+    return Path(".") / settings.HISTORICAL_DATA_PATH / f"filtered_{stock_symbol_upper}_with_indicators_.csv"
+
+def source_signature(stock_symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    (mtime, size, sha1) of a symbol's historical CSV, stored with artifacts derived from it so a
+    re-conversion or an appended ingest shows them to be stale. None if the symbol has no CSV.
+    """
+    file_path = resolve_data_file(stock_symbol)
+    if not file_path.exists():
+        return None
+    stat = file_path.stat()
+    return {"source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size, "source_sha1": shared_store.file_digest(file_path)}
+
+def source_is_current(stock_symbol: str, meta: Dict[str, Any]) -> bool:
+    """
+    Whether an artifact's stored source signature (see source_signature) still describes the symbol's CSV.
+    The mtime/size check is free; when only the mtime changed (file touched or copied), the content hash
+    decides, and `meta` takes the new mtime so the file is hashed only once.
+    """
+    file_path = resolve_data_file(stock_symbol)
     if not file_path.exists():
-        print(f"Historical data file not found: {file_path}")
+        return False
+    stat = file_path.stat()
+    if stat.st_size != meta.get("source_size"):
+        return False
+    if stat.st_mtime_ns != meta.get("source_mtime_ns"):
+        if meta.get("source_sha1") is None or shared_store.file_digest(file_path) != meta["source_sha1"]:
+            return False
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+    return True
+
+def list_available_symbols() -> List[str]:
+    """Symbols that have a historical CSV under HISTORICAL_DATA_PATH (from the symbol catalog)."""
+    return symbol_catalog.get_catalog().symbols()
+
+def _extend_history(previous: CachedHistory, entry: CachedHistory, previous_rows: int):
+    """Carries the derived data of a cached version over to its appended successor, computing it for the new rows only."""
+    tail = entry.frame.iloc[previous_rows:]
+    for name, values in previous.derived.items():
+        if name not in entry.derived:
+            extended = np.concatenate((values, DERIVED_COLUMNS[name](tail)))
+            extended.flags.writeable = False
+            entry.derived[name] = extended
+    if previous.pyramid is not None and len(tail):
+        from_day = int(np.searchsorted(entry.day_row_index.starts, previous_rows, side="right")) - 1 # First day with new bars
+        entry.pyramid = previous.pyramid.extended(entry.frame, entry.day_row_index, entry.derived["minute_of_day"], from_day)
+    elif previous.pyramid is not None:
+        entry.pyramid = previous.pyramid
+
+def _load_history(stock_symbol_upper: str, count_lookup: bool = False) -> Optional[CachedHistory]:
+    """
+    Cache lookup, attaching to the shared store (or reading the CSV) on a miss. None if there is no data file.
+    count_lookup: a request-level load (get_historical_frame), counted in the cache's hit rate; the other
+    accessors re-read the same entry several times per request and would inflate it.
+    """
+    catalog_entry = symbol_catalog.get_catalog().get(stock_symbol_upper)
+    if catalog_entry is None:
+        _history_cache.remove(stock_symbol_upper) # The CSV may have been removed since it was cached
+        print(f"Historical data file not found for {stock_symbol_upper} (not in the symbol catalog).")
         return None
+    previous = _history_cache.peek(stock_symbol_upper)
+    entry = _history_cache.get(stock_symbol_upper, source_sha1=catalog_entry["sha1"], count=count_lookup) # Reloaded if the CSV changed
+    if entry is not None:
+        return entry
+
+    file_path = Path(catalog_entry["path"])
+    filename = file_path.name
+
+    print(f"Attempting to load historical data from: {file_path.resolve()}")
 
     try:
-        df = pd.read_csv(file_path, parse_dates=["date"]) # Assuming 'date' column needs parsing
-        df["date"] = pd.to_datetime(df["date"])  # Ensure datetime format
-        
-        # Basic preprocessing often needed:
-        df.sort_values(by="date", inplace=True)
-        df.drop_duplicates(subset=["date"], keep="first", inplace=True) # Ensure unique timestamps
-        
-        _df_cache[stock_symbol_upper] = df.copy() # Cache it
-        print(f"Loaded and cached {stock_symbol_upper} from {filename}. Shape: {df.shape}")
-        return df.copy()
+        df, shared = None, None
+        if settings.COLUMNAR_CACHE_ENABLED:
+            # Memory-mapped arrays shared with every other worker (published on first use)
+            shared, df = shared_store.attach_or_publish(stock_symbol_upper, file_path)
+
+        if shared is not None:
+            df = shared.frame()
+            day_row_index = DayRowIndex(shared.day_dates.astype(object), shared.day_starts, shared.day_ends)
+            entry = CachedHistory(df, day_row_index, source_sha1=shared.meta["source_sha1"])
+            entry.derived["minute_of_day"] = shared.minute_of_day
+            previous_rows = shared.prefix_rows(previous.source_sha1) if previous is not None else None
+            if previous_rows is not None: # Only bars were appended since the cached version
+                _extend_history(previous, entry, previous_rows)
+                print(f"{stock_symbol_upper}: extending the cached derived data by {len(df) - previous_rows} appended rows.")
+        else:
+            df = _read_only_frame(df if df is not None else shared_store.read_source_csv(file_path))
+            entry = CachedHistory(df, DayRowIndex.from_frame(df), source_sha1=catalog_entry["sha1"])
+        _history_cache.put(stock_symbol_upper, entry)
+        print(f"Loaded and cached {stock_symbol_upper} from {filename}{' (shared store)' if shared is not None else ''}. Shape: {df.shape}")
+        return entry
     except Exception as e:
         print(f"Error loading historical data for {stock_symbol_upper} from {file_path}: {e}")
         return None
 
+def get_historical_frame(stock_symbol: str) -> Optional[pd.DataFrame]:
+    """
+    The cached historical DataFrame itself (no copy), shared by every caller: its arrays are read-only,
+    so use .copy() before modifying it, and do not add columns to it (see get_derived_column).
+    """
+    entry = _load_history(stock_symbol.upper(), count_lookup=True)
+    return entry.frame if entry is not None else None
+
+def load_historical_data(stock_symbol: str) -> Optional[pd.DataFrame]:
+    """
+    Loads historical intraday data for a given stock symbol from the CSV the symbol catalog maps it to
+    (see symbol_catalog). Returns a private, writable copy of the cached frame; read-only callers
+    should use get_historical_frame.
+    """
+    df = get_historical_frame(stock_symbol)
+    return df.copy() if df is not None else None
+
+def get_derived_column(stock_symbol: str, name: str) -> Optional[np.ndarray]:
+    """
+    A per-row column derived from the symbol's cached frame (see DERIVED_COLUMNS), computed on first
+    use and kept (read-only) with the frame. Rows line up with get_historical_frame.
+    """
+    stock_symbol_upper = stock_symbol.upper()
+    entry = _load_history(stock_symbol_upper)
+    if entry is None:
+        return None
+    if name not in entry.derived:
+        if name not in DERIVED_COLUMNS:
+            raise ValueError(f"Unknown derived column '{name}'. Available: {sorted(DERIVED_COLUMNS)}.")
+        values = DERIVED_COLUMNS[name](entry.frame)
+        values.flags.writeable = False
+        entry.derived[name] = values
+        if stock_symbol_upper in _history_cache:
+            _history_cache.resize(stock_symbol_upper)
+    return entry.derived[name]
+
+def get_day_row_index(stock_symbol: str) -> Optional[DayRowIndex]:
+    """
+    Returns the day -> row-range index for a symbol's historical data, loading the data if needed.
+    Row positions refer to the DataFrame returned by load_historical_data / get_historical_frame.
+    """
+    entry = _load_history(stock_symbol.upper())
+    return entry.day_row_index if entry is not None else None
+
+def get_time_window_ranges(stock_symbol: str, start_time: dt.time, end_time: dt.time) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Per-day [start_row, end_row) of the symbol's bars inside the time window, aligned with
+    get_day_row_index(...).dates (see DayRowIndex.window_ranges). None if there is no data.
+    """
+    stock_symbol_upper = stock_symbol.upper()
+    entry = _load_history(stock_symbol_upper)
+    if entry is None:
+        return None
+    day_minute = get_derived_column(stock_symbol_upper, "day_minute")
+    return entry.day_row_index.window_ranges(day_minute, *minute_bounds(start_time, end_time))
+
+def get_resolution_pyramid(stock_symbol: str) -> Optional[ResolutionPyramid]:
+    """
+    Returns the 15m/30m/60m (see COMPARISON_PYRAMID_LEVELS) pyramid of a symbol, loading the data if needed.
+    Built on first use rather than inside load_historical_data, so plain loads stay cheap.
+    """
+    stock_symbol_upper = stock_symbol.upper()
+    entry = _load_history(stock_symbol_upper)
+    if entry is None:
+        return None
+    if entry.pyramid is None:
+        entry.pyramid = ResolutionPyramid.from_frame(
+            entry.frame, entry.day_row_index, settings.COMPARISON_PYRAMID_LEVELS,
+            minute_of_day=get_derived_column(stock_symbol_upper, "minute_of_day")
+        )
+        if stock_symbol_upper in _history_cache:
+            _history_cache.resize(stock_symbol_upper)
+    return entry.pyramid
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and current size of the in-memory historical data cache."""
+    return _history_cache.stats()
+
 def clear_cache():
     """Clears the in-memory DataFrame cache."""
-    global _df_cache
-    _df_cache = {}
-    print("Historical data cache cleared.")
\ No newline at end of file
+    _history_cache.clear()
+    print("Historical data cache cleared.")
@@ -0,0 +1,194 @@
+# backend/app/core_logic/comparison/day_similarity.py
+# All-pairs day x day similarity matrices for a time window, computed blockwise and stored compressed.
+# Build (from the backend root):  python -m app.core_logic.comparison.day_similarity --window 09:15-09:45 --block-rows 256
+import argparse
+import datetime as dt
+import json
+import time
+import zipfile
+import numpy as np
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+from ...config import settings
+from .data_loader import get_time_window_ranges, list_available_symbols, source_signature, source_is_current
+from .shared_store import atomic_write
+from . import pattern_index
+from .pattern_matcher import day_window_vectors
+
+# Opened matrices for this process, keyed by file name
+_matrix_cache: Dict[str, "DaySimilarityMatrix"] = {}
+
+
+class DaySimilarityMatrix:
+    """
+    Cosine similarity between every pair of a symbol's sessions for one time window, on the same
+    min-max normalized OHLC vectors as the pattern matcher (days with the window's usual bar count).
+    Rows are stored as compressed blocks of `block_rows` days; reading a day's row only inflates its block.
+    """
+
+    def __init__(self, path: Path, dates: np.ndarray, meta: dict):
+        self.path = path
+        self.dates = dates # datetime64[D], ascending
+        self.meta = meta
+        self.block_rows: int = meta["block_rows"]
+        self.stale = False # Computed from an older version of the CSV (see get_day_similarity_matrix)
+        self._archive = np.load(path)
+        self._block_cache: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def position(self, day: dt.date) -> Optional[int]:
+        position = int(np.searchsorted(self.dates, np.datetime64(day, "D")))
+        if position < len(self.dates) and self.dates[position] == np.datetime64(day, "D"):
+            return position
+        return None
+
+    def row(self, position: int) -> np.ndarray:
+        """Similarities of one day against every day (NaN where either day has NaN bars)."""
+        block = position // self.block_rows
+        if block not in self._block_cache:
+            if len(self._block_cache) >= 4:
+                self._block_cache.pop(next(iter(self._block_cache)))
+            self._block_cache[block] = self._archive[f"rows_{block:05d}"]
+        return self._block_cache[block][position - block * self.block_rows]
+
+    def neighbours(self, day: dt.date, num_results: int, min_similarity: float = -1.0) -> List[Tuple[dt.date, float]]:
+        """The day's most similar other sessions, best first (ties in date order)."""
+        position = self.position(day)
+        if position is None:
+            raise ValueError(f"{day.isoformat()} is not in the similarity matrix (no session with the window's {self.meta['pattern_length']} bars).")
+        similarities = self.row(position).astype(np.float64)
+        similarities[position] = np.nan # A day is not its own neighbour
+        candidates = np.flatnonzero(similarities >= min_similarity)
+        order = np.lexsort((candidates, -similarities[candidates]))[:num_results]
+        return [(self.dates[candidates[i]].item(), float(similarities[candidates[i]])) for i in order]
+
+
+def _matrix_path(symbol: str, start_time: dt.time, end_time: dt.time) -> Path:
+    name = f"{symbol}_{start_time.strftime('%H%M')}-{end_time.strftime('%H%M')}.npz"
+    return Path(".") / settings.DAY_SIMILARITY_PATH / name
+
+
+def _modal_pattern_length(symbol: str, start_time: dt.time, end_time: dt.time) -> int:
+    """Most common number of bars a session has inside the window (0 if there is no data)."""
+    index = pattern_index.get_pattern_index(symbol)
+    if index is not None and index.is_exact:
+        _, window_valid = index.window(start_time, end_time)
+        bar_counts = window_valid.sum(axis=1)
+    else:
+        window_ranges = get_time_window_ranges(symbol, start_time, end_time)
+        if window_ranges is None:
+            return 0
+        bar_counts = window_ranges[1] - window_ranges[0]
+    bar_counts = bar_counts[bar_counts > 0]
+    return int(np.bincount(bar_counts).argmax()) if len(bar_counts) else 0
+
+
+def _write_array(archive: zipfile.ZipFile, name: str, array: np.ndarray):
+    with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asarray(array), allow_pickle=False)
+
+
+def build_day_similarity_matrix(
+    symbol: str,
+    start_time: dt.time,
+    end_time: dt.time,
+    block_rows: int = 256,
+    dtype: str = "float32"
+) -> Optional[DaySimilarityMatrix]:
+    """
+    Computes the day x day cosine matrix of a symbol's sessions for the window, block_rows rows at a
+    time, streaming each compressed row block to disk (memory stays at one block plus the vectors).
+    """
+    symbol = symbol.upper()
+    signature = source_signature(symbol) # Taken before reading, so a concurrent append shows as stale
+    pattern_length = _modal_pattern_length(symbol, start_time, end_time)
+    if pattern_length == 0 or signature is None:
+        return None
+    started = time.perf_counter()
+    day_dates, vectors = day_window_vectors(symbol, start_time, end_time, pattern_length)
+    if not day_dates:
+        return None
+    norms = np.linalg.norm(vectors, axis=1)
+    safe_norms = np.where(norms == 0, 1.0, norms) # Zero vectors score 0.0, as in _cosine_similarity_batch
+    unit_vectors = vectors / safe_norms[:, None]
+
+    path = _matrix_path(symbol, start_time, end_time)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "symbol": symbol,
+        "start_time": start_time.strftime("%H:%M"),
+        "end_time": end_time.strftime("%H:%M"),
+        "pattern_length": pattern_length,
+        "num_days": len(day_dates),
+        "block_rows": block_rows,
+        "dtype": dtype,
+        **signature,
+    }
+    with atomic_write(path) as tmp_path, zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        _write_array(archive, "dates", np.array(day_dates, dtype="datetime64[D]"))
+        for block, block_start in enumerate(range(0, len(unit_vectors), block_rows)):
+            block_similarities = unit_vectors[block_start:block_start + block_rows] @ unit_vectors.T
+            _write_array(archive, f"rows_{block:05d}", block_similarities.astype(dtype))
+        meta["compute_seconds"] = round(time.perf_counter() - started, 2)
+        _write_array(archive, "meta", np.array(json.dumps(meta)))
+
+    print(f"Day similarity matrix {symbol} {meta['start_time']}-{meta['end_time']}: "
+          f"{len(day_dates)}x{len(day_dates)} in {meta['compute_seconds']}s -> {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    _matrix_cache.pop(path.name, None)
+    return get_day_similarity_matrix(symbol, start_time, end_time)
+
+
+def get_day_similarity_matrix(symbol: str, start_time: dt.time, end_time: dt.time) -> Optional[DaySimilarityMatrix]:
+    """
+    Opens a precomputed matrix (None if the job has not been run for this symbol and window). A matrix
+    of an older version of the CSV (re-converted or appended to since) is still returned, marked stale:
+    it is recomputed by this module's job or by ingest, never during a request.
+    """
+    symbol = symbol.upper()
+    path = _matrix_path(symbol, start_time, end_time)
+    if path.name not in _matrix_cache:
+        if not path.exists():
+            return None
+        with np.load(path) as stored:
+            dates = stored["dates"]
+            meta = json.loads(str(stored["meta"]))
+        _matrix_cache[path.name] = DaySimilarityMatrix(path, dates, meta)
+    matrix = _matrix_cache[path.name]
+    stale = not source_is_current(symbol, matrix.meta)
+    if stale and not matrix.stale:
+        print(f"Day similarity matrix {symbol} {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')} is stale (the CSV changed since it was computed); serving it until it is recomputed.")
+    matrix.stale = stale
+    return matrix
+
+
+def available_windows(symbol: str) -> List[Tuple[dt.time, dt.time]]:
+    """Time windows with a stored matrix for the symbol."""
+    base = Path(".") / settings.DAY_SIMILARITY_PATH
+    windows = []
+    for path in sorted(base.glob(f"{symbol.upper()}_*.npz")):
+        start_str, _, end_str = path.stem[len(symbol) + 1:].partition("-")
+        if len(start_str) == len(end_str) == 4 and (start_str + end_str).isdigit():
+            windows.append((dt.time(int(start_str[:2]), int(start_str[2:])), dt.time(int(end_str[:2]), int(end_str[2:]))))
+    return windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute all-pairs day similarity matrices for a time window.")
+    parser.add_argument("--window", default=f"{settings.DEFAULT_COMPARISON_START_TIME}-{settings.DEFAULT_COMPARISON_END_TIME}", help="HH:MM-HH:MM")
+    parser.add_argument("--symbols", nargs="*", default=None, help="Symbols to process (default: every CSV)")
+    parser.add_argument("--block-rows", type=int, default=256, help="Rows computed and stored per block (bounds memory)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32", help="Stored precision")
+    args = parser.parse_args()
+
+    start_str, end_str = args.window.split("-")
+    start_time = dt.datetime.strptime(start_str, "%H:%M").time()
+    end_time = dt.datetime.strptime(end_str, "%H:%M").time()
+    symbols = [s.upper() for s in args.symbols] if args.symbols else list_available_symbols()
+    for symbol in symbols:
+        build_day_similarity_matrix(symbol, start_time, end_time, block_rows=args.block_rows, dtype=args.dtype)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# backend/app/core_logic/comparison/ingest.py
+# Append-only ingestion of new 5-minute bars into the historical store: the symbol's CSV, the shared
+# memory-mapped store, the day x slot pattern index and the symbol catalog all grow by the new bars
+# (O(new bars)) instead of being rebuilt, and running workers pick the new version up on their next
+# catalog refresh, extending their cached derived columns and pyramids instead of recomputing them.
+# Artifacts computed over the whole history (matrix profiles, day similarity matrices, ANN indexes)
+# record the CSV's signature and are recomputed once it changes: the symbol's matrix profiles and day
+# similarity matrices right after the append (unless --no-refresh), ANN indexes on their next use.
+# From the backend root:
+#   python -m app.core_logic.comparison.ingest --symbols GLAND SBICARD --yfinance --period 5d
+#   python -m app.core_logic.comparison.ingest --symbols GLAND --file incoming/GLAND_2022-02-21.csv
+import argparse
+import datetime as dt
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from pathlib import Path
+from typing import Dict, Any, List
+from ...config import settings
+from . import shared_store, symbol_catalog, pattern_index, matrix_profile, day_similarity
+
+
+def fetch_yfinance_bars(symbol: str, period: str = "5d") -> pd.DataFrame:
+    """Recent 5-minute bars of an NSE symbol from yfinance, in the CSV's column names (the bar still forming is dropped)."""
+    ticker = yf.Ticker(f"{symbol.upper()}.NS")
+    df = ticker.history(interval="5m", period=period)
+    if df.empty:
+        return pd.DataFrame(columns=["date", "open", "high", "low", "close", "volume"])
+    df = df.reset_index().rename(columns={'Datetime': 'date', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'})
+    bar_end = df["date"] + pd.Timedelta(minutes=5)
+    return df[bar_end <= pd.Timestamp.now(tz=df["date"].dt.tz)]
+
+
+def read_bar_file(file_path: Path) -> pd.DataFrame:
+    """Bars from a dropped CSV file with at least the historical CSV's columns."""
+    df = pd.read_csv(file_path)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def _conform(bars: pd.DataFrame, shared: shared_store.SharedHistory) -> pd.DataFrame:
+    """Bars in the stored layout: same columns, dtypes and UTC offset, sorted, one bar per timestamp."""
+    columns = shared.meta["columns"]
+    missing = [c for c in columns if c not in bars.columns]
+    if missing:
+        raise ValueError(f"New bars are missing column(s) {', '.join(missing)}.")
+    bars = bars[columns].copy()
+    dates = pd.to_datetime(bars["date"])
+    offset = shared.meta["utc_offset_minutes"]
+    if offset is not None:
+        timezone = dt.timezone(dt.timedelta(minutes=offset))
+        dates = dates.dt.tz_convert(timezone) if dates.dt.tz is not None else dates.dt.tz_localize(timezone)
+    elif dates.dt.tz is not None:
+        raise ValueError("New bars carry a timezone but the stored history does not.")
+    bars["date"] = dates
+    for column in columns[1:]:
+        bars[column] = bars[column].astype(shared.columns[column].dtype)
+    bars = bars.dropna(subset=["date"]).sort_values("date", kind="stable").drop_duplicates(subset=["date"], keep="last")
+    return bars.reset_index(drop=True)
+
+
+def refresh_derived_artifacts(symbol: str) -> List[str]:
+    """Recomputes the symbol's stored matrix profiles and day similarity matrices if they predate its CSV. Returns what is now current."""
+    refreshed = []
+    for window in matrix_profile.available_windows(symbol):
+        profile = matrix_profile.get_matrix_profile(symbol, window)
+        if profile is not None and profile.stale:
+            profile = matrix_profile.build_matrix_profile(symbol, window)
+        if profile is not None:
+            refreshed.append(f"matrix_profile m={window}")
+    for start_time, end_time in day_similarity.available_windows(symbol):
+        matrix = day_similarity.get_day_similarity_matrix(symbol, start_time, end_time)
+        if matrix is not None and matrix.stale:
+            matrix = day_similarity.build_day_similarity_matrix(symbol, start_time, end_time, block_rows=matrix.block_rows, dtype=matrix.meta["dtype"])
+        if matrix is not None:
+            refreshed.append(f"day_similarity {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
+    return refreshed
+
+
+def append_bars(symbol: str, bars: pd.DataFrame, refresh_derived: bool = True) -> Dict[str, Any]:
+    """
+    Appends the bars that are newer than the symbol's last stored bar to its history. Bars at or
+    before it are skipped: duplicates of stored timestamps are counted as such, anything else as
+    out of order (backfilling the middle of the history needs a full re-ingest of the CSV).
+    With refresh_derived, the symbol's matrix profiles and day similarity matrices are recomputed
+    afterwards (see refresh_derived_artifacts) instead of on their next request.
+    """
+    symbol = symbol.upper()
+    catalog_entry = symbol_catalog.get_catalog().get(symbol)
+    if catalog_entry is None:
+        raise ValueError(f"No historical CSV for {symbol}; appends need an existing history.")
+    if not settings.COLUMNAR_CACHE_ENABLED:
+        raise ValueError("Incremental ingestion needs the shared store (COLUMNAR_CACHE_ENABLED).")
+    source_path = Path(catalog_entry["path"])
+    shared_store.attach_or_publish(symbol, source_path) # Make sure the current CSV is published before locking
+
+    # Same lock order as pattern_index.get_pattern_index (index, then store)
+    with pattern_index.index_lock(symbol), shared_store.publish_lock(symbol):
+        shared = shared_store.attach(symbol, source_path)
+        if shared is None:
+            raise ValueError(f"The stored history of {symbol} changed during the append; retry.")
+        bars = _conform(bars, shared)
+        stored_ns = shared.columns["date"]
+        bar_ns = bars["date"].dt.tz_convert(None).to_numpy().astype("datetime64[ns]").view(np.int64) if bars["date"].dt.tz is not None \
+            else bars["date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        is_new = bar_ns > stored_ns[-1] if len(stored_ns) else np.ones(len(bars), dtype=bool)
+        positions = np.searchsorted(stored_ns, bar_ns[~is_new])
+        duplicates = int((stored_ns[np.minimum(positions, len(stored_ns) - 1)] == bar_ns[~is_new]).sum()) if len(stored_ns) else 0
+        new_rows = bars[is_new].reset_index(drop=True)
+        summary = {
+            "symbol": symbol,
+            "received": len(bars),
+            "appended": len(new_rows),
+            "duplicates": duplicates,
+            "out_of_order": int((~is_new).sum()) - duplicates,
+        }
+        if new_rows.empty:
+            return summary
+
+        previous_stat = source_path.stat()
+        with open(source_path, "rb+") as f: # The CSV must end with a newline before rows are added
+            if f.seek(0, 2):
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+        new_rows.to_csv(source_path, mode="a", header=False, index=False)
+
+        updated = shared_store.append(symbol, new_rows, source_path)
+        if updated is None:
+            print(f"{symbol}: cannot append to the shared store in place, republishing the whole CSV.")
+            updated = shared_store.publish(symbol, shared_store.read_source_csv(source_path), source_path)
+        if not pattern_index.append_to_pattern_index(symbol, new_rows, previous_stat):
+            print(f"{symbol}: pattern index not extended in place, it is rebuilt on next use.")
+        source_sha1 = updated.meta["source_sha1"] if updated is not None else shared_store.file_digest(source_path)
+        symbol_catalog.record_append(symbol, new_rows, source_sha1)
+
+    summary.update({
+        "first_new": new_rows["date"].iloc[0].isoformat(),
+        "last_new": new_rows["date"].iloc[-1].isoformat(),
+        "rows": symbol_catalog.get_catalog().get(symbol)["rows"],
+    })
+    if refresh_derived: # Outside the locks: recomputing reads the history through the usual loaders
+        summary["refreshed"] = ", ".join(refresh_derived_artifacts(symbol)) or "none"
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new 5-minute bars to the historical store.")
+    parser.add_argument("--symbols", nargs="+", required=True, help="Symbols to append to")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--yfinance", action="store_true", help="Fetch recent bars from yfinance (SYMBOL.NS)")
+    source.add_argument("--file", type=Path, default=None, help="CSV of new bars (one symbol: --symbols takes one value)")
+    parser.add_argument("--period", default="5d", help="yfinance look-back period")
+    parser.add_argument("--no-refresh", action="store_true", help="Leave stale matrix profiles / day similarity matrices to be recomputed on next use")
+    args = parser.parse_args()
+
+    if args.file is not None and len(args.symbols) != 1:
+        parser.error("--file needs exactly one symbol.")
+    for symbol in args.symbols:
+        bars = fetch_yfinance_bars(symbol, args.period) if args.yfinance else read_bar_file(args.file)
+        try:
+            summary = append_bars(symbol, bars, refresh_derived=not args.no_refresh)
+        except ValueError as e:
+            print(f"{symbol.upper()}: {e}")
+            continue
+        print(", ".join(f"{key}={value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
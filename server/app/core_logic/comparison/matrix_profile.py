@@ -0,0 +1,253 @@
+# backend/app/core_logic/comparison/matrix_profile.py
+# Offline matrix-profile job and motif/discord catalog per symbol.
+# Build (from the backend root):  python -m app.core_logic.comparison.matrix_profile --windows 6 12 24 --jobs 4
+import argparse
+import datetime as dt
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple, Any
+from ...config import settings
+from .data_loader import get_historical_frame, source_signature, source_is_current, list_available_symbols
+from .shared_store import atomic_write
+from .subsequence_search import _sliding_dot_product
+
+# STOMP's O(n) row updates accumulate rounding error; the dot products are recomputed exactly this often
+_REFRESH_ROWS = 256
+
+# Loaded profiles for this process, keyed by (symbol, window)
+_profile_cache: Dict[Tuple[str, int], "MatrixProfile"] = {}
+
+
+class MatrixProfile:
+    """
+    Stored matrix profile of one symbol's close series for one window length m: for every subsequence
+    start, the squared z-normalized distance to its nearest non-trivial neighbour and that neighbour's
+    position. Windows that cross a session boundary (or are flat) have an infinite profile value.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: dict):
+        self.profile = arrays["profile"]
+        self.index = arrays["index"]
+        self.timestamps_ns = arrays["timestamps_ns"] # UTC epoch ns of every bar
+        self.day_ids = arrays["day_ids"] # Trading-day ordinal of every bar
+        self.day_dates = arrays["day_dates"] # datetime64[D] per day ordinal
+        self.meta = meta
+        self.window = int(meta["window"])
+        self.stale = False # Computed from an older version of the CSV (see get_matrix_profile)
+        self._tz = dt.timezone(dt.timedelta(minutes=meta["utc_offset_minutes"]))
+
+    def timestamp(self, position: int) -> dt.datetime:
+        return pd.Timestamp(int(self.timestamps_ns[position]), tz="UTC").tz_convert(self._tz).to_pydatetime()
+
+    def similarity(self, squared_distance: float) -> float:
+        return float(1.0 - squared_distance / (2.0 * self.window))
+
+    def top_motifs(self, num_results: int) -> List[Dict[str, Any]]:
+        """Closest non-overlapping subsequence pairs (recurring intraday shapes), best first."""
+        order = np.argsort(self.profile, kind="stable")
+        taken = np.zeros(len(self.profile), dtype=bool)
+        motifs = []
+        for position in order:
+            if not np.isfinite(self.profile[position]) or len(motifs) == num_results:
+                break
+            neighbour = int(self.index[position])
+            if taken[position] or taken[neighbour]:
+                continue
+            for start in (position, neighbour):
+                taken[max(0, start - self.window + 1):start + self.window] = True
+            motifs.append({
+                "start": self.timestamp(position),
+                "neighbour_start": self.timestamp(neighbour),
+                "distance": float(np.sqrt(self.profile[position])),
+                "similarity_score": self.similarity(self.profile[position]),
+            })
+        return motifs
+
+    def unusual_sessions(self, num_results: int) -> List[Dict[str, Any]]:
+        """
+        Sessions ranked by how far their subsequences are, on average, from anything else in the
+        history (mean finite profile value per day), with each session's single most unusual window.
+        """
+        finite = np.isfinite(self.profile)
+        window_days = self.day_ids[:len(self.profile)]
+        num_days = len(self.day_dates)
+        sums = np.bincount(window_days[finite], weights=self.profile[finite], minlength=num_days)
+        counts = np.bincount(window_days[finite], minlength=num_days)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            session_scores = np.where(counts > 0, sums / counts, np.nan)
+
+        ranked = np.argsort(np.nan_to_num(-session_scores, nan=np.inf), kind="stable")[:num_results]
+        sessions = []
+        for day in ranked:
+            if not np.isfinite(session_scores[day]):
+                break
+            day_positions = np.flatnonzero((window_days == day) & finite)
+            discord = int(day_positions[np.argmax(self.profile[day_positions])])
+            sessions.append({
+                "date": self.day_dates[day].item().isoformat(),
+                "session_score": float(np.sqrt(session_scores[day])),
+                "discord_start": self.timestamp(discord),
+                "discord_distance": float(np.sqrt(self.profile[discord])),
+            })
+        return sessions
+
+
+def _profile_rows(
+    series: np.ndarray,
+    m: int,
+    row_start: int,
+    row_end: int,
+    means: np.ndarray,
+    stds: np.ndarray,
+    invalid: np.ndarray,
+    exclusion: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    STOMP over rows [row_start, row_end): a row's dot products come from one FFT every _REFRESH_ROWS
+    rows, every row in between is updated from the previous one in O(n).
+    """
+    num_windows = len(series) - m + 1
+    safe_stds = np.where(invalid, 1.0, stds)
+    profile = np.full(row_end - row_start, np.inf)
+    index = np.full(row_end - row_start, -1, dtype=np.int64)
+    first_row_products = _sliding_dot_product(series[:m], series) # Column 0 of every row, by symmetry
+
+    for row in range(row_start, row_end):
+        if (row - row_start) % _REFRESH_ROWS == 0:
+            dot_products = _sliding_dot_product(series[row:row + m], series)
+        else:
+            dot_products[1:] = dot_products[:-1] - series[row - 1] * series[:num_windows - 1] + series[row + m - 1] * series[m:]
+            dot_products[0] = first_row_products[row]
+        if invalid[row]:
+            continue
+        correlation = (dot_products - m * means[row] * means) / (m * safe_stds[row] * safe_stds)
+        distances = 2.0 * m * (1.0 - np.clip(correlation, -1.0, 1.0))
+        distances[invalid] = np.inf
+        distances[max(0, row - exclusion):row + exclusion + 1] = np.inf # Trivial matches
+        best = int(np.argmin(distances))
+        profile[row - row_start] = distances[best]
+        index[row - row_start] = best
+    return profile, index
+
+
+def compute_matrix_profile(series: np.ndarray, day_ids: np.ndarray, m: int, jobs: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Matrix profile and index of the series for window m, rows split into chunks over `jobs` processes."""
+    num_windows = len(series) - m + 1
+    if num_windows < 2:
+        raise ValueError(f"Series too short for a window of {m} bars.")
+    # Exact per-window statistics (the cumulative-sum shortcut loses digits on long price series)
+    windows = np.lib.stride_tricks.sliding_window_view(series, m)
+    means, stds = windows.mean(axis=1), windows.std(axis=1)
+    invalid = (day_ids[:num_windows] != day_ids[m - 1:]) | (stds < 1e-12) # Session-crossing or flat windows
+    exclusion = max(1, m // 2)
+
+    bounds = np.linspace(0, num_windows, max(1, jobs) + 1).astype(int)
+    chunks = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    if jobs <= 1:
+        parts = [_profile_rows(series, m, a, b, means, stds, invalid, exclusion) for a, b in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_profile_rows, series, m, a, b, means, stds, invalid, exclusion) for a, b in chunks]
+            parts = [future.result() for future in futures]
+    return np.concatenate([p for p, _ in parts]), np.concatenate([i for _, i in parts])
+
+
+def _profile_path(symbol: str, window: int) -> Path:
+    return Path(".") / settings.MATRIX_PROFILE_PATH / f"{symbol}_m{window}.npz"
+
+
+def build_matrix_profile(symbol: str, window: int, jobs: int = 1) -> Optional[MatrixProfile]:
+    """Computes and stores the matrix profile of a symbol's close series for one window length."""
+    symbol = symbol.upper()
+    signature = source_signature(symbol) # Taken before reading, so a concurrent append shows as stale
+    df = get_historical_frame(symbol)
+    if df is None or df.empty or signature is None:
+        return None
+    timestamps = pd.to_datetime(df["date"])
+    series = df["close"].to_numpy(dtype=np.float64)
+    day_codes, day_keys = pd.factorize(timestamps.dt.date, sort=True)
+
+    started = time.perf_counter()
+    profile, index = compute_matrix_profile(series, day_codes, window, jobs=jobs)
+    elapsed = time.perf_counter() - started
+
+    utc_offset = timestamps.iloc[0].utcoffset() if timestamps.dt.tz is not None else None
+    meta = {
+        "symbol": symbol,
+        "window": window,
+        "column": "close",
+        "utc_offset_minutes": int(utc_offset.total_seconds() // 60) if utc_offset else 0,
+        **signature,
+        "compute_seconds": round(elapsed, 2),
+    }
+    arrays = {
+        "profile": profile,
+        "index": index,
+        "timestamps_ns": (timestamps.dt.tz_convert(None) if timestamps.dt.tz is not None else timestamps).to_numpy().astype("datetime64[ns]").astype(np.int64),
+        "day_ids": day_codes.astype(np.int32),
+        "day_dates": np.array(day_keys, dtype="datetime64[D]"),
+    }
+    path = _profile_path(symbol, window)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as tmp_path, open(tmp_path, "wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    print(f"Matrix profile {symbol} m={window}: {len(profile)} windows in {elapsed:.1f}s -> {path}")
+    stored = MatrixProfile(arrays, meta)
+    _profile_cache[(symbol, window)] = stored
+    return stored
+
+
+def get_matrix_profile(symbol: str, window: int) -> Optional[MatrixProfile]:
+    """
+    Loads a precomputed matrix profile (None if the job has not been run for this symbol and window).
+    A profile of an older version of the CSV (re-converted or appended to since) is still returned,
+    marked stale: recomputing is quadratic in the history, so it is left to this module's job or to
+    ingest, never done during a request.
+    """
+    symbol = symbol.upper()
+    key = (symbol, window)
+    if key not in _profile_cache:
+        path = _profile_path(symbol, window)
+        if not path.exists():
+            return None
+        with np.load(path) as stored:
+            arrays = {name: stored[name] for name in stored.files if name != "meta"}
+            meta = json.loads(str(stored["meta"]))
+        _profile_cache[key] = MatrixProfile(arrays, meta)
+    profile = _profile_cache[key]
+    stale = not source_is_current(symbol, profile.meta)
+    if stale and not profile.stale:
+        print(f"Matrix profile {symbol} m={window} is stale (the CSV changed since it was computed); serving it until it is recomputed.")
+    profile.stale = stale
+    return profile
+
+
+def available_windows(symbol: str) -> List[int]:
+    """Window lengths with a stored matrix profile for the symbol."""
+    base = Path(".") / settings.MATRIX_PROFILE_PATH
+    prefix = f"{symbol.upper()}_m"
+    return sorted(int(p.stem[len(prefix):]) for p in base.glob(f"{prefix}*.npz") if p.stem[len(prefix):].isdigit())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute matrix profiles (motifs/discords) for the historical CSVs.")
+    parser.add_argument("--symbols", nargs="*", default=None, help="Symbols to process (default: every CSV)")
+    parser.add_argument("--windows", nargs="*", type=int, default=None, help="Window lengths in bars")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes per profile")
+    args = parser.parse_args()
+
+    symbols = [s.upper() for s in args.symbols] if args.symbols else list_available_symbols()
+    windows = args.windows or settings.MATRIX_PROFILE_WINDOWS
+    for symbol in symbols:
+        for window in windows:
+            build_matrix_profile(symbol, window, jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
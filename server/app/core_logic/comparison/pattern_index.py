@@ -0,0 +1,351 @@
+# backend/app/core_logic/comparison/pattern_index.py
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import time as dt_time, date as dt_date
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+from ...config import settings
+from .data_loader import get_historical_frame, resolve_data_file
+from .shared_store import append_npy, atomic_write, file_lock
+
+# Column order of the bar tensor (the first four are what the matcher scores on)
+BAR_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# Per-process handles on the memory-mapped indexes (the data itself lives in the OS page cache)
+_index_cache: Dict[str, "PatternIndex"] = {}
+_index_cache_lock = threading.Lock() # Searches run on threadpool threads
+
+
+class PatternIndex:
+    """
+    Day x intraday-slot x OHLCV tensor for one symbol, backed by memory-mapped .npy files.
+
+    bars[d, s]  -> OHLCV of trading day `dates[d]` at minute-of-day `first_slot_minute + s * interval_minutes`
+    valid[d, s] -> False where that bar is missing (bars are NaN there)
+    """
+
+    def __init__(self, symbol: str, bars: np.ndarray, valid: np.ndarray, dates: np.ndarray, meta: dict):
+        self.symbol = symbol
+        self.bars = bars
+        self.valid = valid
+        self.dates = dates # datetime64[D], ascending
+        self.meta = meta
+        self.interval_minutes: int = meta["interval_minutes"]
+        self.first_slot_minute: int = meta["first_slot_minute"]
+
+    @property
+    def num_days(self) -> int:
+        return self.bars.shape[0]
+
+    @property
+    def num_slots(self) -> int:
+        return self.bars.shape[1]
+
+    @property
+    def is_exact(self) -> bool:
+        """True if every source row landed on a slot, i.e. the index holds exactly the CSV's bars."""
+        return self.meta.get("off_grid_rows", 0) == 0
+
+    def slot_range(self, start_time: dt_time, end_time: dt_time) -> Tuple[int, int]:
+        """Half-open slot range [first, last) covering bars with start_time <= time <= end_time."""
+        start_minute = start_time.hour * 60 + start_time.minute + (1 if start_time.second or start_time.microsecond else 0)
+        end_minute = end_time.hour * 60 + end_time.minute
+        first = -(-(start_minute - self.first_slot_minute) // self.interval_minutes) # ceil division
+        last = (end_minute - self.first_slot_minute) // self.interval_minutes + 1
+        return max(first, 0), min(max(last, 0), self.num_slots)
+
+    def window(self, start_time: dt_time, end_time: dt_time) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy views of (bars, valid) restricted to the slots inside the time window."""
+        first, last = self.slot_range(start_time, end_time)
+        last = max(first, last)
+        return self.bars[:, first:last, :], self.valid[:, first:last]
+
+    def stack_day_windows(
+        self,
+        start_time: dt_time,
+        end_time: dt_time,
+        pattern_length: int,
+        exclude_date: Optional[dt_date] = None,
+        bar_counts: Optional[np.ndarray] = None
+    ) -> Tuple[List[dt_date], np.ndarray]:
+        """
+        OHLC windows of every day that has exactly `pattern_length` bars inside the time window,
+        as a (days, pattern_length, 4) array along with those days' dates.
+        `bar_counts` is the days' bar count in the window when already known (see window_bar_counts).
+        """
+        if bar_counts is None:
+            _, window_valid = self.window(start_time, end_time)
+            bar_counts = window_valid.sum(axis=1)
+        eligible = bar_counts == pattern_length
+        if exclude_date is not None:
+            eligible &= self.dates != np.datetime64(exclude_date, "D")
+        eligible_days = np.flatnonzero(eligible)
+        windows = self.day_windows(eligible_days, start_time, end_time, pattern_length)
+        return [d.item() for d in self.dates[eligible_days]], windows
+
+    def window_bar_counts(self, time_windows: List[Tuple[dt_time, dt_time]]) -> np.ndarray:
+        """
+        (days, windows) number of bars every day has inside each (start_time, end_time) window,
+        from a single cumulative count over the slots the windows span.
+        """
+        slot_ranges = np.array([self.slot_range(start_time, end_time) for start_time, end_time in time_windows], dtype=np.int64).reshape(-1, 2)
+        first_slots = slot_ranges[:, 0]
+        last_slots = np.maximum(slot_ranges[:, 1], first_slots)
+        low = int(first_slots.min()) if len(slot_ranges) else 0
+        high = int(last_slots.max()) if len(slot_ranges) else 0
+        cumulative = np.zeros((self.num_days, high - low + 1), dtype=np.int32)
+        np.cumsum(self.valid[:, low:high], axis=1, out=cumulative[:, 1:])
+        return cumulative[:, last_slots - low] - cumulative[:, first_slots - low]
+
+    def day_windows(self, day_positions: np.ndarray, start_time: dt_time, end_time: dt_time, pattern_length: int) -> np.ndarray:
+        """(days, pattern_length, 4) OHLC windows of the given days, each of which must have exactly pattern_length bars in the window."""
+        window_bars, window_valid = self.window(start_time, end_time)
+        # Every day has exactly pattern_length valid slots, so the masked gather reshapes cleanly
+        day_bars = window_bars[day_positions, :, :4]
+        return day_bars[window_valid[day_positions]].reshape(len(day_positions), pattern_length, 4)
+
+    def slot_aligned_windows(
+        self,
+        start_time: dt_time,
+        end_time: dt_time,
+        exclude_date: Optional[dt_date] = None
+    ) -> Tuple[List[dt_date], np.ndarray, np.ndarray]:
+        """
+        OHLC windows of every day on the full slot grid of the time window, as (days, slots, 4)
+        with NaN at missing bars, plus the matching (days, slots) validity mask.
+        """
+        window_bars, window_valid = self.window(start_time, end_time)
+        keep = np.ones(self.num_days, dtype=bool)
+        if exclude_date is not None:
+            keep &= self.dates != np.datetime64(exclude_date, "D")
+        days = np.flatnonzero(keep)
+        return [d.item() for d in self.dates[days]], window_bars[days, :, :4], window_valid[days]
+
+    def align_to_window(self, df_window: pd.DataFrame, start_time: dt_time, end_time: dt_time) -> Tuple[np.ndarray, np.ndarray]:
+        """Places a DataFrame of bars (e.g. the live query window) on this index's slot grid for the time window."""
+        first, last = self.slot_range(start_time, end_time)
+        num_slots = max(last - first, 0)
+        aligned = np.full((num_slots, 4), np.nan)
+        aligned_valid = np.zeros(num_slots, dtype=bool)
+        timestamps = pd.to_datetime(df_window["date"])
+        minutes = (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy()
+        offsets = minutes - self.first_slot_minute - first * self.interval_minutes
+        slots = offsets // self.interval_minutes
+        on_grid = (offsets % self.interval_minutes == 0) & (slots >= 0) & (slots < num_slots)
+        aligned[slots[on_grid]] = df_window[["open", "high", "low", "close"]].to_numpy(dtype=np.float64)[on_grid]
+        aligned_valid[slots[on_grid]] = True
+        return aligned, aligned_valid
+
+
+def _index_dir() -> Path:
+    return Path(".") / settings.PATTERN_INDEX_PATH
+
+
+def _index_files(symbol: str) -> Dict[str, Path]:
+    base = _index_dir()
+    return {
+        "bars": base / f"{symbol}.bars.npy",
+        "valid": base / f"{symbol}.valid.npy",
+        "dates": base / f"{symbol}.dates.npy",
+        "meta": base / f"{symbol}.meta.json",
+    }
+
+
+def _source_signature(file_path: Path) -> dict:
+    stat = file_path.stat()
+    return {"source_file": str(file_path), "source_mtime_ns": stat.st_mtime_ns, "source_size": stat.st_size}
+
+
+def _save_array_atomic(path: Path, array: np.ndarray):
+    with atomic_write(path) as tmp_path, open(tmp_path, "wb") as f: # Readers never see a half-written file
+        np.save(f, array)
+
+
+def build_pattern_index(symbol: str, df: Optional[pd.DataFrame] = None) -> Optional[PatternIndex]:
+    """
+    Builds the day x slot tensor for a symbol from its historical DataFrame and writes it
+    under PATTERN_INDEX_PATH. Returns the freshly memory-mapped index, or None if there is no data.
+    """
+    symbol = symbol.upper()
+    source_path = resolve_data_file(symbol)
+    if df is None:
+        df = get_historical_frame(symbol)
+    if df is None or df.empty or not source_path.exists():
+        return None
+
+    timestamps = pd.to_datetime(df["date"])
+    minute_of_day = (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy(dtype=np.int64)
+    on_minute = (timestamps.dt.second == 0).to_numpy() & (timestamps.dt.microsecond == 0).to_numpy()
+    # Group by the local trading day (CSV timestamps carry the exchange offset)
+    local_timestamps = timestamps.dt.tz_localize(None) if timestamps.dt.tz is not None else timestamps
+    day_values = local_timestamps.dt.normalize().to_numpy().astype("datetime64[D]")
+
+    # Bar interval = most common gap between consecutive bars of the same day
+    same_day = day_values[1:] == day_values[:-1]
+    gaps = np.diff(minute_of_day)[same_day]
+    gaps = gaps[gaps > 0]
+    interval_minutes = int(np.bincount(gaps).argmax()) if gaps.size else 5
+
+    first_slot_minute = int(minute_of_day.min())
+    offsets = minute_of_day - first_slot_minute
+    on_grid = on_minute & (offsets % interval_minutes == 0)
+    slots = offsets // interval_minutes
+    num_slots = int(slots.max()) + 1
+
+    dates, day_positions = np.unique(day_values, return_inverse=True)
+    bars = np.full((len(dates), num_slots, len(BAR_COLUMNS)), np.nan, dtype=np.float64)
+    valid = np.zeros((len(dates), num_slots), dtype=bool)
+    values = df[BAR_COLUMNS].to_numpy(dtype=np.float64)
+    bars[day_positions[on_grid], slots[on_grid]] = values[on_grid]
+    valid[day_positions[on_grid], slots[on_grid]] = True
+
+    files = _index_files(symbol)
+    _index_dir().mkdir(parents=True, exist_ok=True)
+    _save_array_atomic(files["bars"], bars)
+    _save_array_atomic(files["valid"], valid)
+    _save_array_atomic(files["dates"], dates)
+    meta = {
+        **_source_signature(source_path),
+        "symbol": symbol,
+        "interval_minutes": interval_minutes,
+        "first_slot_minute": first_slot_minute,
+        "num_days": int(len(dates)),
+        "num_slots": num_slots,
+        "off_grid_rows": int((~on_grid).sum()),
+    }
+    with atomic_write(files["meta"]) as tmp_meta: # Meta last: it marks the index as complete
+        tmp_meta.write_text(json.dumps(meta, indent=2))
+
+    print(f"Built pattern index for {symbol}: {len(dates)} days x {num_slots} slots ({interval_minutes}m bars).")
+    _forget_index(symbol)
+    return _open_pattern_index(symbol)
+
+
+def append_to_pattern_index(symbol: str, new_rows: pd.DataFrame, previous_stat: os.stat_result) -> bool:
+    """
+    Adds bars that are newer than everything in the symbol's index, once they have been appended to
+    its CSV (previous_stat: the CSV's stat before the append, which the index must match). Slots of
+    the last indexed day are filled in place and new days are appended to the memory-mapped
+    tensors (O(new bars), the existing days are not rebuilt). False if the bars do not
+    fit the index's grid (new slot, off-grid time, stale or missing index); get_pattern_index then
+    rebuilds it on next use, as for any changed CSV.
+    """
+    symbol = symbol.upper()
+    index = _cached_index(symbol) or _open_pattern_index(symbol)
+    if index is None or not index.is_exact or new_rows.empty:
+        return False
+    if (index.meta["source_size"], index.meta["source_mtime_ns"]) != (previous_stat.st_size, previous_stat.st_mtime_ns):
+        return False # Already stale before the append
+
+    timestamps = pd.to_datetime(new_rows["date"])
+    minute_of_day = (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy(dtype=np.int64)
+    on_minute = (timestamps.dt.second == 0).to_numpy() & (timestamps.dt.microsecond == 0).to_numpy()
+    local_timestamps = timestamps.dt.tz_localize(None) if timestamps.dt.tz is not None else timestamps
+    day_values = local_timestamps.dt.normalize().to_numpy().astype("datetime64[D]")
+    offsets = minute_of_day - index.first_slot_minute
+    slots = offsets // index.interval_minutes
+    if not (on_minute & (offsets % index.interval_minutes == 0) & (slots >= 0) & (slots < index.num_slots)).all():
+        return False
+    if index.num_days and day_values[0] < index.dates[-1]:
+        return False
+
+    values = new_rows[BAR_COLUMNS].to_numpy(dtype=np.float64)
+    files = _index_files(symbol)
+    continues_last_day = index.num_days > 0 and day_values[0] == index.dates[-1]
+    if continues_last_day:
+        # Bars first, then their valid flags, so readers never see a valid slot without its bar
+        same_day = day_values == index.dates[-1]
+        bars = np.load(files["bars"], mmap_mode="r+")
+        bars[index.num_days - 1, slots[same_day]] = values[same_day]
+        bars.flush()
+        valid = np.load(files["valid"], mmap_mode="r+")
+        valid[index.num_days - 1, slots[same_day]] = True
+        valid.flush()
+        del bars, valid
+        day_values, slots, values = day_values[~same_day], slots[~same_day], values[~same_day]
+
+    new_dates, day_positions = np.unique(day_values, return_inverse=True)
+    if len(new_dates):
+        new_bars = np.full((len(new_dates), index.num_slots, len(BAR_COLUMNS)), np.nan, dtype=np.float64)
+        new_valid = np.zeros((len(new_dates), index.num_slots), dtype=bool)
+        new_bars[day_positions, slots] = values
+        new_valid[day_positions, slots] = True
+        if not (append_npy(files["bars"], new_bars, index.num_days) and append_npy(files["valid"], new_valid, index.num_days)):
+            return False
+        _save_array_atomic(files["dates"], np.concatenate((np.asarray(index.dates), new_dates)))
+
+    meta = {**index.meta, **_source_signature(resolve_data_file(symbol)), "num_days": index.num_days + len(new_dates)}
+    with atomic_write(files["meta"]) as tmp_meta:
+        tmp_meta.write_text(json.dumps(meta, indent=2))
+    _forget_index(symbol)
+    return True
+
+
+def _open_pattern_index(symbol: str) -> Optional[PatternIndex]:
+    files = _index_files(symbol)
+    if not files["meta"].exists():
+        return None
+    try:
+        meta = json.loads(files["meta"].read_text())
+        num_days = meta["num_days"] # Appends grow the files before the meta, which decides what is in the index
+        index = PatternIndex(
+            symbol,
+            bars=np.load(files["bars"], mmap_mode="r")[:num_days],
+            valid=np.load(files["valid"], mmap_mode="r")[:num_days],
+            dates=np.load(files["dates"])[:num_days],
+            meta=meta,
+        )
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not open pattern index for {symbol}: {e}")
+        return None
+    with _index_cache_lock:
+        _index_cache[symbol] = index
+    return index
+
+
+def _cached_index(symbol: str) -> Optional[PatternIndex]:
+    with _index_cache_lock:
+        return _index_cache.get(symbol)
+
+
+def _forget_index(symbol: str):
+    with _index_cache_lock:
+        _index_cache.pop(symbol, None)
+
+
+def _is_fresh(index: PatternIndex, source_path: Path) -> bool:
+    if not source_path.exists():
+        return False
+    signature = _source_signature(source_path)
+    return all(index.meta.get(key) == value for key, value in signature.items() if key != "source_file")
+
+
+def get_pattern_index(symbol: str) -> Optional[PatternIndex]:
+    """
+    Returns the memory-mapped pattern index for a symbol, (re)building it if it is missing
+    or older than the symbol's CSV. Returns None if the symbol has no historical data.
+    """
+    symbol = symbol.upper()
+    source_path = resolve_data_file(symbol)
+    index = _cached_index(symbol) or _open_pattern_index(symbol)
+    if index is not None and _is_fresh(index, source_path):
+        return index
+    with index_lock(symbol):
+        index = _open_pattern_index(symbol) # Updated by another process (or an append) while we waited?
+        if index is not None and _is_fresh(index, source_path):
+            return index
+        return build_pattern_index(symbol)
+
+
+def index_lock(symbol: str):
+    """Held while a symbol's index is built or appended to (taken before the shared store's publish lock)."""
+    return file_lock(f".{symbol.upper()}.index.lock")
+
+
+def clear_index_cache():
+    """Drops this process's handles on the memory-mapped indexes (files on disk are kept)."""
+    with _index_cache_lock:
+        _index_cache.clear()
@@ -2,11 +2,16 @@
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-import yfinance as yf
-from datetime import datetime, time as dt_time, date as dt_date, timedelta, timezone
+from datetime import time as dt_time, date as dt_date
 import datetime as dt
-from typing import List, Tuple, Dict, Any
-from .data_loader import load_historical_data
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional
+from ...config import settings
+from .data_loader import get_historical_frame, get_day_row_index, get_time_window_ranges, get_resolution_pyramid, list_available_symbols, minute_bounds, _minute_of_day
+from . import pattern_index, ann_index, similarity_metrics, query_sources
 
 def _normalize_ohlc_pattern(df_slice: pd.DataFrame) -> np.ndarray:
     """Normalizes OHLC columns of a DataFrame slice and flattens."""
@@ -19,22 +24,465 @@ def _normalize_ohlc_pattern(df_slice: pd.DataFrame) -> np.ndarray:
         return np.array([])
     return scaler.fit_transform(ohlc_data).flatten()
 
-def _filter_by_time_window(df: pd.DataFrame, start_time_obj: dt_time, end_time_obj: dt_time) -> pd.DataFrame:
-    """Filters a DataFrame for rows within a specific time window."""
+def _filter_by_time_window(
+    df: pd.DataFrame,
+    start_time_obj: dt_time,
+    end_time_obj: dt_time,
+    minute_of_day: Optional[np.ndarray] = None
+) -> pd.DataFrame:
+    """
+    Filters a DataFrame for rows within a specific time window, as an int16 minute-of-day mask.
+    `minute_of_day` is the rows' minute of day when the caller already has it (e.g. the cached derived column).
+    For a symbol's whole history, get_time_window_ranges avoids the full-frame mask altogether.
+    """
     if df.empty or "date" not in df.columns: # Assuming 'date' is datetime column
         return pd.DataFrame()
-    
-    # Ensure 'date' column is datetime
-    if not pd.api.types.is_datetime64_any_dtype(df['date']):
-        df['date'] = pd.to_datetime(df['date'])
 
-    # Create a temporary time column for filtering if it doesn't exist
-    if 'time' not in df.columns:
-         df_temp = df.copy()
-         df_temp['time'] = df_temp['date'].dt.time
-         return df_temp[(df_temp['time'] >= start_time_obj) & (df_temp['time'] <= end_time_obj)].drop(columns=['time'])
-    else: # if 'time' column already exists (e.g. from your CSV)
-         return df[(df['time'] >= start_time_obj) & (df['time'] <= end_time_obj)]
+    if minute_of_day is None:
+        minute_of_day = _minute_of_day(df) # Computed, never written to a possibly shared frame
+    first_minute, last_minute = minute_bounds(start_time_obj, end_time_obj)
+    return df[(minute_of_day >= first_minute) & (minute_of_day <= last_minute)]
+
+
+def _normalize_ohlc_batch(windows: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalizes a (days, bars, 4) stack of OHLC windows per day and per column,
+    using the same arithmetic as MinMaxScaler, and flattens each day to (days, bars * 4).
+    """
+    data_min = np.nanmin(windows, axis=1, keepdims=True)
+    data_range = np.nanmax(windows, axis=1, keepdims=True) - data_min
+    # MinMaxScaler treats (near) constant columns as having a range of 1
+    data_range[data_range < 10 * np.finfo(data_range.dtype).eps] = 1.0
+    scale = 1.0 / data_range
+    normalized = windows * scale + (0.0 - data_min * scale)
+    return normalized.reshape(windows.shape[0], windows.shape[1] * windows.shape[2])
+
+
+def _cosine_similarity_batch(patterns: np.ndarray, query_pattern: np.ndarray) -> np.ndarray:
+    """Cosine similarity of every row in patterns against query_pattern (0.0 where a norm is zero)."""
+    dot_products = patterns @ query_pattern
+    norms = np.sqrt(np.einsum("ij,ij->i", patterns, patterns)) * np.linalg.norm(query_pattern)
+    similarities = np.zeros(len(patterns), dtype=np.float64)
+    np.divide(dot_products, norms, out=similarities, where=norms != 0)
+    # A NaN dot product (NaN bars in the CSV) must never pass the threshold
+    similarities[np.isnan(dot_products)] = np.nan
+    return similarities
+
+
+def _stack_day_windows(
+    df: pd.DataFrame,
+    day_dates: np.ndarray,
+    window_starts: np.ndarray,
+    window_ends: np.ndarray,
+    pattern_length: int,
+    exclude_date: Optional[dt_date] = None
+) -> Tuple[List[dt_date], np.ndarray]:
+    """
+    Stacks the OHLC rows of every day's time window (rows [window_starts[d], window_ends[d]) of df)
+    into a (days, bars, 4) array, gathering only those rows from each column.
+    Only days whose window has exactly `pattern_length` bars are eligible (same rule as before).
+    """
+    eligible = (window_ends - window_starts) == pattern_length
+    if exclude_date is not None:
+        eligible &= np.asarray(day_dates) != exclude_date # Skip comparing today with itself if it's in historical
+    eligible_days = np.flatnonzero(eligible)
+
+    row_positions = window_starts[eligible_days][:, None] + np.arange(pattern_length)
+    windows = np.empty((len(eligible_days), pattern_length, 4), dtype=np.float64)
+    for column, name in enumerate(["open", "high", "low", "close"]):
+        windows[:, :, column] = df[name].to_numpy(dtype=np.float64)[row_positions]
+    return [day_dates[i] for i in eligible_days], windows
+
+
+def _score_windows(
+    windows: np.ndarray,
+    query_pattern: np.ndarray,
+    timings: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """Normalizes a (days, bars, 4) stack of windows and scores every day against the query pattern."""
+    timings = timings if timings is not None else {}
+
+    stage_start = time.perf_counter()
+    normalized = _normalize_ohlc_batch(windows)
+    timings["normalize"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    scores = _cosine_similarity_batch(normalized, query_pattern)
+    timings["score"] = time.perf_counter() - stage_start
+    return scores
+
+
+def _select_top_k(scores: np.ndarray, similarity_threshold: float, num_results: int) -> np.ndarray:
+    """
+    Positions of the top `num_results` scores at or above the threshold, best first.
+    Ties keep ascending position (date) order, matching a stable descending sort.
+    """
+    candidates = np.flatnonzero(scores >= similarity_threshold)
+    if len(candidates) > num_results:
+        candidate_scores = scores[candidates]
+        kth_best = candidate_scores[np.argpartition(-candidate_scores, num_results - 1)[num_results - 1]]
+        candidates = candidates[candidate_scores >= kth_best]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:num_results]
+
+
+def _fetch_query_window(stock_symbol: str, today_date: dt_date, query_start_time: dt_time, query_end_time: dt_time, query_source: str = "yfinance") -> pd.DataFrame:
+    """Fetches the query day's 5-min bars for a symbol (see query_sources) and returns the rows inside the time window."""
+    df_today_full_day = query_sources.fetch_query_day(stock_symbol, today_date, query_source)
+    df_today_window = _filter_by_time_window(df_today_full_day, query_start_time, query_end_time)
+
+    if df_today_window.empty:
+        raise ValueError(f"No data found for {stock_symbol} in the {query_source} query data of {today_date} for the window {query_start_time}-{query_end_time}.")
+
+    return df_today_window
+
+
+def _candidate_windows(
+    stock_symbol: str,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    pattern_length: int,
+    exclude_date: Optional[dt_date] = None
+) -> Tuple[List[dt_date], np.ndarray]:
+    """
+    Gathers every eligible day's window of a symbol into a single (days, bars, 4) array, preferably
+    straight from the memory-mapped day x bar index instead of re-filtering the DataFrame.
+    """
+    index = pattern_index.get_pattern_index(stock_symbol)
+    if index is not None and index.is_exact:
+        return index.stack_day_windows(query_start_time, query_end_time, pattern_length, exclude_date=exclude_date)
+
+    df_historical_full = get_historical_frame(stock_symbol)
+    if df_historical_full is None or df_historical_full.empty:
+        return [], np.empty((0, pattern_length, 4), dtype=np.float64)
+    # Per-day binary search on the cached minute keys, no full-frame filtering or copy
+    window_starts, window_ends = get_time_window_ranges(stock_symbol, query_start_time, query_end_time)
+    day_dates = get_day_row_index(stock_symbol).dates
+    return _stack_day_windows(df_historical_full, day_dates, window_starts, window_ends, pattern_length, exclude_date=exclude_date)
+
+
+def day_window_vectors(
+    stock_symbol: str,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    pattern_length: int,
+    exclude_date: Optional[dt_date] = None
+) -> Tuple[List[dt_date], np.ndarray]:
+    """
+    Every eligible day's window of a symbol (exactly pattern_length bars) as a min-max normalized,
+    flattened (days, pattern_length * 4) vector: what the cosine search scores, for precomputed indexes.
+    """
+    day_dates, windows = _candidate_windows(stock_symbol, query_start_time, query_end_time, pattern_length, exclude_date=exclude_date)
+    return day_dates, _normalize_ohlc_batch(windows)
+
+
+# Query-independent per-day block statistics, keyed by (symbol, source mtime, level minutes, first slot, last slot),
+# least recently used evicted first beyond _WINDOW_UNITS_CACHE_SIZE entries or COMPARISON_WINDOW_UNITS_CACHE_MAX_BYTES
+_window_units_cache: "OrderedDict[Tuple[str, int, int, int, int], Optional[Tuple[np.ndarray, ...]]]" = OrderedDict()
+_window_units_sizes: Dict[Tuple[str, int, int, int, int], int] = {}
+_WINDOW_UNITS_CACHE_SIZE = 64
+_window_units_lock = threading.Lock() # Searches run on threadpool threads
+
+
+def _cache_window_units(key: Tuple[str, int, int, int, int], units: Optional[Tuple[np.ndarray, ...]]):
+    with _window_units_lock:
+        _window_units_cache[key] = units
+        _window_units_sizes[key] = sum(a.nbytes for a in units) if units is not None else 0
+        while len(_window_units_cache) > 1 and (
+            len(_window_units_cache) > _WINDOW_UNITS_CACHE_SIZE
+            or sum(_window_units_sizes.values()) > settings.COMPARISON_WINDOW_UNITS_CACHE_MAX_BYTES
+        ):
+            evicted, _ = _window_units_cache.popitem(last=False) # The entry just added is always kept
+            del _window_units_sizes[evicted]
+
+
+def _window_units(stock_symbol: str, level, index, first: int, last: int) -> Optional[Tuple[np.ndarray, ...]]:
+    """
+    Splits the window's slots [first, last) into whole blocks of a pyramid level plus the leftover
+    slots of blocks the window cuts through (read at 5-minute resolution as one-bar units), and
+    precomputes for every day what the cosine bound needs after min-max normalizing the window:
+    bar counts, count-weighted means and deviation norms per unit and column, and the day's norm.
+    Also returns the unit of every slot. None if no whole block fits in the window.
+    """
+    key = (stock_symbol, index.meta["source_mtime_ns"], level.minutes, first, last)
+    with _window_units_lock:
+        if key in _window_units_cache:
+            _window_units_cache.move_to_end(key)
+            return _window_units_cache[key]
+
+    grid_minutes = index.first_slot_minute + np.arange(index.num_slots) * index.interval_minutes
+    slot_blocks = grid_minutes // level.minutes
+    outside_blocks = np.concatenate((slot_blocks[:first], slot_blocks[last:]))
+    window_blocks = np.unique(slot_blocks[first:last])
+    whole_blocks = window_blocks[~np.isin(window_blocks, outside_blocks)]
+    whole_blocks = whole_blocks[(whole_blocks >= level.first_block) & (whole_blocks < level.first_block + level.num_blocks)]
+    units = None
+    if len(whole_blocks):
+        blocks = whole_blocks - level.first_block
+        edge_slots = np.arange(first, last)[~np.isin(slot_blocks[first:last], whole_blocks)]
+        edge_bars = np.asarray(index.bars[:, edge_slots, :4])
+        edge_valid = np.asarray(index.valid[:, edge_slots])
+        counts = np.concatenate((level.count[:, blocks], edge_valid.astype(np.int32)), axis=1)
+        raw_means = np.concatenate((level.mean[:, blocks], np.where(edge_valid[:, :, None], edge_bars, 0.0)), axis=1)
+        raw_m2 = np.concatenate((level.m2[:, blocks], np.zeros(edge_bars.shape)), axis=1)
+        data_min = np.minimum(level.minimum[:, blocks].min(axis=1), np.where(edge_valid[:, :, None], edge_bars, np.inf).min(axis=1, initial=np.inf))
+        data_max = np.maximum(level.maximum[:, blocks].max(axis=1), np.where(edge_valid[:, :, None], edge_bars, -np.inf).max(axis=1, initial=-np.inf))
+        data_min[np.isposinf(data_min)] = 0.0 # Days without a bar in the window (never eligible): keeps their statistics finite
+        data_range = data_max - data_min
+        data_range[data_range < 10 * np.finfo(np.float64).eps] = 1.0 # Same rule as MinMaxScaler
+
+        means = (raw_means - data_min[:, None, :]) / data_range[:, None, :]
+        m2 = raw_m2 / data_range[:, None, :] ** 2
+        weighted_means = counts[:, :, None] * means
+        day_norms = np.sqrt((weighted_means * means).sum(axis=(1, 2)) + m2.sum(axis=(1, 2)))
+
+        slot_units = np.full(index.num_slots, -1)
+        window_slots = np.arange(first, last)
+        is_whole = np.isin(slot_blocks[window_slots], whole_blocks)
+        slot_units[window_slots[is_whole]] = np.searchsorted(whole_blocks, slot_blocks[window_slots[is_whole]])
+        slot_units[edge_slots] = len(whole_blocks) + np.arange(len(edge_slots))
+        units = (counts, weighted_means, np.sqrt(m2), day_norms, slot_units)
+
+    _cache_window_units(key, units)
+    return units
+
+
+def _pyramid_upper_bounds(units: Tuple[np.ndarray, ...], day_positions: np.ndarray, query_slots: np.ndarray, query_values: np.ndarray, query_norm: float) -> np.ndarray:
+    """
+    Upper bound on each day's cosine score from per-unit statistics, without the 5-minute bars of whole blocks.
+
+    With bars grouped into the same units as the query (equal bar counts per unit, so units cover the
+    same vector positions), the normalized dot product splits per unit and column into
+    count * mean_a * mean_q plus the product of the deviation vectors, which Cauchy-Schwarz bounds by
+    sqrt(m2_a) * sqrt(m2_q). Days whose unit counts differ from the query's get +inf (no bound);
+    days with NaN bars get NaN, as their exact score is NaN too.
+    """
+    counts, weighted_means, deviation_norms, day_norms, slot_units = units
+    query_units = slot_units[query_slots]
+    num_units = counts.shape[1]
+    query_counts = np.bincount(query_units, minlength=num_units)
+    query_means = np.stack([np.bincount(query_units, weights=query_values[:, c], minlength=num_units) for c in range(4)], axis=1)
+    query_means /= np.maximum(query_counts, 1)[:, None]
+    query_m2 = np.stack([np.bincount(query_units, weights=(query_values[:, c] - query_means[query_units, c]) ** 2, minlength=num_units) for c in range(4)], axis=1)
+
+    dot_bound = (
+        np.einsum("nuc,uc->n", weighted_means[day_positions], query_means)
+        + np.einsum("nuc,uc->n", deviation_norms[day_positions], np.sqrt(query_m2))
+    )
+    norms = day_norms[day_positions] * query_norm
+    bounds = np.full(len(day_positions), np.inf)
+    bounded = (counts[day_positions] == query_counts).all(axis=1) & ~(norms <= 1e-12)
+    bounds[bounded] = dot_bound[bounded] / norms[bounded] + 1e-9 # Slack for rounding against the exact score
+    return bounds
+
+
+def _coarse_to_fine_cosine(
+    stock_symbol: str,
+    df_today_window: pd.DataFrame,
+    query_pattern: np.ndarray,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    similarity_threshold: float,
+    num_results: int,
+    exclude_date: Optional[dt_date] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> Optional[Tuple[List[dt_date], np.ndarray]]:
+    """
+    Cosine scoring that bounds every eligible day from the 60m/30m/15m pyramid first, then rescores at
+    5-minute resolution only the days whose bound can still reach the threshold and the running k-th
+    best score. Pruned days are returned with a NaN score; they provably cannot be in the top-k, so
+    _select_top_k gives exactly the same result as scoring every day.
+    Returns None when the shortcut does not apply (no exact slot grid, or no pyramid block fits
+    inside the window), and the caller scores all days instead.
+    """
+    timings = timings if timings is not None else {}
+    index = pattern_index.get_pattern_index(stock_symbol)
+    pyramid = get_resolution_pyramid(stock_symbol)
+    if index is None or not index.is_exact or pyramid is None or not pyramid.levels:
+        return None
+    if len(pyramid.day_dates) != index.num_days or not np.array_equal(pyramid.day_dates, index.dates):
+        return None
+
+    stage_start = time.perf_counter()
+    pattern_length = len(df_today_window)
+    first, last = index.slot_range(query_start_time, query_end_time)
+    query_timestamps = pd.to_datetime(df_today_window["date"])
+    query_offsets = (query_timestamps.dt.hour * 60 + query_timestamps.dt.minute).to_numpy() - index.first_slot_minute
+    query_slots = query_offsets // index.interval_minutes
+    if (query_offsets % index.interval_minutes).any() or (query_slots < first).any() or (query_slots >= last).any():
+        return None
+    query_values = query_pattern.reshape(pattern_length, 4)
+    query_norm = float(np.linalg.norm(query_pattern))
+
+    # Eligibility is the same rule as stack_day_windows: exactly pattern_length bars in the window
+    _, window_valid = index.window(query_start_time, query_end_time)
+    eligible = window_valid.sum(axis=1) == pattern_length
+    if exclude_date is not None:
+        eligible &= index.dates != np.datetime64(exclude_date, "D")
+    eligible_days = np.flatnonzero(eligible)
+
+    scores = np.full(len(eligible_days), np.nan)
+    batch_size = max(64, 4 * num_results)
+
+    def rescore(batch: np.ndarray):
+        windows = index.day_windows(eligible_days[batch], query_start_time, query_end_time, pattern_length)
+        scores[batch] = _cosine_similarity_batch(_normalize_ohlc_batch(windows), query_pattern)
+
+    def pruning_floor() -> float:
+        # A day can only make the top-k if its bound reaches the threshold and the k-th best exact score so far
+        exact_so_far = scores[np.isfinite(scores)]
+        if len(exact_so_far) < num_results:
+            return similarity_threshold
+        return max(similarity_threshold, np.partition(exact_so_far, len(exact_so_far) - num_results)[len(exact_so_far) - num_results])
+
+    # Coarsest level first; each finer level only bounds the days the previous ones could not rule out.
+    # Every level gives a valid upper bound, so the tightest (minimum) one is kept. The best days by the
+    # coarsest bound are rescored right away, so the k-th best score prunes the finer levels too.
+    bounds = np.full(len(eligible_days), np.inf)
+    active = np.arange(len(eligible_days))
+    used_levels = []
+    for minutes in sorted(pyramid.levels, reverse=True):
+        units = _window_units(stock_symbol, pyramid.levels[minutes], index, first, last)
+        if units is None:
+            continue
+        bounds[active] = np.minimum(bounds[active], _pyramid_upper_bounds(units, eligible_days[active], query_slots, query_values, query_norm))
+        active = active[bounds[active] >= similarity_threshold] # NaN bounds drop out here
+        if not used_levels and len(active):
+            rescore(active[np.argsort(-bounds[active], kind="stable")[:batch_size]])
+        active = active[bounds[active] >= pruning_floor()]
+        used_levels.append(minutes)
+    if not used_levels:
+        return None
+    timings["coarse_bound"] = time.perf_counter() - stage_start
+
+    # Refine the rest in descending bound order until no remaining bound can beat the k-th best exact score
+    stage_start = time.perf_counter()
+    order = active[np.argsort(-bounds[active], kind="stable")]
+    order = order[np.isnan(scores[order])]
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        batch = batch[bounds[batch] >= pruning_floor()]
+        if not len(batch):
+            break # Sorted by bound, so no later day can make the top-k either
+        rescore(batch)
+    timings["refine"] = time.perf_counter() - stage_start
+
+    if settings.COMPARISON_DEBUG_STATS:
+        print(f"Coarse-to-fine for {stock_symbol}: {len(eligible_days)} days, "
+              f"{int(np.isfinite(scores).sum())} rescored at 5m (levels {used_levels})")
+    return index.dates[eligible_days].tolist(), scores
+
+
+def _score_symbol_days(
+    stock_symbol: str,
+    df_today_window: pd.DataFrame,
+    query_pattern: np.ndarray,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    metric: str,
+    similarity_threshold: float,
+    num_results: int,
+    exclude_date: Optional[dt_date] = None,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[List[dt_date], np.ndarray]:
+    """
+    Scores a symbol's historical days against the query window with the chosen metric.
+    cosine keeps the original rule (only days with exactly as many bars as the query);
+    zeuclidean and dtw also score days with missing bars (see similarity_metrics).
+    """
+    timings = timings if timings is not None else {}
+    if metric == "cosine":
+        # Long windows: prune on the coarse pyramid before touching 5-minute bars (same top-k)
+        if len(df_today_window) >= settings.COMPARISON_COARSE_MIN_BARS:
+            coarse_result = _coarse_to_fine_cosine(
+                stock_symbol, df_today_window, query_pattern, query_start_time, query_end_time,
+                similarity_threshold, num_results, exclude_date=exclude_date, timings=timings
+            )
+            if coarse_result is not None:
+                return coarse_result
+        stage_start = time.perf_counter()
+        day_dates, windows = _candidate_windows(stock_symbol, query_start_time, query_end_time, len(df_today_window), exclude_date=exclude_date)
+        timings["stack_windows"] = time.perf_counter() - stage_start
+        return day_dates, _score_windows(windows, query_pattern, timings=timings)
+
+    if metric not in similarity_metrics.SUPPORTED_METRICS:
+        raise ValueError(f"Unknown similarity metric '{metric}'. Choose one of {', '.join(similarity_metrics.SUPPORTED_METRICS)}.")
+    index = pattern_index.get_pattern_index(stock_symbol)
+    if index is None or not index.is_exact:
+        raise ValueError(f"The '{metric}' metric needs slot-aligned intraday data, which is not available for {stock_symbol}.")
+
+    stage_start = time.perf_counter()
+    day_dates, windows, valid = index.slot_aligned_windows(query_start_time, query_end_time, exclude_date=exclude_date)
+    query_window, query_valid = index.align_to_window(df_today_window, query_start_time, query_end_time)
+    timings["stack_windows"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    min_coverage = settings.COMPARISON_MIN_BAR_COVERAGE
+    if metric == "zeuclidean":
+        scores = similarity_metrics.zeuclidean_scores(windows, valid, query_window, query_valid, min_coverage=min_coverage)
+    else:
+        min_bars = max(2, int(np.ceil(min_coverage * valid.shape[1])))
+        kept_days, day_series = similarity_metrics.compact_valid_bars(windows, valid, min_bars)
+        query_series = df_today_window[["open", "high", "low", "close"]].to_numpy(dtype=np.float64)
+        dtw_stats: Dict[str, int] = {}
+        kept_scores = similarity_metrics.dtw_scores(
+            day_series, query_series, similarity_threshold, num_results,
+            window_ratio=settings.COMPARISON_DTW_WINDOW_RATIO, stats=dtw_stats
+        )
+        scores = np.full(len(day_dates), np.nan)
+        scores[kept_days] = kept_scores
+        if settings.COMPARISON_DEBUG_STATS:
+            print(f"DTW cascade for {stock_symbol}: {len(day_series)} candidates, {dtw_stats}")
+    timings["score"] = time.perf_counter() - stage_start
+    return day_dates, scores
+
+
+def _approximate_top_k(
+    symbols: List[str],
+    query_pattern: np.ndarray,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    pattern_length: int,
+    similarity_threshold: float,
+    num_results: int,
+    exclude_date: Optional[dt_date],
+    probe_radius: Optional[int] = None
+) -> List[Tuple[str, dt_date, float]]:
+    """Top-k (symbol, date, score) from the persisted LSH index for these symbols and window, rescored exactly."""
+    index = ann_index.get_ann_index(symbols, query_start_time, query_end_time, pattern_length)
+    if index is None:
+        return []
+    radius = probe_radius if probe_radius is not None else settings.ANN_DEFAULT_PROBE_RADIUS
+    return index.query(query_pattern, similarity_threshold, num_results, exclude_date=exclude_date, probe_radius=radius)
+
+
+def _build_pattern_result(
+    df_historical_full: pd.DataFrame,
+    day_row_index,
+    hist_date: dt_date,
+    similarity: float,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    full_day_cache: Optional[Dict[dt_date, List[Dict[str, Any]]]] = None
+) -> Dict[str, Any]:
+    """
+    Builds the response record (window and full-day OHLC rows) for one matched historical day.
+    full_day_cache shares the full-day records of a day between the result sets of one request.
+    """
+    # Get full day data for this historical similar day (a positional slice via the day index)
+    full_day_hist_df = day_row_index.day_slice(df_historical_full, hist_date)
+    group_df = _filter_by_time_window(full_day_hist_df, query_start_time, query_end_time)
+    full_day_records = full_day_cache.get(hist_date) if full_day_cache is not None else None
+    if full_day_records is None:
+        full_day_records = full_day_hist_df[["date", "open", "high", "low", "close"]].to_dict(orient="records")
+        if full_day_cache is not None:
+            full_day_cache[hist_date] = full_day_records
+    return {
+        "date": hist_date.isoformat(),
+        "similarity_score": float(similarity),
+        "window_pattern_data": group_df[["date", "open", "high", "low", "close"]].to_dict(orient="records"),
+        "full_day_data": full_day_records
+    }
 
 
 def find_similar_historical_patterns(
@@ -43,109 +491,317 @@ def find_similar_historical_patterns(
     query_end_time: dt.time,   # Python time object
     similarity_threshold: float,
     num_results: int,
-    query_date_override: dt.date | None = None # Ensure this parameter exists
+    query_date_override: dt.date | None = None, # Ensure this parameter exists
+    timings: Optional[Dict[str, float]] = None,
+    use_approximate_index: bool = False,
+    probe_radius: Optional[int] = None,
+    metric: str = "cosine",
+    query_source: str = "yfinance"
 ) -> List[Dict[str, Any]]:
     """
     Finds historical intraday patterns similar to the specified stock's pattern.
     If query_date_override is provided, it uses that date. Otherwise, it uses today.
+    query_source says where the query day's bars come from ("yfinance", "local" or "fixture", see query_sources).
+    If a timings dict is passed, it is filled with the duration (seconds) of each stage.
+    With use_approximate_index, candidates come from the LSH index (see ann_index) and are
+    rescored exactly; probe_radius trades recall for latency.
+    metric selects the similarity measure: "cosine" (default), "zeuclidean" or "dtw".
     """
+    run_timings: Dict[str, float] = {}
     # Determine the date to fetch data for the query pattern
     final_query_date = query_date_override if query_date_override else dt.datetime.now(dt.timezone.utc).date()
 
     # 1. Load historical data for the stock
-    df_historical_full = load_historical_data(stock_symbol)
+    stage_start = time.perf_counter()
+    df_historical_full = get_historical_frame(stock_symbol) # Shared read-only frame, not a copy
     if df_historical_full is None or df_historical_full.empty:
         raise ValueError(f"No historical data found for symbol {stock_symbol}.")
-
-    # Add 'time' column if not present from CSV
-    if 'time' not in df_historical_full.columns and 'date' in df_historical_full.columns:
-        df_historical_full['time'] = pd.to_datetime(df_historical_full['date']).dt.time
+    day_row_index = get_day_row_index(stock_symbol)
+    run_timings["load_history"] = time.perf_counter() - stage_start
     
-    # 2. Fetch "today's" data (query pattern) using yfinance for 5-min interval
-    # We need data for today up to query_end_time
+    # 2. Fetch "today's" data (query pattern), 5-min bars from the query source
+    stage_start = time.perf_counter()
     today_date = final_query_date
-    # yfinance intraday often needs start and end datetimes for the current day
-    # Fetch a bit more to ensure we cover the window, e.g., from market open
-    yf_start_dt = datetime.combine(today_date, dt_time(hour=0, minute=0), tzinfo=timezone.utc) # Start of today UTC
-    yf_end_dt = datetime.combine(today_date, dt_time(hour=23, minute=59), tzinfo=timezone.utc) # End of today UTC
-    
-    print(f"Fetching yfinance data for {stock_symbol} on {today_date} from {yf_start_dt} to {yf_end_dt}")
-    # For 5-min data, interval='5m'. yfinance often requires start/end to be within last 60 days for <1d intervals.
-    # If query_end_time is far in future, this might be empty.
-    # For intraday, it's common to fetch data for the "current" trading day.
-    # Let's assume the user provides a time window for the *current* trading day.
-    
-    # Ensure we're fetching data for a period that yfinance supports for 5m interval
-    # Typically, the start date can't be more than 60 days in the past for intervals < 1d.
-    # For "today's" pattern, we only need today's data.
-    
-    # Define a narrow period for yfinance for today.
-    # Get the current time and go back a bit to ensure we have data if we are mid-day.
-    now_utc = datetime.now(timezone.utc)
-    yf_query_start = (now_utc - timedelta(days=1)).strftime('%Y-%m-%d') # Start from yesterday to be safe
-    yf_query_end = (now_utc + timedelta(days=1)).strftime('%Y-%m-%d')   # End tomorrow to be safe
-    
-    # Create Ticker object with .NS suffix and get data
-    ticker = yf.Ticker(f"{stock_symbol}.NS")
-    df_today_full_day = ticker.history(interval="5m", period="1d")
-    
-    if df_today_full_day.empty:
-        raise ValueError(f"Could not fetch today's 5-min data for {stock_symbol} via yfinance.")
+    df_today_window = _fetch_query_window(stock_symbol, today_date, query_start_time, query_end_time, query_source)
+    today_pattern_normalized = _normalize_ohlc_pattern(df_today_window)
+    if today_pattern_normalized.size == 0:
+        raise ValueError("Today's pattern (query pattern) is empty or could not be normalized.")
+    run_timings["fetch_query"] = time.perf_counter() - stage_start
 
-    # Filter yfinance data to today only and convert index to 'date' column
-    df_today_full_day = df_today_full_day[df_today_full_day.index.date == today_date].reset_index()
-    df_today_full_day.rename(columns={'Datetime': 'date', 'Open':'open', 'High':'high', 'Low':'low', 'Close':'close', 'Volume':'volume'}, inplace=True) # Align column names
-    if 'date' not in df_today_full_day.columns:
-         raise ValueError("yfinance data missing 'date' (Datetime) column after processing.")
+    # 3. Process historical data
+    pattern_length = len(df_today_window)
+    if use_approximate_index and metric != "cosine":
+        raise ValueError("The approximate index only supports the cosine metric.")
+    if use_approximate_index:
+        stage_start = time.perf_counter()
+        matches = _approximate_top_k(
+            [stock_symbol], today_pattern_normalized, query_start_time, query_end_time, pattern_length,
+            similarity_threshold, num_results, today_date, probe_radius
+        )
+        day_dates = [hist_date for _, hist_date, _ in matches]
+        scores = np.array([score for _, _, score in matches], dtype=np.float64)
+        top_indices = np.arange(len(matches))
+        run_timings["ann_query"] = time.perf_counter() - stage_start
+    else:
+        # Score every eligible historical day in one vectorized pass
+        day_dates, scores = _score_symbol_days(
+            stock_symbol, df_today_window, today_pattern_normalized, query_start_time, query_end_time,
+            metric, similarity_threshold, num_results, exclude_date=today_date, timings=run_timings
+        )
 
-    df_today_window = _filter_by_time_window(df_today_full_day, query_start_time, query_end_time)
+        stage_start = time.perf_counter()
+        top_indices = _select_top_k(scores, similarity_threshold, num_results)
+        run_timings["select_top_k"] = time.perf_counter() - stage_start
 
-    if df_today_window.empty:
-        raise ValueError(f"No data found for {stock_symbol} in today's yfinance data for the window {query_start_time}-{query_end_time}.")
+    stage_start = time.perf_counter()
+    similar_patterns_data = [
+        _build_pattern_result(df_historical_full, day_row_index, day_dates[day_idx], scores[day_idx], query_start_time, query_end_time)
+        for day_idx in top_indices
+    ]
+    run_timings["build_results"] = time.perf_counter() - stage_start
 
-    today_pattern_normalized = _normalize_ohlc_pattern(df_today_window)
-    if today_pattern_normalized.size == 0:
+    if timings is not None:
+        timings.update(run_timings)
+    print(f"Pattern search timings for {stock_symbol} ({len(day_dates)} days scored): "
+          + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in run_timings.items()))
+
+    return similar_patterns_data
+
+
+def find_similar_patterns_multi_window(
+    stock_symbol: str,
+    windows: List[Dict[str, Any]],
+    query_date_override: Optional[dt.date] = None,
+    metric: str = "cosine",
+    timings: Optional[Dict[str, float]] = None,
+    query_source: str = "yfinance"
+) -> List[Dict[str, Any]]:
+    """
+    find_similar_historical_patterns for several windows of the same symbol and query day.
+    `windows` holds dicts with start_time, end_time (time objects), similarity_threshold and num_results.
+    The query day is fetched and the history loaded once; with an exact pattern index, every day's
+    bar count in every window comes from one cumulative count over the index, and each window's
+    candidates are gathered from the shared memory-mapped tensor. Returns one result set per window,
+    in order: {"start_time", "end_time", "similarity_threshold", "patterns", "message"}.
+    """
+    run_timings: Dict[str, float] = {}
+    final_query_date = query_date_override if query_date_override else dt.datetime.now(dt.timezone.utc).date()
+
+    stage_start = time.perf_counter()
+    df_historical_full = get_historical_frame(stock_symbol) # Shared read-only frame, not a copy
+    if df_historical_full is None or df_historical_full.empty:
+        raise ValueError(f"No historical data found for symbol {stock_symbol}.")
+    day_row_index = get_day_row_index(stock_symbol)
+    index = pattern_index.get_pattern_index(stock_symbol) if metric == "cosine" else None
+    run_timings["load_history"] = time.perf_counter() - stage_start
+
+    # One query-day fetch for every window
+    stage_start = time.perf_counter()
+    df_today_full_day = query_sources.fetch_query_day(stock_symbol, final_query_date, query_source)
+    today_minutes = _minute_of_day(df_today_full_day)
+    query_windows = [
+        _filter_by_time_window(df_today_full_day, window["start_time"], window["end_time"], minute_of_day=today_minutes)
+        for window in windows
+    ]
+    run_timings["fetch_query"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    bar_counts = None
+    if index is not None and index.is_exact:
+        bar_counts = index.window_bar_counts([(window["start_time"], window["end_time"]) for window in windows])
+    run_timings["bar_counts"] = time.perf_counter() - stage_start
+
+    results: List[Dict[str, Any]] = []
+    full_day_cache: Dict[dt_date, List[Dict[str, Any]]] = {} # Nested windows tend to match the same days
+    run_timings["score"] = 0.0
+    run_timings["build_results"] = 0.0
+    for position, (window, df_today_window) in enumerate(zip(windows, query_windows)):
+        start_time_obj, end_time_obj = window["start_time"], window["end_time"]
+        result = {"start_time": start_time_obj, "end_time": end_time_obj, "similarity_threshold": window["similarity_threshold"], "patterns": [], "message": None}
+        results.append(result)
+        query_pattern = _normalize_ohlc_pattern(df_today_window)
+        if query_pattern.size == 0:
+            result["message"] = f"No data found for {stock_symbol} in the {query_source} query data of {final_query_date} for the window {start_time_obj}-{end_time_obj}."
+            continue
+
+        stage_start = time.perf_counter()
+        if bar_counts is not None and len(df_today_window) < settings.COMPARISON_COARSE_MIN_BARS:
+            day_dates, candidate_windows = index.stack_day_windows(
+                start_time_obj, end_time_obj, len(df_today_window), exclude_date=final_query_date, bar_counts=bar_counts[:, position]
+            )
+            scores = _score_windows(candidate_windows, query_pattern)
+        else: # Other metrics, long windows (coarse-to-fine) or no exact index: the single-window path
+            day_dates, scores = _score_symbol_days(
+                stock_symbol, df_today_window, query_pattern, start_time_obj, end_time_obj,
+                metric, window["similarity_threshold"], window["num_results"], exclude_date=final_query_date
+            )
+        top_indices = _select_top_k(scores, window["similarity_threshold"], window["num_results"])
+        run_timings["score"] += time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        result["patterns"] = [
+            _build_pattern_result(
+                df_historical_full, day_row_index, day_dates[day_idx], scores[day_idx], start_time_obj, end_time_obj, full_day_cache=full_day_cache
+            )
+            for day_idx in top_indices
+        ]
+        run_timings["build_results"] += time.perf_counter() - stage_start
+        if not result["patterns"]:
+            result["message"] = "No sufficiently similar historical patterns found."
+
+    if timings is not None:
+        timings.update(run_timings)
+    print(f"Multi-window pattern search timings for {stock_symbol} ({len(windows)} windows): "
+          + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in run_timings.items()))
+    return results
+
+
+# Process pool for cross-symbol searches, created on first use and reused across requests
+_search_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_search_pool() -> ProcessPoolExecutor:
+    global _search_pool
+    if _search_pool is None:
+        _search_pool = ProcessPoolExecutor(max_workers=settings.COMPARISON_SEARCH_WORKERS)
+    return _search_pool
+
+
+def _top_k_for_symbol(
+    stock_symbol: str,
+    df_today_window: pd.DataFrame,
+    query_pattern: np.ndarray,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    metric: str,
+    similarity_threshold: float,
+    num_results: int,
+    exclude_date: Optional[dt_date]
+) -> Tuple[str, List[dt_date], np.ndarray]:
+    """Worker task: scores one symbol's library against the query and returns its local top-k (dates, scores)."""
+    day_dates, scores = _score_symbol_days(
+        stock_symbol, df_today_window, query_pattern, query_start_time, query_end_time,
+        metric, similarity_threshold, num_results, exclude_date=exclude_date
+    )
+    top_indices = _select_top_k(scores, similarity_threshold, num_results)
+    return stock_symbol, [day_dates[i] for i in top_indices], scores[top_indices]
+
+
+def query_window_pattern(df_query_day: Optional[pd.DataFrame], query_start_time: dt_time, query_end_time: dt_time) -> Tuple[pd.DataFrame, np.ndarray]:
+    """The query day's rows inside the time window and their normalized pattern (empty if there are none)."""
+    df_today_window = _filter_by_time_window(df_query_day, query_start_time, query_end_time) if df_query_day is not None else pd.DataFrame()
+    return df_today_window, _normalize_ohlc_pattern(df_today_window)
+
+
+def submit_symbol_search(
+    stock_symbol: str,
+    df_today_window: pd.DataFrame,
+    query_pattern: np.ndarray,
+    query_start_time: dt_time,
+    query_end_time: dt_time,
+    metric: str,
+    similarity_threshold: float,
+    num_results: int,
+    exclude_date: Optional[dt_date]
+) -> Future:
+    """Scores one symbol's library against the query in the search pool. The future's result is (symbol, top-k dates, their scores)."""
+    return _get_search_pool().submit(
+        _top_k_for_symbol, stock_symbol, df_today_window, query_pattern, query_start_time, query_end_time,
+        metric, similarity_threshold, num_results, exclude_date
+    )
+
+
+def build_symbol_patterns(stock_symbol: str, day_dates: List[dt_date], scores: np.ndarray, query_start_time: dt_time, query_end_time: dt_time) -> List[Dict[str, Any]]:
+    """Response records (as in find_similar_historical_patterns) of a symbol's matched days."""
+    df_historical_full = get_historical_frame(stock_symbol)
+    day_row_index = get_day_row_index(stock_symbol)
+    return [
+        _build_pattern_result(df_historical_full, day_row_index, day, score, query_start_time, query_end_time)
+        for day, score in zip(day_dates, scores)
+    ]
+
+
+def find_similar_patterns_across_symbols(
+    stock_symbol: str,
+    query_start_time: dt.time,
+    query_end_time: dt.time,
+    similarity_threshold: float,
+    num_results: int,
+    query_date_override: dt.date | None = None,
+    symbols: Optional[List[str]] = None,
+    timings: Optional[Dict[str, float]] = None,
+    use_approximate_index: bool = False,
+    probe_radius: Optional[int] = None,
+    metric: str = "cosine",
+    query_source: str = "yfinance"
+) -> List[Dict[str, Any]]:
+    """
+    Compares the query symbol's pattern against every symbol in the historical library
+    (or the given `symbols`). Each symbol is scored in the process pool and only its local
+    top-k comes back; the global top-k is merged here and each result is tagged by symbol.
+    With use_approximate_index, a single LSH index over all the symbols replaces the fan-out.
+    metric and query_source are as in find_similar_historical_patterns.
+    """
+    if use_approximate_index and metric != "cosine":
+        raise ValueError("The approximate index only supports the cosine metric.")
+    run_timings: Dict[str, float] = {}
+    final_query_date = query_date_override if query_date_override else dt.datetime.now(dt.timezone.utc).date()
+
+    stage_start = time.perf_counter()
+    df_today_window = _fetch_query_window(stock_symbol, final_query_date, query_start_time, query_end_time, query_source)
+    query_pattern = _normalize_ohlc_pattern(df_today_window)
+    if query_pattern.size == 0:
         raise ValueError("Today's pattern (query pattern) is empty or could not be normalized.")
+    run_timings["fetch_query"] = time.perf_counter() - stage_start
 
-    # 3. Process historical data
-    df_historical_windowed = _filter_by_time_window(df_historical_full, query_start_time, query_end_time)
-    
-    # Group by date to get individual historical trading days within the window
-    # Ensure 'date' column is datetime64[ns] for dt accessor
-    df_historical_windowed['date_only'] = pd.to_datetime(df_historical_windowed['date']).dt.date
-    historical_day_groups = df_historical_windowed.groupby('date_only')
+    search_symbols = [s.upper() for s in symbols] if symbols else list_available_symbols()
+    if not search_symbols:
+        raise ValueError("No historical data available to search.")
 
+    if use_approximate_index:
+        stage_start = time.perf_counter()
+        matches = _approximate_top_k(
+            search_symbols, query_pattern, query_start_time, query_end_time, len(df_today_window),
+            similarity_threshold, num_results, final_query_date, probe_radius
+        )
+        candidates = [(symbol, hist_date) for symbol, hist_date, _ in matches]
+        all_scores = np.array([score for _, _, score in matches], dtype=np.float64)
+        top_indices = np.arange(len(matches))
+        run_timings["ann_query"] = time.perf_counter() - stage_start
+    else:
+        # Fan out: each worker maps the symbol's pattern index and scores all of its days at once
+        stage_start = time.perf_counter()
+        futures = [
+            submit_symbol_search(
+                symbol, df_today_window, query_pattern, query_start_time, query_end_time,
+                metric, similarity_threshold, num_results, final_query_date
+            )
+            for symbol in search_symbols
+        ]
+        per_symbol_results = [future.result() for future in futures]
+        run_timings["score_symbols"] = time.perf_counter() - stage_start
+
+        # Merge into a global top-k; ties keep symbol order, then date order
+        stage_start = time.perf_counter()
+        candidates = [(symbol, day) for symbol, day_dates, _ in per_symbol_results for day in day_dates]
+        all_scores = np.concatenate([scores for _, _, scores in per_symbol_results]) if candidates else np.array([])
+        top_indices = _select_top_k(all_scores, similarity_threshold, num_results)
+        run_timings["merge_top_k"] = time.perf_counter() - stage_start
+
+    # Only the winning symbols' DataFrames are needed to build the response rows
+    stage_start = time.perf_counter()
     similar_patterns_data = []
+    for idx in top_indices:
+        match_symbol, hist_date = candidates[idx]
+        df_historical_full = get_historical_frame(match_symbol)
+        day_row_index = get_day_row_index(match_symbol)
+        result = _build_pattern_result(df_historical_full, day_row_index, hist_date, all_scores[idx], query_start_time, query_end_time)
+        result["symbol"] = match_symbol
+        similar_patterns_data.append(result)
+    run_timings["build_results"] = time.perf_counter() - stage_start
 
-    for hist_date, group_df in historical_day_groups:
-        if hist_date == today_date: # Skip comparing today with itself if it's in historical
-            continue
+    if timings is not None:
+        timings.update(run_timings)
+    print(f"Cross-symbol pattern search for {stock_symbol} over {len(search_symbols)} symbols: "
+          + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in run_timings.items()))
 
-        hist_pattern_normalized = _normalize_ohlc_pattern(group_df)
-        
-        if hist_pattern_normalized.size == today_pattern_normalized.size and today_pattern_normalized.size > 0:
-            # Compute Cosine Similarity
-            dot_product = np.dot(today_pattern_normalized, hist_pattern_normalized)
-            norm_today = np.linalg.norm(today_pattern_normalized)
-            norm_hist = np.linalg.norm(hist_pattern_normalized)
-            
-            if norm_today == 0 or norm_hist == 0: # Avoid division by zero if a pattern is all zeros
-                similarity = 0.0
-            else:
-                similarity = dot_product / (norm_today * norm_hist)
-            
-            if similarity >= similarity_threshold:
-                # Get full day data for this historical similar day
-                full_day_hist_df = df_historical_full[pd.to_datetime(df_historical_full['date']).dt.date == hist_date]
-                
-                similar_patterns_data.append({
-                    "date": hist_date.isoformat(),
-                    "similarity_score": float(similarity),
-                    "window_pattern_data": group_df[["date", "open", "high", "low", "close"]].to_dict(orient="records"),
-                    "full_day_data": full_day_hist_df[["date", "open", "high", "low", "close"]].to_dict(orient="records")
-                })
-
-    # Sort by highest similarity and take top N
-    similar_patterns_data.sort(key=lambda x: x["similarity_score"], reverse=True)
-    
-    return similar_patterns_data[:num_results]
\ No newline at end of file
+    return similar_patterns_data
@@ -0,0 +1,136 @@
+# backend/app/core_logic/comparison/query_sources.py
+# Where a comparison's query day (the bars the historical days are compared against) comes from:
+#   "yfinance" - live 5-minute bars of the current session (the default),
+#   "local"    - the session as stored in the historical data, for any date it holds,
+#   "fixture"  - a recorded session under QUERY_FIXTURE_PATH ({SYMBOL}_{YYYY-MM-DD}.csv).
+# local and fixture need no network, so queries can be replayed deterministically (benchmarks,
+# regression runs). With QUERY_FIXTURE_RECORD set, every live fetch is also saved as a fixture.
+import datetime as dt
+import pandas as pd
+import yfinance as yf
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List
+from ...config import settings
+from .data_loader import get_historical_frame, get_day_row_index
+
+QUERY_SOURCES = ["yfinance", "local", "fixture"]
+_NSE_TIMEZONE = "Asia/Kolkata"
+_YF_INTRADAY_DAYS = 60 # yfinance only serves 5-minute bars for the most recent 60 days
+_YF_COLUMNS = {'Datetime': 'date', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}
+
+
+def _yfinance_range(query_date: dt.date) -> Dict[str, str]:
+    """start/end arguments selecting the query date's 5-min bars (end is exclusive). ValueError outside yfinance's intraday range."""
+    today = dt.datetime.now(dt.timezone.utc).date()
+    if query_date > today + timedelta(days=1) or query_date < today - timedelta(days=_YF_INTRADAY_DAYS - 1):
+        raise ValueError(f"yfinance has no 5-minute data for {query_date}: only the last {_YF_INTRADAY_DAYS} days are available (use the local or fixture source for older dates).")
+    return {"start": query_date.isoformat(), "end": (query_date + timedelta(days=1)).isoformat()}
+
+
+def _yfinance_day(stock_symbol: str, query_date: dt.date) -> pd.DataFrame:
+    """Fetches the query day's 5-min bars for a symbol from yfinance (whole session, CSV column names)."""
+    print(f"Fetching yfinance data for {stock_symbol} on {query_date}")
+    # Create Ticker object with .NS suffix and get data
+    ticker = yf.Ticker(f"{stock_symbol}.NS")
+    df_query_day = ticker.history(interval="5m", **_yfinance_range(query_date))
+
+    # Keep the query day only (the index is in exchange time) and convert the index to a 'date' column
+    if not df_query_day.empty:
+        df_query_day = df_query_day[df_query_day.index.date == query_date].reset_index()
+    if df_query_day.empty:
+        raise ValueError(f"Could not fetch 5-min data for {stock_symbol} on {query_date} via yfinance.")
+    df_query_day.rename(columns=_YF_COLUMNS, inplace=True) # Align column names
+    if 'date' not in df_query_day.columns:
+         raise ValueError("yfinance data missing 'date' (Datetime) column after processing.")
+    return df_query_day
+
+
+def _yfinance_days(symbols: List[str], query_date: dt.date) -> Dict[str, pd.DataFrame]:
+    """Query-day 5-min bars of every symbol from a single multi-ticker yfinance download."""
+    tickers = [f"{symbol}.NS" for symbol in symbols]
+    print(f"Fetching yfinance data for {len(tickers)} symbols on {query_date} (one batched download)")
+    downloaded = yf.download(tickers, interval="5m", **_yfinance_range(query_date), group_by="ticker", threads=True, progress=False)
+    days: Dict[str, pd.DataFrame] = {}
+    if downloaded is None or downloaded.empty:
+        return days
+    if downloaded.index.tz is not None:
+        downloaded.index = downloaded.index.tz_convert(_NSE_TIMEZONE) # Mixed-exchange downloads come back in UTC
+    downloaded = downloaded[downloaded.index.date == query_date]
+    for symbol, ticker in zip(symbols, tickers):
+        if isinstance(downloaded.columns, pd.MultiIndex):
+            if ticker not in downloaded.columns.get_level_values(0):
+                continue
+            bars = downloaded[ticker]
+        else:
+            bars = downloaded
+        # The shared index has every ticker's timestamps: drop the bars this ticker does not have
+        bars = bars.dropna(subset=[c for c in ["Open", "High", "Low", "Close"] if c in bars.columns], how="all")
+        if bars.empty:
+            continue
+        days[symbol] = bars.rename_axis("Datetime").reset_index().rename(columns=_YF_COLUMNS)
+    return days
+
+
+def _local_day(stock_symbol: str, query_date: dt.date) -> pd.DataFrame:
+    """The session as stored in the symbol's historical data (empty if the date is not in it)."""
+    df = get_historical_frame(stock_symbol)
+    if df is None:
+        return pd.DataFrame(columns=["date", "open", "high", "low", "close", "volume"])
+    return get_day_row_index(stock_symbol).day_slice(df, query_date)
+
+
+def fixture_path(stock_symbol: str, query_date: dt.date) -> Path:
+    return Path(".") / settings.QUERY_FIXTURE_PATH / f"{stock_symbol.upper()}_{query_date.isoformat()}.csv"
+
+
+def _fixture_day(stock_symbol: str, query_date: dt.date) -> pd.DataFrame:
+    path = fixture_path(stock_symbol, query_date)
+    if not path.exists():
+        return pd.DataFrame(columns=["date", "open", "high", "low", "close", "volume"])
+    df = pd.read_csv(path)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def record_fixture(stock_symbol: str, query_date: dt.date, df: pd.DataFrame):
+    """Saves a query day's bars so the query can be replayed later with source="fixture" (an empty day is not recorded)."""
+    if df.empty:
+        print(f"Not recording a fixture for {stock_symbol} on {query_date}: no bars.")
+        return
+    path = fixture_path(stock_symbol, query_date)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df[[c for c in ["date", "open", "high", "low", "close", "volume"] if c in df.columns]].to_csv(path, index=False)
+
+
+def fetch_query_day(stock_symbol: str, query_date: dt.date, source: str = "yfinance") -> pd.DataFrame:
+    """The query day's bars of a symbol (CSV column names) from the given source. ValueError if there are none."""
+    if source == "yfinance":
+        df = _yfinance_day(stock_symbol, query_date)
+        if settings.QUERY_FIXTURE_RECORD:
+            record_fixture(stock_symbol, query_date, df)
+        return df
+    if source == "local":
+        df = _local_day(stock_symbol, query_date)
+    elif source == "fixture":
+        df = _fixture_day(stock_symbol, query_date)
+    else:
+        raise ValueError(f"Unknown query source '{source}'. Choose one of {', '.join(QUERY_SOURCES)}.")
+    if df.empty:
+        raise ValueError(f"No {source} query data for {stock_symbol} on {query_date}.")
+    return df
+
+
+def fetch_query_days(symbols: List[str], query_date: dt.date, source: str = "yfinance") -> Dict[str, pd.DataFrame]:
+    """Symbol -> the query day's bars for many symbols at once (one batched download for yfinance); symbols without data are missing."""
+    if source == "yfinance":
+        days = _yfinance_days(symbols, query_date)
+        if settings.QUERY_FIXTURE_RECORD:
+            for symbol, df in days.items():
+                record_fixture(symbol, query_date, df)
+        return days
+    if source not in QUERY_SOURCES:
+        raise ValueError(f"Unknown query source '{source}'. Choose one of {', '.join(QUERY_SOURCES)}.")
+    load_day = _local_day if source == "local" else _fixture_day
+    days = {symbol: load_day(symbol, query_date) for symbol in symbols}
+    return {symbol: df for symbol, df in days.items() if not df.empty}
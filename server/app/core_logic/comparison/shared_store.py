@@ -0,0 +1,405 @@
+# backend/app/core_logic/comparison/shared_store.py
+# Historical OHLCV published once as memory-mapped .npy files under COLUMNAR_CACHE_PATH, listed in a
+# manifest, and attached read-only by every process (uvicorn --workers N shares the pages through the
+# OS page cache instead of holding N private copies; point the path at /dev/shm to keep them in RAM).
+# Publish every CSV up front (from the backend root):  python -m app.core_logic.comparison.shared_store
+import argparse
+import datetime as dt
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Tuple
+import numpy as np
+import pandas as pd
+from ...config import settings
+
+try:
+    import fcntl
+except ImportError: # No flock on Windows: concurrent publishers then just repeat the same work
+    fcntl = None
+
+MANIFEST_VERSION = 1
+_MAX_LINEAGE = 64 # Earlier versions remembered per symbol, so caches of any of them can be extended instead of rebuilt
+_NS_PER_MINUTE = 60 * 1_000_000_000
+_NS_PER_DAY = 1440 * _NS_PER_MINUTE
+
+
+def _store_root() -> Path:
+    return Path(".") / settings.COLUMNAR_CACHE_PATH
+
+
+def _manifest_path() -> Path:
+    return _store_root() / "manifest.json"
+
+
+@contextmanager
+def file_lock(name: str):
+    """Exclusive cross-process lock on a file in the store root (held for the duration of the block)."""
+    root = _store_root()
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / name, "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write(path: Path):
+    """
+    Yields a temporary path next to `path`, unique to this writer, that replaces `path` once the block
+    completes: readers never see a half-written file and concurrent writers never share a temporary one.
+    The temporary file is removed if the block fails.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex[:12]}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def publish_lock(symbol: str):
+    """Held while a symbol is read from CSV and published, so concurrent workers parse it only once."""
+    return file_lock(f".{symbol.upper()}.lock")
+
+
+def file_digest(file_path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest() -> Dict[str, Any]:
+    """The store's manifest: {"version", "symbols": {SYMBOL: entry}} (empty if nothing is published)."""
+    try:
+        manifest = json.loads(_manifest_path().read_text())
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "symbols": {}}
+
+
+def _update_manifest(symbol: str, entry: Optional[Dict[str, Any]]):
+    """Sets (or removes, for None) one symbol's manifest entry; the manifest is replaced atomically."""
+    with file_lock(".manifest.lock"):
+        manifest = read_manifest()
+        if entry is None:
+            manifest["symbols"].pop(symbol, None)
+        else:
+            manifest["symbols"][symbol] = entry
+        with atomic_write(_manifest_path()) as tmp_path:
+            tmp_path.write_text(json.dumps(manifest, indent=2))
+
+
+class SharedHistory:
+    """
+    One published symbol, attached read-only: memory-mapped columns ('date' as int64 epoch-ns UTC),
+    the trading-day row ranges and each bar's minute of day, all shared with every other process.
+    """
+
+    def __init__(self, symbol: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.symbol = symbol
+        self.meta = meta
+        # Appends grow the files before the manifest, so only the rows and days the manifest counts are used
+        num_rows, num_days = meta["num_rows"], meta["num_days"]
+        self.columns = {name: arrays[name][:num_rows] for name in meta["columns"]}
+        self.row_index = arrays["__index__"][:num_rows] if "__index__" in arrays else None # None when the frame index is 0..n-1
+        self.day_dates = arrays["__day_dates__"][:num_days] # datetime64[D], ascending
+        self.day_starts = arrays["__day_starts__"][:num_days]
+        self.day_ends = np.minimum(arrays["__day_ends__"][:num_days], num_rows)
+        self.minute_of_day = arrays["__minute_of_day__"][:num_rows] # int16, local wall clock
+
+    def prefix_rows(self, source_sha1: Optional[str]) -> Optional[int]:
+        """
+        If the data read from the CSV version with this checksum is a prefix of this one (only appends
+        since), that version's row count; else None.
+        """
+        for version in self.meta.get("lineage", []):
+            if version["sha1"] == source_sha1:
+                return version["num_rows"]
+        return None
+
+    def frame(self) -> pd.DataFrame:
+        """The symbol's DataFrame on top of the mapped arrays (no copy, writes raise)."""
+        num_rows = self.meta["num_rows"]
+        index = pd.RangeIndex(num_rows) if self.row_index is None else pd.Index(self.row_index)
+        date_values = pd.array(self.columns["date"].view("datetime64[ns]"), copy=False) # Wraps the mapped array as is
+        if self.meta["utc_offset_minutes"] is not None:
+            timezone = dt.timezone(dt.timedelta(minutes=self.meta["utc_offset_minutes"]))
+            date_values = date_values.view(pd.DatetimeTZDtype(tz=timezone)) # Same UTC epoch-ns, shown in the exchange offset
+        frame_columns = {"date": pd.Series(date_values, index=index, name="date", copy=False)}
+        for name in self.meta["columns"][1:]:
+            frame_columns[name] = pd.Series(self.columns[name], index=index, name=name, copy=False)
+        return pd.DataFrame(frame_columns, copy=False)
+
+
+def _bar_clock(df: pd.DataFrame, utc_offset_minutes: Optional[int]):
+    """UTC epoch-ns of every bar, its local (exchange) day number since the epoch and its int16 minute of day."""
+    dates = df["date"].dt.tz_convert(None) if utc_offset_minutes is not None else df["date"] # Naive UTC: to_numpy() stays datetime64
+    epoch_ns = dates.to_numpy().astype("datetime64[ns]").view(np.int64)
+    local_ns = epoch_ns + (utc_offset_minutes or 0) * _NS_PER_MINUTE
+    return epoch_ns, local_ns // _NS_PER_DAY, (local_ns % _NS_PER_DAY // _NS_PER_MINUTE).astype(np.int16)
+
+
+def append_npy(path: Path, values: np.ndarray, at_row: int) -> bool:
+    """
+    Writes `values` into a C-ordered .npy file in place as rows [at_row, at_row + len(values)) along
+    axis 0 (dropping anything after them), data first and the header's new shape last, so a reader
+    mapping the file sees either the old or the new array. False if the file cannot grow in place
+    (different dtype or row shape, fewer than at_row rows, or no room left in the header).
+    """
+    with open(path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        header_length = f.tell()
+        values = np.ascontiguousarray(values, dtype=dtype)
+        if fortran_order or tuple(shape[1:]) != values.shape[1:] or shape[0] < at_row:
+            return False
+        new_shape = (at_row + len(values),) + tuple(shape[1:])
+        header = io.BytesIO()
+        write_header = np.lib.format.write_array_header_1_0 if version == (1, 0) else np.lib.format.write_array_header_2_0
+        write_header(header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": new_shape})
+        if len(header.getvalue()) != header_length:
+            return False
+        row_bytes = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+        f.seek(header_length + at_row * row_bytes)
+        f.write(values.tobytes())
+        f.truncate()
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
+
+
+def _signature_matches(entry: Dict[str, Any], symbol: str, source_path: Path) -> bool:
+    """
+    Whether a manifest entry still describes the source CSV. The mtime/size check is free; when only
+    the mtime changed (file touched or copied), the content hash decides.
+    """
+    source_stat = source_path.stat()
+    if source_stat.st_size != entry["source_size"]:
+        return False
+    if source_stat.st_mtime_ns != entry["source_mtime_ns"]:
+        if file_digest(source_path) != entry["source_sha1"]:
+            return False
+        _update_manifest(symbol, dict(entry, source_mtime_ns=source_stat.st_mtime_ns)) # Same content: refresh the signature
+    return True
+
+
+def attach(symbol: str, source_path: Path) -> Optional[SharedHistory]:
+    """The published arrays of a symbol if they are still current for its CSV, else None."""
+    symbol = symbol.upper()
+    entry = read_manifest()["symbols"].get(symbol)
+    if entry is None:
+        return None
+    try:
+        if not _signature_matches(entry, symbol, source_path):
+            return None
+        generation = _store_root() / entry["path"]
+        arrays = {path.stem: np.load(path, mmap_mode="r") for path in generation.glob("*.npy")}
+        return SharedHistory(symbol, arrays, entry)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring published data for {symbol}: {e}")
+        return None
+
+
+def publish(symbol: str, df: pd.DataFrame, source_path: Path) -> Optional[SharedHistory]:
+    """
+    Writes the preprocessed (sorted, de-duplicated) frame as one .npy per column plus its day row
+    ranges and minutes of day into a new generation directory, then points the manifest at it.
+    Frames that do not fit that layout (mixed offsets, non-numeric columns) are not published (None).
+    Processes still mapping an older generation keep reading it; its files are only unlinked.
+    """
+    symbol = symbol.upper()
+    if df.empty or not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        return None
+    timezone = df["date"].dt.tz
+    if timezone is not None and not isinstance(timezone, dt.timezone):
+        return None
+    other_columns = [c for c in df.columns if c != "date"]
+    if not all(pd.api.types.is_numeric_dtype(df[c]) for c in other_columns):
+        return None
+
+    utc_offset_minutes = int(timezone.utcoffset(None).total_seconds() // 60) if timezone is not None else None
+    epoch_ns, day_numbers, minute_of_day = _bar_clock(df, utc_offset_minutes)
+    boundaries = np.flatnonzero(day_numbers[1:] != day_numbers[:-1]) + 1 # Rows of a day are contiguous
+    day_starts = np.concatenate(([0], boundaries)).astype(np.int64)
+
+    arrays = {
+        "date": epoch_ns,
+        "__day_dates__": day_numbers[day_starts].astype("datetime64[D]"),
+        "__day_starts__": day_starts,
+        "__day_ends__": np.concatenate((boundaries, [len(df)])).astype(np.int64),
+        "__minute_of_day__": minute_of_day,
+    }
+    arrays.update({c: df[c].to_numpy() for c in other_columns})
+    if not isinstance(df.index, pd.RangeIndex) or not df.index.equals(pd.RangeIndex(len(df))):
+        arrays["__index__"] = df.index.to_numpy(dtype=np.int64)
+
+    source_stat = source_path.stat()
+    source_sha1 = file_digest(source_path)
+    generation_name = f"{source_sha1[:16]}-{time.time_ns()}"
+    symbol_dir = _store_root() / symbol
+    generation = symbol_dir / generation_name
+    generation.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        with open(generation / f"{name}.npy", "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+
+    entry = {
+        "path": f"{symbol}/{generation_name}",
+        "source_file": str(source_path),
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "source_size": source_stat.st_size,
+        "source_sha1": source_sha1,
+        "utc_offset_minutes": utc_offset_minutes,
+        "columns": ["date"] + other_columns,
+        "num_rows": len(df),
+        "num_days": len(day_starts),
+        "published_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "lineage": [],
+    }
+    _update_manifest(symbol, entry) # Written last: the generation only counts once the manifest points at it
+    for old_generation in symbol_dir.iterdir():
+        if old_generation.is_dir() and old_generation.name != generation_name:
+            shutil.rmtree(old_generation, ignore_errors=True)
+    return attach(symbol, source_path)
+
+
+def append(symbol: str, new_rows: pd.DataFrame, source_path: Path) -> Optional[SharedHistory]:
+    """
+    Adds bars newer than the last published one to the symbol's current generation in place, once
+    the caller (holding publish_lock) has appended them to the CSV: the columns grow by the new rows
+    and only the small per-day arrays are rewritten, so the cost is O(new bars + days), not O(history).
+    The manifest (updated last) remembers the previous version, so caches built from it can be extended.
+    None if the bars cannot be appended in place (the caller then publishes the whole CSV again).
+    """
+    symbol = symbol.upper()
+    entry = read_manifest()["symbols"].get(symbol)
+    if entry is None or new_rows.empty or list(new_rows.columns) != entry["columns"]:
+        return None
+    generation = _store_root() / entry["path"]
+    if (generation / "__index__.npy").exists(): # Frames with a custom index are only ever republished
+        return None
+    timezone = new_rows["date"].dt.tz
+    utc_offset_minutes = int(timezone.utcoffset(None).total_seconds() // 60) if timezone is not None else None
+    if utc_offset_minutes != entry["utc_offset_minutes"]:
+        return None
+
+    num_rows, num_days = entry["num_rows"], entry["num_days"]
+    epoch_ns, day_numbers, minute_of_day = _bar_clock(new_rows, utc_offset_minutes)
+    if num_rows and epoch_ns[0] <= np.load(generation / "date.npy", mmap_mode="r")[num_rows - 1]:
+        return None # Not strictly after the published bars
+
+    day_dates = np.load(generation / "__day_dates__.npy")[:num_days]
+    day_starts = np.load(generation / "__day_starts__.npy")[:num_days]
+    day_ends = np.minimum(np.load(generation / "__day_ends__.npy")[:num_days], num_rows)
+    boundaries = np.flatnonzero(day_numbers[1:] != day_numbers[:-1]) + 1
+    new_starts = np.concatenate(([0], boundaries)).astype(np.int64)
+    new_ends = np.concatenate((boundaries, [len(new_rows)])).astype(np.int64)
+    new_dates = day_numbers[new_starts].astype("datetime64[D]")
+    if num_days and new_dates[0] == day_dates[-1]: # The first new bars continue the last published session
+        day_ends[-1] = num_rows + new_ends[0]
+        new_starts, new_ends, new_dates = new_starts[1:], new_ends[1:], new_dates[1:]
+
+    column_values = {"date": epoch_ns, "__minute_of_day__": minute_of_day}
+    column_values.update({c: new_rows[c].to_numpy() for c in entry["columns"] if c != "date"})
+    for name, values in column_values.items():
+        if not append_npy(generation / f"{name}.npy", values, num_rows):
+            return None
+    day_arrays = {
+        "__day_dates__": np.concatenate((day_dates, new_dates)),
+        "__day_starts__": np.concatenate((day_starts, new_starts + num_rows)),
+        "__day_ends__": np.concatenate((day_ends, new_ends + num_rows)),
+    }
+    for name, array in day_arrays.items():
+        with atomic_write(generation / f"{name}.npy") as tmp_path, open(tmp_path, "wb") as f: # Readers of the old version keep the old file
+            np.save(f, array)
+
+    source_stat = source_path.stat()
+    lineage = entry.get("lineage", []) + [{"sha1": entry["source_sha1"], "num_rows": num_rows}]
+    _update_manifest(symbol, dict(
+        entry,
+        source_mtime_ns=source_stat.st_mtime_ns,
+        source_size=source_stat.st_size,
+        source_sha1=file_digest(source_path),
+        num_rows=num_rows + len(new_rows),
+        num_days=len(day_arrays["__day_dates__"]),
+        appended_at=dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        lineage=lineage[-_MAX_LINEAGE:],
+    ))
+    return attach(symbol, source_path)
+
+
+def read_source_csv(file_path: Path) -> pd.DataFrame:
+    df = pd.read_csv(file_path, parse_dates=["date"]) # Assuming 'date' column needs parsing
+    df["date"] = pd.to_datetime(df["date"])  # Ensure datetime format
+
+    # Basic preprocessing often needed:
+    df.sort_values(by="date", inplace=True)
+    df.drop_duplicates(subset=["date"], keep="first", inplace=True) # Ensure unique timestamps
+    return df
+
+
+def attach_or_publish(symbol: str, source_path: Path) -> Tuple[Optional[SharedHistory], Optional[pd.DataFrame]]:
+    """
+    Attaches to a symbol's published data, publishing it first if needed; only the first process to
+    get here parses the CSV, the others wait for it and attach. Also returns the parsed frame when
+    this call read the CSV (the only copy of the data if it could not be published).
+    """
+    symbol = symbol.upper()
+    shared = attach(symbol, source_path)
+    if shared is not None:
+        return shared, None
+    with publish_lock(symbol):
+        shared = attach(symbol, source_path) # Published while we waited?
+        if shared is not None:
+            return shared, None
+        df = read_source_csv(source_path)
+        try:
+            shared = publish(symbol, df, source_path)
+        except OSError as e:
+            print(f"Could not publish {symbol} to the shared store: {e}")
+        return shared, df
+
+
+def main():
+    # Imported here: data_loader itself depends on this module
+    from .data_loader import get_historical_frame, list_available_symbols
+
+    parser = argparse.ArgumentParser(description="Publish the historical CSVs into the shared memory-mapped store.")
+    parser.add_argument("--symbols", nargs="*", default=None, help="Symbols to publish (default: every CSV)")
+    args = parser.parse_args()
+
+    symbols: List[str] = [s.upper() for s in args.symbols] if args.symbols else list_available_symbols()
+    for symbol in symbols:
+        started = time.perf_counter()
+        try:
+            df = get_historical_frame(symbol) # Publishes on a miss, attaches when already current
+            entry = read_manifest()["symbols"].get(symbol)
+        except Exception as e: # One bad CSV must not keep the others (or the server) from starting
+            print(f"{symbol}: not published: {e}")
+            continue
+        if df is None or entry is None:
+            print(f"{symbol}: not published.")
+            continue
+        print(f"{symbol}: {entry['num_rows']} rows, {entry['num_days']} days -> {entry['path']} ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
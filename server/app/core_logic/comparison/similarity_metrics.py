@@ -0,0 +1,199 @@
+# backend/app/core_logic/comparison/similarity_metrics.py
+import math
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# Metrics understood by pattern_matcher. "cosine" is the original min-max + cosine engine and
+# lives in pattern_matcher itself; the two below work on z-normalized OHLC windows.
+SUPPORTED_METRICS = ("cosine", "zeuclidean", "dtw")
+
+# Candidates are pushed through full DTW in batches of this size, in ascending lower-bound order
+_DTW_BATCH_SIZE = 64
+
+
+def z_normalize(windows: np.ndarray) -> np.ndarray:
+    """
+    Z-normalizes (..., bars, 4) OHLC windows with one mean/std per window over all four columns,
+    so candle shape (high above close, etc.) is kept. Flat windows become all zeros.
+    """
+    mean = windows.mean(axis=(-2, -1), keepdims=True)
+    std = windows.std(axis=(-2, -1), keepdims=True)
+    std[std < 1e-12] = 1.0
+    return (windows - mean) / std
+
+
+def fill_gaps(windows: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """Forward-fills, then back-fills, missing bars of (days, bars, 4) windows along the bar axis."""
+    num_days, num_bars = valid.shape
+    bar_positions = np.arange(num_bars)
+    last_valid = np.maximum.accumulate(np.where(valid, bar_positions, -1), axis=1)
+    next_valid = np.minimum.accumulate(np.where(valid, bar_positions, num_bars)[:, ::-1], axis=1)[:, ::-1]
+    source = np.where(last_valid >= 0, last_valid, next_valid)
+    source = np.clip(source, 0, num_bars - 1)
+    return np.take_along_axis(windows, source[:, :, None], axis=1)
+
+
+def _distance_to_similarity(squared_distance: np.ndarray, num_values: int) -> np.ndarray:
+    """
+    For z-normalized vectors of n values, ||a - b||^2 = 2n(1 - pearson(a, b)); this maps a squared
+    distance back onto that correlation scale so similarity_threshold reads the same as for cosine.
+    """
+    return 1.0 - squared_distance / (2.0 * num_values)
+
+
+def _similarity_to_distance(similarity: float, num_values: int) -> float:
+    return 2.0 * num_values * (1.0 - similarity)
+
+
+def zeuclidean_scores(
+    windows: np.ndarray,
+    valid: np.ndarray,
+    query_window: np.ndarray,
+    query_valid: np.ndarray,
+    min_coverage: float = 0.5
+) -> np.ndarray:
+    """
+    Z-normalized Euclidean similarity of slot-aligned (days, bars, 4) windows against a slot-aligned
+    (bars, 4) query. Missing bars (query or day) are gap-filled; days with fewer than
+    min_coverage of the bars present score NaN (never pass a threshold).
+    """
+    num_bars = valid.shape[1]
+    min_bars = max(2, math.ceil(min_coverage * num_bars))
+    if query_valid.sum() < min_bars:
+        raise ValueError("Query pattern has too many missing bars for z-normalized Euclidean matching.")
+
+    query = z_normalize(fill_gaps(query_window[None], query_valid[None])[0]).ravel()
+    scores = np.full(len(windows), np.nan)
+    eligible = valid.sum(axis=1) >= min_bars
+    if eligible.any():
+        days = z_normalize(fill_gaps(windows[eligible], valid[eligible])).reshape(int(eligible.sum()), -1)
+        squared_distance = np.einsum("ij,ij->i", days - query, days - query)
+        scores[eligible] = _distance_to_similarity(squared_distance, query.size)
+    return scores
+
+
+def _band_width(query_length: int, candidate_length: int, window_ratio: float) -> int:
+    """Sakoe-Chiba half-width, wide enough for the warping path to reach the end cell."""
+    width = math.ceil(window_ratio * max(query_length, candidate_length))
+    return max(width, 1, math.ceil(candidate_length / query_length), math.ceil(query_length / candidate_length))
+
+
+def _lb_kim(query: np.ndarray, candidates: List[np.ndarray]) -> np.ndarray:
+    """LB_Kim (first/last bars): every warping path contains the two corner cells."""
+    first = np.array([((c[0] - query[0]) ** 2).sum() for c in candidates])
+    last = np.array([((c[-1] - query[-1]) ** 2).sum() if len(c) > 1 and len(query) > 1 else 0.0 for c in candidates])
+    return first + last
+
+
+def _lb_keogh(query: np.ndarray, candidates: np.ndarray, band: int) -> np.ndarray:
+    """LB_Keogh of equal-length (n, bars, 4) candidates against the query's Sakoe-Chiba envelope."""
+    query_length = len(query)
+    upper = np.empty_like(query)
+    lower = np.empty_like(query)
+    for i in range(query_length):
+        segment = query[max(0, i - band):i + band + 1]
+        upper[i] = segment.max(axis=0)
+        lower[i] = segment.min(axis=0)
+    above = np.clip(candidates - upper, 0, None)
+    below = np.clip(lower - candidates, 0, None)
+    return (above ** 2 + below ** 2).sum(axis=(1, 2))
+
+
+def _dtw_batch(query: np.ndarray, candidates: np.ndarray, band: int, bound: float) -> np.ndarray:
+    """
+    Banded DTW (squared Euclidean bar cost) of equal-length (n, bars, 4) candidates against the query,
+    computed for the whole batch at once. Rows whose running minimum exceeds `bound` are abandoned
+    early and return inf.
+    """
+    query_length, candidate_length = len(query), candidates.shape[1]
+    distances = np.full(len(candidates), np.inf)
+    alive = np.arange(len(candidates))
+    previous = np.full((len(candidates), candidate_length + 1), np.inf)
+    previous[:, 0] = 0.0
+    for i in range(1, query_length + 1):
+        center = i * candidate_length / query_length
+        j_low = max(1, math.ceil(center - band))
+        j_high = min(candidate_length, math.floor(center + band))
+        current = np.full((len(alive), candidate_length + 1), np.inf)
+        costs = ((candidates[alive, j_low - 1:j_high, :] - query[i - 1]) ** 2).sum(axis=2)
+        for j in range(j_low, j_high + 1):
+            best_previous = np.minimum(np.minimum(previous[:, j - 1], previous[:, j]), current[:, j - 1])
+            current[:, j] = costs[:, j - j_low] + best_previous
+        # Early abandoning: the path has to cross this row, so its minimum is a lower bound
+        keep = current[:, j_low:j_high + 1].min(axis=1) <= bound
+        alive, previous = alive[keep], current[keep]
+        if not len(alive):
+            return distances
+    distances[alive] = previous[:, candidate_length]
+    return distances
+
+
+def dtw_scores(
+    day_series: List[np.ndarray],
+    query_series: np.ndarray,
+    similarity_threshold: float,
+    num_results: int,
+    window_ratio: float = 0.1,
+    stats: Optional[Dict[str, int]] = None
+) -> np.ndarray:
+    """
+    Constrained DTW similarity of variable-length (bars, 4) day series against the query series.
+    Candidates go through an LB_Kim -> LB_Keogh -> early-abandoning DTW cascade, pruned against the
+    tighter of the threshold and the current k-th best distance. Only days that could still make
+    the top-k get a score; everything pruned scores NaN.
+    """
+    stats = stats if stats is not None else {}
+    query = z_normalize(query_series)
+    candidates = [z_normalize(series) for series in day_series]
+    num_values = query.size
+    scores = np.full(len(candidates), np.nan)
+    if not candidates:
+        return scores
+
+    threshold_bound = _similarity_to_distance(similarity_threshold, num_values)
+    lower_bounds = _lb_kim(query, candidates)
+    stats["pruned_lb_kim"] = int((lower_bounds > threshold_bound).sum())
+
+    # LB_Keogh needs equal lengths, which is every day without missing bars
+    lengths = np.array([len(c) for c in candidates])
+    same_length = np.flatnonzero((lengths == len(query)) & (lower_bounds <= threshold_bound))
+    if len(same_length):
+        band = _band_width(len(query), len(query), window_ratio)
+        keogh = _lb_keogh(query, np.stack([candidates[i] for i in same_length]), band)
+        lower_bounds[same_length] = np.maximum(lower_bounds[same_length], keogh)
+        stats["pruned_lb_keogh"] = int((keogh > threshold_bound).sum())
+
+    order = np.argsort(lower_bounds, kind="stable")
+    order = order[lower_bounds[order] <= threshold_bound]
+    distances = np.full(len(candidates), np.inf)
+    best_distances: List[float] = []
+    stats["dtw_computed"] = 0
+    stats["dtw_abandoned"] = 0
+
+    for batch_start in range(0, len(order), _DTW_BATCH_SIZE):
+        bound = threshold_bound
+        if len(best_distances) >= num_results:
+            bound = min(bound, best_distances[num_results - 1])
+        batch = order[batch_start:batch_start + _DTW_BATCH_SIZE]
+        batch = batch[lower_bounds[batch] <= bound]
+        if not len(batch):
+            break # Sorted by lower bound, so no later candidate can qualify either
+        for length in np.unique(lengths[batch]):
+            group = batch[lengths[batch] == length]
+            band = _band_width(len(query), int(length), window_ratio)
+            group_distances = _dtw_batch(query, np.stack([candidates[i] for i in group]), band, bound)
+            distances[group] = group_distances
+            stats["dtw_computed"] += len(group)
+            stats["dtw_abandoned"] += int(np.isinf(group_distances).sum())
+        best_distances = sorted(distances[np.isfinite(distances)])
+
+    finite = np.isfinite(distances) & (distances <= threshold_bound)
+    scores[finite] = _distance_to_similarity(distances[finite], num_values)
+    return scores
+
+
+def compact_valid_bars(windows: np.ndarray, valid: np.ndarray, min_bars: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """Per-day arrays of only the bars that exist (variable length), for days with at least min_bars of them."""
+    counts = valid.sum(axis=1)
+    kept = np.flatnonzero(counts >= min_bars)
+    return kept, [windows[d][valid[d]] for d in kept]
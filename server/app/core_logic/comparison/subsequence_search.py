@@ -0,0 +1,161 @@
+# backend/app/core_logic/comparison/subsequence_search.py
+import time
+import datetime as dt
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+from .data_loader import get_historical_frame, get_day_row_index
+from .pattern_matcher import _fetch_query_window
+
+# Series columns the search can run on; "ohlc" sums the four per-column distance profiles
+SUBSEQUENCE_COLUMNS = {"close": ["close"], "ohlc": ["open", "high", "low", "close"]}
+
+
+def _sliding_dot_product(query: np.ndarray, series: np.ndarray) -> np.ndarray:
+    """Dot product of the query with every length-m subsequence of the series, via one FFT convolution."""
+    n, m = len(series), len(query)
+    fft_length = 1 << int(np.ceil(np.log2(n + m)))
+    product = np.fft.irfft(np.fft.rfft(series, fft_length) * np.fft.rfft(query[::-1], fft_length), fft_length)
+    return product[m - 1:n]
+
+
+def _moving_mean_std(series: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and (population) std of every length-m subsequence, from cumulative sums."""
+    centered = series - series.mean() # Keeps the cumulative sums small and well-conditioned
+    cumulative = np.concatenate(([0.0], np.cumsum(centered)))
+    cumulative_sq = np.concatenate(([0.0], np.cumsum(centered ** 2)))
+    window_sum = cumulative[m:] - cumulative[:-m]
+    window_sq = cumulative_sq[m:] - cumulative_sq[:-m]
+    mean = window_sum / m
+    variance = np.maximum(window_sq / m - mean ** 2, 0.0)
+    return mean + series.mean(), np.sqrt(variance)
+
+
+def mass_distance_profile(query: np.ndarray, series: np.ndarray) -> np.ndarray:
+    """
+    MASS: squared z-normalized Euclidean distance between the query and every subsequence of the series,
+    in O(n log n). Flat subsequences (zero std) and subsequences with a missing (NaN) bar get NaN.
+    """
+    m = len(query)
+    if m < 2 or len(series) < m:
+        return np.array([], dtype=np.float64)
+    if not np.isfinite(query).all():
+        raise ValueError("Query pattern has missing values; z-normalized distances are undefined.")
+    query_std = query.std()
+    if query_std < 1e-12:
+        raise ValueError("Query pattern is flat; z-normalized distances are undefined.")
+    # A NaN bar would spread through the FFT and the cumulative sums into every distance: fill it with
+    # the series mean for the transform, then mask only the subsequences that contain it
+    missing = ~np.isfinite(series)
+    if missing.any():
+        series = np.where(missing, series[~missing].mean() if not missing.all() else 0.0, series)
+    dot_products = _sliding_dot_product(query, series)
+    means, stds = _moving_mean_std(series, m)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = (dot_products - m * query.mean() * means) / (m * query_std * stds)
+    correlation[stds < 1e-12] = np.nan
+    if missing.any():
+        missing_counts = np.concatenate(([0], np.cumsum(missing)))
+        correlation[missing_counts[m:] - missing_counts[:-m] > 0] = np.nan
+    return 2.0 * m * (1.0 - np.clip(correlation, -1.0, 1.0))
+
+
+def _top_k_non_overlapping(squared_distances: np.ndarray, max_distance: float, num_results: int, exclusion: int) -> List[int]:
+    """Best positions first, skipping any within `exclusion` of an already chosen one (trivial matches)."""
+    candidates = np.flatnonzero(squared_distances <= max_distance)
+    order = candidates[np.argsort(squared_distances[candidates], kind="stable")]
+    chosen: List[int] = []
+    for position in order:
+        if all(abs(position - other) >= exclusion for other in chosen):
+            chosen.append(int(position))
+            if len(chosen) == num_results:
+                break
+    return chosen
+
+
+def find_similar_subsequences(
+    stock_symbol: str,
+    query_start_time: dt.time,
+    query_end_time: dt.time,
+    similarity_threshold: float,
+    num_results: int,
+    query_date_override: dt.date | None = None,
+    columns: str = "ohlc",
+    allow_cross_day: bool = False,
+    timings: Optional[Dict[str, float]] = None,
+    query_source: str = "yfinance"
+) -> List[Dict[str, Any]]:
+    """
+    Finds the subsequences of the symbol's whole 5-minute history that best match the query window,
+    at any time of day (and across day boundaries if allowed), using MASS distance profiles.
+    Scores are z-normalized correlations (1 - d^2 / 2m per column), comparable to the threshold.
+    Subsequences touching the query date are excluded, and matches never overlap each other.
+    query_source says where the query day's bars come from (see query_sources).
+    """
+    run_timings: Dict[str, float] = {}
+    if columns not in SUBSEQUENCE_COLUMNS:
+        raise ValueError(f"Unknown columns '{columns}'. Choose one of {', '.join(SUBSEQUENCE_COLUMNS)}.")
+    final_query_date = query_date_override if query_date_override else dt.datetime.now(dt.timezone.utc).date()
+
+    stage_start = time.perf_counter()
+    df_historical_full = get_historical_frame(stock_symbol) # Shared read-only frame, not a copy
+    if df_historical_full is None or df_historical_full.empty:
+        raise ValueError(f"No historical data found for symbol {stock_symbol}.")
+    day_row_index = get_day_row_index(stock_symbol)
+    run_timings["load_history"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    df_today_window = _fetch_query_window(stock_symbol, final_query_date, query_start_time, query_end_time, query_source)
+    run_timings["fetch_query"] = time.perf_counter() - stage_start
+
+    m = len(df_today_window)
+    if m < 2:
+        raise ValueError("The query window needs at least two bars for a subsequence search.")
+    if len(df_historical_full) < m:
+        raise ValueError(f"Not enough historical data for {stock_symbol} to search a {m}-bar pattern.")
+
+    # Distance profile summed over the selected columns
+    stage_start = time.perf_counter()
+    squared_distances = np.zeros(len(df_historical_full) - m + 1)
+    for column in SUBSEQUENCE_COLUMNS[columns]:
+        squared_distances += mass_distance_profile(
+            df_today_window[column].to_numpy(dtype=np.float64),
+            df_historical_full[column].to_numpy(dtype=np.float64)
+        )
+    run_timings["distance_profile"] = time.perf_counter() - stage_start
+
+    # Mask subsequences that cross a day boundary (unless allowed) or touch the query date
+    stage_start = time.perf_counter()
+    day_ids = np.repeat(np.arange(len(day_row_index)), day_row_index.ends - day_row_index.starts)
+    start_days, end_days = day_ids[:len(squared_distances)], day_ids[m - 1:]
+    if not allow_cross_day:
+        squared_distances[start_days != end_days] = np.nan
+    query_day_id = day_row_index.position(final_query_date)
+    if query_day_id is not None:
+        squared_distances[(start_days <= query_day_id) & (end_days >= query_day_id)] = np.nan
+
+    num_values = m * len(SUBSEQUENCE_COLUMNS[columns])
+    max_distance = 2.0 * num_values * (1.0 - similarity_threshold)
+    positions = _top_k_non_overlapping(squared_distances, max_distance, num_results, exclusion=m)
+    run_timings["select_top_k"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    results = []
+    for position in positions:
+        window_df = df_historical_full.iloc[position:position + m]
+        start_day = day_row_index.dates[day_ids[position]]
+        full_day_df = day_row_index.day_slice(df_historical_full, start_day)
+        results.append({
+            "date": start_day.isoformat(),
+            "start": window_df["date"].iloc[0],
+            "end": window_df["date"].iloc[-1],
+            "similarity_score": float(1.0 - squared_distances[position] / (2.0 * num_values)),
+            "window_pattern_data": window_df[["date", "open", "high", "low", "close"]].to_dict(orient="records"),
+            "full_day_data": full_day_df[["date", "open", "high", "low", "close"]].to_dict(orient="records")
+        })
+    run_timings["build_results"] = time.perf_counter() - stage_start
+
+    if timings is not None:
+        timings.update(run_timings)
+    print(f"Subsequence search for {stock_symbol} ({len(squared_distances)} positions): "
+          + ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in run_timings.items()))
+    return results
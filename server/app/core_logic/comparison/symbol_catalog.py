@@ -0,0 +1,222 @@
+# backend/app/core_logic/comparison/symbol_catalog.py
+# Catalog of the historical datasets under HISTORICAL_DATA_PATH: symbol -> CSV path plus row count,
+# first/last timestamp, trading days, bar interval and checksum. Persisted next to the data and
+# re-checked against the directory at most every SYMBOL_CATALOG_REFRESH_SECONDS, so symbol lookups,
+# validation and listing do not touch the CSVs (only new or changed files are read).
+import datetime as dt
+import json
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional, Dict, List, Any
+from ...config import settings
+from . import shared_store
+
+CATALOG_VERSION = 1
+_CSV_SUFFIX = "_with_indicators_.csv"
+
+# This process's catalog, loaded from disk on first use
+_catalog: Optional["SymbolCatalog"] = None
+
+
+class SymbolCatalog:
+    """Symbol -> dataset entry (see _describe_dataset), as of the last check of the data directory."""
+
+    def __init__(self, entries: Dict[str, Dict[str, Any]], checked_at: Optional[float] = None):
+        self.entries = entries
+        self.checked_at = checked_at # time.monotonic() of the last directory check, None if never checked
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol.upper() in self.entries
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(symbol.upper())
+
+    def path(self, symbol: str) -> Optional[Path]:
+        entry = self.get(symbol)
+        return Path(entry["path"]) if entry is not None else None
+
+    def symbols(self) -> List[str]:
+        return sorted(self.entries)
+
+
+def _catalog_path() -> Path:
+    return Path(".") / settings.SYMBOL_CATALOG_PATH
+
+
+def _scan_data_files() -> Dict[str, Path]:
+    """Symbol -> CSV path for every dataset file (filtered_{SYMBOL}... preferred over {SYMBOL}... if both exist)."""
+    data_dir = Path(".") / settings.HISTORICAL_DATA_PATH
+    if not data_dir.is_dir():
+        return {}
+    files: Dict[str, Path] = {}
+    for file_path in sorted(data_dir.glob(f"*{_CSV_SUFFIX}")):
+        name = file_path.name[:-len(_CSV_SUFFIX)]
+        symbol = (name[len("filtered_"):] if name.startswith("filtered_") else name).upper()
+        if symbol not in files or name.startswith("filtered_"):
+            files[symbol] = file_path
+    return files
+
+
+def _describe_dataset(symbol: str, file_path: Path) -> Dict[str, Any]:
+    """Reads one dataset (through the shared store when enabled, publishing it if needed) and summarizes it."""
+    shared, df = shared_store.attach_or_publish(symbol, file_path) if settings.COLUMNAR_CACHE_ENABLED else (None, None)
+    if shared is not None:
+        df, sha1 = shared.frame(), shared.meta["source_sha1"]
+    else:
+        df = df if df is not None else shared_store.read_source_csv(file_path)
+        sha1 = shared_store.file_digest(file_path)
+    return describe_frame(symbol, file_path, df, sha1)
+
+
+def describe_frame(symbol: str, file_path: Path, df: pd.DataFrame, sha1: str) -> Dict[str, Any]:
+    """Catalog entry of a dataset from its already parsed (sorted, de-duplicated) frame and the CSV's checksum."""
+    source_stat = file_path.stat()
+    entry = {
+        "symbol": symbol,
+        "path": str(file_path),
+        "rows": len(df),
+        "first_timestamp": None,
+        "last_timestamp": None,
+        "trading_days": 0,
+        "bar_interval_minutes": None,
+        "sha1": sha1,
+        "size": source_stat.st_size,
+        "mtime_ns": source_stat.st_mtime_ns,
+    }
+    if df.empty:
+        return entry
+
+    timestamps = df["date"] if pd.api.types.is_datetime64_any_dtype(df["date"]) else pd.to_datetime(df["date"])
+    local_timestamps = timestamps.dt.tz_localize(None) if timestamps.dt.tz is not None else timestamps # Exchange wall clock
+    local_values = local_timestamps.to_numpy()
+    day_values = local_values.astype("datetime64[D]")
+    minutes = local_values.astype("datetime64[m]").astype(np.int64)
+    # Bar interval = most common gap between consecutive bars of the same day
+    gaps = np.diff(minutes)[day_values[1:] == day_values[:-1]]
+    gaps = gaps[gaps > 0]
+    entry.update({
+        "first_timestamp": timestamps.iloc[0].isoformat(),
+        "last_timestamp": timestamps.iloc[-1].isoformat(),
+        "trading_days": int(len(np.unique(day_values))),
+        "bar_interval_minutes": int(np.bincount(gaps).argmax()) if gaps.size else None,
+    })
+    return entry
+
+
+def _load_catalog() -> SymbolCatalog:
+    try:
+        stored = json.loads(_catalog_path().read_text())
+        if stored.get("version") == CATALOG_VERSION and stored.get("data_path") == settings.HISTORICAL_DATA_PATH:
+            return SymbolCatalog(stored["symbols"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return SymbolCatalog({})
+
+
+def _save_catalog(catalog: SymbolCatalog):
+    path = _catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with shared_store.atomic_write(path) as tmp_path:
+        tmp_path.write_text(json.dumps({"version": CATALOG_VERSION, "data_path": settings.HISTORICAL_DATA_PATH, "symbols": catalog.entries}, indent=2))
+
+
+def _refresh(catalog: SymbolCatalog) -> SymbolCatalog:
+    """
+    Re-checks the data directory: unchanged files (same path, size and mtime, or same content) keep
+    their entry, new or modified files are described again and removed files are dropped.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    changed = False
+    saved: Optional[SymbolCatalog] = None
+    for symbol, file_path in _scan_data_files().items():
+        previous = catalog.get(symbol)
+        try:
+            source_stat = file_path.stat()
+            if previous is None or (previous["size"], previous["mtime_ns"]) != (source_stat.st_size, source_stat.st_mtime_ns):
+                # Another process (e.g. an append) may already have described the new version
+                saved = saved if saved is not None else _load_catalog()
+                saved_entry = saved.get(symbol)
+                if saved_entry is not None and (saved_entry["size"], saved_entry["mtime_ns"]) == (source_stat.st_size, source_stat.st_mtime_ns):
+                    entries[symbol] = saved_entry # Already saved by whoever described it
+                    continue
+            if previous is not None and previous["path"] == str(file_path) and previous["size"] == source_stat.st_size:
+                if previous["mtime_ns"] == source_stat.st_mtime_ns:
+                    entries[symbol] = previous
+                    continue
+                if shared_store.file_digest(file_path) == previous["sha1"]: # Touched or copied, same content
+                    entries[symbol] = dict(previous, mtime_ns=source_stat.st_mtime_ns)
+                    changed = True
+                    continue
+            entries[symbol] = _describe_dataset(symbol, file_path)
+            changed = True
+            print(f"Symbol catalog: {'updated' if previous is not None else 'added'} {symbol} ({entries[symbol]['rows']} rows).")
+        except Exception as e:
+            print(f"Symbol catalog: skipping {file_path.name}: {e}")
+    removed = set(catalog.entries) - set(entries)
+    if removed:
+        print(f"Symbol catalog: removed {', '.join(sorted(removed))}.")
+    refreshed = SymbolCatalog(entries, checked_at=time.monotonic())
+    if changed or removed:
+        try:
+            _save_catalog(refreshed)
+        except OSError as e:
+            print(f"Could not save the symbol catalog: {e}")
+    return refreshed
+
+
+def get_catalog(refresh: bool = False) -> SymbolCatalog:
+    """This process's catalog, re-checked against the data directory when older than the refresh interval (or on request)."""
+    global _catalog
+    if _catalog is None:
+        _catalog = _load_catalog()
+    if refresh or _catalog.checked_at is None or time.monotonic() - _catalog.checked_at >= settings.SYMBOL_CATALOG_REFRESH_SECONDS:
+        _catalog = _refresh(_catalog)
+    return _catalog
+
+
+def record_datasets(entries: Dict[str, Dict[str, Any]]):
+    """Adds or replaces entries described elsewhere (e.g. by a bulk conversion) and saves the catalog."""
+    global _catalog
+    if _catalog is None:
+        _catalog = _load_catalog() # Not re-checked: the directory scan would describe the new files again
+    _catalog.entries.update({symbol.upper(): entry for symbol, entry in entries.items()})
+    catalog = _catalog
+    try:
+        _save_catalog(catalog)
+    except OSError as e:
+        print(f"Could not save the symbol catalog: {e}")
+
+
+def record_append(symbol: str, new_rows: pd.DataFrame, source_sha1: str):
+    """
+    Updates a symbol's entry after bars newer than its last timestamp were appended to its CSV,
+    from the new rows alone (the file is not read again).
+    """
+    catalog = get_catalog()
+    symbol = symbol.upper()
+    previous = catalog.get(symbol)
+    if previous is None or new_rows.empty:
+        return
+    timestamps = new_rows["date"]
+    local_timestamps = timestamps.dt.tz_localize(None) if timestamps.dt.tz is not None else timestamps
+    new_days = np.unique(local_timestamps.to_numpy().astype("datetime64[D]"))
+    if previous["last_timestamp"] is not None:
+        last_day = np.datetime64(dt.datetime.fromisoformat(previous["last_timestamp"]).date(), "D") # Local date of the stored offset
+        new_days = new_days[new_days != last_day]
+    source_stat = Path(previous["path"]).stat()
+    catalog.entries[symbol] = dict(
+        previous,
+        rows=previous["rows"] + len(new_rows),
+        first_timestamp=previous["first_timestamp"] or timestamps.iloc[0].isoformat(),
+        last_timestamp=timestamps.iloc[-1].isoformat(),
+        trading_days=previous["trading_days"] + len(new_days),
+        sha1=source_sha1,
+        size=source_stat.st_size,
+        mtime_ns=source_stat.st_mtime_ns,
+    )
+    try:
+        _save_catalog(catalog)
+    except OSError as e:
+        print(f"Could not save the symbol catalog: {e}")
@@ -0,0 +1,118 @@
+# backend/app/core_logic/comparison/watchlist_scan.py
+# Morning watchlist scan: today's window of every symbol in a watchlist is compared against that
+# symbol's own history. All query days come from one multi-ticker yfinance download (or from the
+# local history or recorded fixtures, see query_sources) and the symbols are matched concurrently
+# in the search pool; results are yielded as each symbol finishes and ranked by best similarity at the end.
+# From the backend root:
+#   python -m app.core_logic.comparison.watchlist_scan --symbols GLAND SBICARD HDFCAMC --start 09:15 --end 09:45
+#   python -m app.core_logic.comparison.watchlist_scan --watchlist watchlist.txt --source local --date 2021-05-10
+import argparse
+import datetime as dt
+import time
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterator
+from ...config import settings
+from . import pattern_matcher, symbol_catalog
+from .query_sources import QUERY_SOURCES, fetch_query_days
+
+
+def scan_watchlist(
+    symbols: List[str],
+    query_start_time: dt.time,
+    query_end_time: dt.time,
+    similarity_threshold: float,
+    num_results: int,
+    query_date: Optional[dt.date] = None,
+    metric: str = "cosine",
+    source: str = "yfinance"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields one result per symbol as soon as it is ready (completion order, not input order):
+    {"symbol", "best_similarity", "patterns", "message"}. Each symbol's query window is matched
+    against its own history, excluding the query day, with the same rules as find_similar_historical_patterns.
+    """
+    query_date = query_date or dt.datetime.now(dt.timezone.utc).date()
+    symbols = list(dict.fromkeys(s.upper() for s in symbols)) # De-duplicated, order kept
+    catalog = symbol_catalog.get_catalog()
+
+    def empty_result(symbol: str, message: str) -> Dict[str, Any]:
+        return {"symbol": symbol, "best_similarity": None, "patterns": [], "message": message}
+
+    query_days = fetch_query_days([s for s in symbols if s in catalog], query_date, source)
+    futures = {}
+    for symbol in symbols:
+        if symbol not in catalog:
+            yield empty_result(symbol, f"No historical data found for symbol {symbol}.")
+            continue
+        df_today_window, query_pattern = pattern_matcher.query_window_pattern(query_days.get(symbol), query_start_time, query_end_time)
+        if query_pattern.size == 0:
+            yield empty_result(symbol, f"No query data for {symbol} on {query_date} in the window {query_start_time}-{query_end_time}.")
+            continue
+        future = pattern_matcher.submit_symbol_search(
+            symbol, df_today_window, query_pattern, query_start_time, query_end_time,
+            metric, similarity_threshold, num_results, query_date
+        )
+        futures[future] = symbol
+
+    for future in as_completed(futures):
+        symbol = futures[future]
+        try:
+            _, day_dates, scores = future.result()
+        except ValueError as e:
+            yield empty_result(symbol, str(e))
+            continue
+        patterns = pattern_matcher.build_symbol_patterns(symbol, day_dates, scores, query_start_time, query_end_time)
+        yield {
+            "symbol": symbol,
+            "best_similarity": patterns[0]["similarity_score"] if patterns else None,
+            "patterns": patterns,
+            "message": None if patterns else "No sufficiently similar historical patterns found.",
+        }
+
+
+def rank_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Symbols by best similarity, best first, then symbols without a match; ties are ordered by symbol (scan results arrive in completion order)."""
+    return sorted(results, key=lambda r: (r["best_similarity"] is None, -(r["best_similarity"] or 0.0), r["symbol"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a watchlist for historical days similar to today's window.")
+    watchlist = parser.add_mutually_exclusive_group(required=True)
+    watchlist.add_argument("--symbols", nargs="+", help="Symbols to scan")
+    watchlist.add_argument("--watchlist", type=Path, help="File with one symbol per line (# comments allowed)")
+    parser.add_argument("--start", default=settings.DEFAULT_COMPARISON_START_TIME, help="Window start (HH:MM)")
+    parser.add_argument("--end", default=settings.DEFAULT_COMPARISON_END_TIME, help="Window end (HH:MM)")
+    parser.add_argument("--threshold", type=float, default=settings.DEFAULT_COMPARISON_SIMILARITY_THRESHOLD)
+    parser.add_argument("--num-results", type=int, default=settings.DEFAULT_COMPARISON_N_RESULTS)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "zeuclidean", "dtw"])
+    parser.add_argument("--date", type=dt.date.fromisoformat, default=None, help="Query day (default: today, UTC)")
+    parser.add_argument("--source", default="yfinance", choices=QUERY_SOURCES, help="Where the query day's bars come from")
+    args = parser.parse_args()
+
+    if args.watchlist is not None:
+        lines = (line.split("#")[0].strip() for line in args.watchlist.read_text().splitlines())
+        symbols = [line for line in lines if line]
+    else:
+        symbols = args.symbols
+    start_time = dt.datetime.strptime(args.start, "%H:%M").time()
+    end_time = dt.datetime.strptime(args.end, "%H:%M").time()
+
+    started = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    for result in scan_watchlist(symbols, start_time, end_time, args.threshold, args.num_results, args.date, args.metric, args.source):
+        results.append(result)
+        best = f"best={result['best_similarity']:.4f} ({len(result['patterns'])} matches)" if result["best_similarity"] is not None else result["message"]
+        print(f"[{len(results)}/{len(set(s.upper() for s in symbols))}] {result['symbol']}: {best} at {time.perf_counter() - started:.2f}s")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nRanking ({len(results)} symbols in {elapsed:.2f}s, {len(results) / elapsed:.1f} symbols/s):")
+    for rank, result in enumerate(rank_results(results), start=1):
+        if result["best_similarity"] is None:
+            continue
+        dates = ", ".join(p["date"] for p in result["patterns"])
+        print(f"{rank:3d}. {result['symbol']:<12} {result['best_similarity']:.4f}  {dates}")
+
+
+if __name__ == "__main__":
+    main()
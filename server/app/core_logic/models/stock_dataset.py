@@ -1,4 +1,5 @@
 # backend/app/core_logic/models/stock_dataset.py
+import numpy as np
 import torch
 from torch.utils.data import Dataset
 
@@ -12,4 +13,37 @@ class StockDataset(Dataset):
         return len(self.features)
     
     def __getitem__(self, idx):
-        return self.features[idx], self.targets[idx]
\ No newline at end of file
+        return self.features[idx], self.targets[idx]
+
+
+class StockWindowDataset(Dataset):
+    """
+    Sequences as windows over the feature rows, sliced per item instead of materialized up front:
+    item i is rows[starts[i] : starts[i] + sequence_length] with the target of the row after it
+    (the sequences of feature_engineering.create_lstm_sequences). starts defaults to every window.
+    """
+    def __init__(self, rows, row_targets, sequence_length: int, starts=None):
+        self.rows = torch.from_numpy(np.ascontiguousarray(rows, dtype=np.float32))
+        self.row_targets = torch.from_numpy(np.ascontiguousarray(row_targets, dtype=np.float32))
+        self.sequence_length = sequence_length
+        self.starts = np.arange(max(len(rows) - sequence_length, 0)) if starts is None else np.asarray(starts)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        start = int(self.starts[idx])
+        return self.rows[start:start + self.sequence_length], self.row_targets[start + self.sequence_length]
+
+    def subset(self, starts) -> "StockWindowDataset":
+        """The windows starting at `starts`, sharing this dataset's rows."""
+        subset = StockWindowDataset.__new__(StockWindowDataset)
+        subset.rows, subset.row_targets, subset.sequence_length = self.rows, self.row_targets, self.sequence_length
+        subset.starts = np.asarray(starts)
+        return subset
+
+    def tensors(self):
+        """All windows as one contiguous (n, sequence_length, features) tensor, and their targets."""
+        starts = torch.from_numpy(self.starts.astype(np.int64))
+        window_rows = starts[:, None] + torch.arange(self.sequence_length)
+        return self.rows[window_rows], self.row_targets[starts + self.sequence_length]
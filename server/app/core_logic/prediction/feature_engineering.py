@@ -1,6 +1,7 @@
 # backend/app/core_logic/prediction/feature_engineering.py
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.preprocessing import RobustScaler # Or MinMaxScaler
 from ...config import settings # For sequence_length
 
@@ -76,21 +77,18 @@ def scale_features(features_df: pd.DataFrame, scaler=None) -> tuple[pd.DataFrame
 
 
 def create_lstm_sequences(data: pd.DataFrame, target_series: pd.Series, sequence_length: int = None) -> tuple[np.ndarray, np.ndarray]:
-    """Creates sequences for LSTM input."""
+    """
+    Creates sequences for LSTM input, float32: sequence i is rows i..i+seq_len-1 and its target is the
+    target of row i+seq_len (the day AFTER the sequence). The sequences are a read-only strided view of
+    the rows (no copy); training indexes windows lazily instead (see StockWindowDataset).
+    """
     seq_len = sequence_length or settings.DEFAULT_LSTM_SEQUENCE_LENGTH
-    
-    sequences = []
-    target_values = []
-    
-    # Ensure data and target_series have compatible indices if they are separate
-    # For simplicity, assuming 'data' contains features and 'target_series' is aligned
-    
-    feature_values = data.values
-    
-    for i in range(len(feature_values) - seq_len):
-        seq = feature_values[i : i + seq_len]
-        target = target_series.iloc[i + seq_len] # Target is for the day AFTER the sequence
-        sequences.append(seq)
-        target_values.append(target)
-        
-    return np.array(sequences), np.array(target_values)
\ No newline at end of file
+    feature_values = np.ascontiguousarray(data.to_numpy(dtype=np.float32))
+    target_values = np.asarray(target_series, dtype=np.float32)
+
+    num_sequences = len(feature_values) - seq_len
+    if num_sequences <= 0:
+        return np.empty((0, seq_len, feature_values.shape[1]), dtype=np.float32), np.empty(0, dtype=np.float32)
+    # (rows - seq_len + 1, features, seq_len) windows; the last one has no following row to take a target from
+    windows = sliding_window_view(feature_values, seq_len, axis=0)[:num_sequences]
+    return windows.transpose(0, 2, 1), target_values[seq_len:]
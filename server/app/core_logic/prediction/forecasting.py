@@ -0,0 +1,322 @@
+# backend/app/core_logic/prediction/forecasting.py
+# The stock forecast flow (sentiment + market data -> features -> stored or freshly trained model ->
+# next-step probability), shared by /predict/stock-forecast and the background training jobs.
+# `params` are StockPredictInput fields; missing ones fall back to the config defaults.
+# Run as a module to refresh the stored models of a watchlist (fine-tuning them where possible):
+#   python -m app.core_logic.prediction.forecasting --symbols SPY AAPL MSFT
+#   python -m app.core_logic.prediction.forecasting --watchlist watchlist.txt
+import argparse
+import datetime
+import time
+import pandas as pd
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Tuple, List
+
+from ..analysis import sentiment_analyzer
+from . import market_data_fetcher, feature_engineering, model_registry
+from .stock_predictor import StockPredictorPrototype, configure_torch_threads
+from ...config import settings
+
+
+def effective_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """The forecast parameters with defaults filled in, and the hyperparameters that key the model registry."""
+    effective_symbol = params.get("stock_symbol") or settings.DEFAULT_STOCK_SYMBOL
+    effective_history_days = params.get("data_history_days") or settings.DEFAULT_DAYS_MARKET_DATA # This is for historical data
+
+    # Determine reddit keywords
+    if params.get("reddit_keywords"):
+        effective_reddit_keywords = params["reddit_keywords"]
+    elif effective_symbol:
+        effective_reddit_keywords = [effective_symbol]
+    else:
+        effective_reddit_keywords = [] # Or a default set of general keywords
+    effective_reddit_subreddits = params.get("reddit_subreddits") or ["wallstreetbets", "stocks"]
+
+    return {
+        "symbol": effective_symbol,
+        "history_days": effective_history_days,
+        "reddit_keywords": effective_reddit_keywords,
+        "reddit_subreddits": effective_reddit_subreddits,
+        # Everything that shapes the trained model: a stored model is only reused for the same config
+        "hyperparameters": {
+            "data_history_days": effective_history_days,
+            # Use prototype-specific (faster) training params, allowing user override if provided
+            "epochs": params.get("epochs") or settings.DEFAULT_LSTM_EPOCHS,
+            "batch_size": settings.DEFAULT_LSTM_BATCH_SIZE,
+            "sequence_length": params.get("sequence_length") or settings.DEFAULT_LSTM_SEQUENCE_LENGTH,
+            "learning_rate": settings.DEFAULT_PREDICTION_LR,
+            "hidden_size": settings.DEFAULT_LSTM_HIDDEN_SIZE,
+            "num_layers": settings.DEFAULT_LSTM_NUM_LAYERS,
+            "reddit_subreddits": effective_reddit_subreddits,
+            "reddit_keywords": effective_reddit_keywords,
+            "target_shift_days": 1,
+        },
+    }
+
+
+def prepare_features(effective: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Fetches the sentiment and market data of the look-back period and builds (features with target, market data)."""
+    effective_symbol, effective_history_days = effective["symbol"], effective["history_days"]
+    print(f"Forecast for {effective_symbol}: Fetching data for past {effective_history_days} days.")
+    # 1. Fetch historical sentiment data
+    sentiment_df = pd.DataFrame() # Default to empty
+    if effective["reddit_keywords"] and effective["reddit_subreddits"]:
+        sentiment_df = sentiment_analyzer.analyze_reddit_sentiment(
+            subreddits=effective["reddit_subreddits"],
+            keywords=effective["reddit_keywords"],
+            days_back=effective_history_days # Use the same history length for sentiment
+        )
+    print(f"Sentiment data shape: {sentiment_df.shape}")
+
+    # 2. Fetch historical market data
+    md_fetcher = market_data_fetcher.MarketDataFetcher()
+    end_dt_market = datetime.datetime.now(datetime.timezone.utc) # Fetch up to today
+    start_dt_market = end_dt_market - datetime.timedelta(days=effective_history_days)
+    market_df = md_fetcher.get_stock_data(
+        symbol=effective_symbol,
+        start_date_str=start_dt_market.strftime('%Y-%m-%d'), # yfinance needs YYYY-MM-DD
+        end_date_str=end_dt_market.strftime('%Y-%m-%d')
+    )
+    if market_df.empty:
+        raise ValueError(f"No market data found for {effective_symbol} for the period.")
+    print(f"Market data shape: {market_df.shape}. Last date: {market_df.index[-1]}")
+
+    # 3. Prepare features (this creates the 'target' column based on historical data)
+    features_with_target_df = feature_engineering.prepare_prediction_features(
+        sentiment_df=sentiment_df,
+        market_df=market_df,
+        target_shift_days=1 # Predict 1 day ahead
+    )
+    if features_with_target_df.empty:
+        raise ValueError("Feature preparation resulted in empty data. Try increasing data_history_days.")
+    print(f"Features with target shape: {features_with_target_df.shape}")
+    return features_with_target_df, market_df
+
+
+def _prepare_features(effective: Dict[str, Any], heartbeat: Optional[Callable[[], None]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """prepare_features with heartbeat() called before and after it: the data fetch has no epochs to report."""
+    if heartbeat is not None:
+        heartbeat()
+    prepared = prepare_features(effective)
+    if heartbeat is not None:
+        heartbeat()
+    return prepared
+
+
+def train_model(
+    effective: Dict[str, Any],
+    features_with_target_df: pd.DataFrame,
+    progress_callback: Optional[Callable[[int, int, float], None]] = None
+) -> Tuple[StockPredictorPrototype, Dict[str, Any], float]:
+    """Trains a model on the features and stores it in the registry. Returns (predictor, registry metadata, training seconds)."""
+    hyperparameters = effective["hyperparameters"]
+    train_start_time = time.time()
+    predictor = StockPredictorPrototype()
+    predictor.train(
+        features_df=features_with_target_df,
+        epochs=hyperparameters["epochs"],
+        batch_size=hyperparameters["batch_size"],
+        sequence_length=hyperparameters["sequence_length"],
+        learning_rate=hyperparameters["learning_rate"],
+        hidden_size=hyperparameters["hidden_size"],
+        num_layers=hyperparameters["num_layers"],
+        progress_callback=progress_callback
+    )
+    training_duration = time.time() - train_start_time
+    model_meta = model_registry.save_model(
+        effective["symbol"], predictor, hyperparameters,
+        data_start=features_with_target_df.index[0].date(),
+        data_end=features_with_target_df.index[-1].date()
+    )
+    return predictor, model_meta, training_duration
+
+
+def _full_retrain_reason(predictor: StockPredictorPrototype, model_meta: Dict[str, Any], features_with_target_df: pd.DataFrame) -> Optional[str]:
+    """Why a stored model must be retrained from scratch rather than fine-tuned, or None if it can be fine-tuned."""
+    fine_tune_chain = model_meta.get("fine_tune_chain", 0)
+    if fine_tune_chain >= settings.FINE_TUNE_MAX_CHAIN:
+        return f"fine-tuned {fine_tune_chain} times since its last full training"
+    if features_with_target_df.index[0].date() > datetime.date.fromisoformat(model_meta["data_end"]):
+        return "its data ends before the look-back period"
+    if model_registry.is_stale(model_meta, features_with_target_df.index[-1].date()):
+        return f"its data ends more than {settings.MODEL_MAX_AGE_DAYS} days before the market data"
+    drift = predictor.drift_report(features_with_target_df, settings.DRIFT_WINDOW_ROWS)
+    if drift["feature_shift"] > settings.DRIFT_MAX_FEATURE_SHIFT:
+        return f"feature drift ({drift['shifted_feature']} median moved {drift['feature_shift']:.2f} IQRs)"
+    trained_loss = model_meta.get("final_loss") # Not recorded by models stored before fine-tuning existed
+    if drift["loss"] is not None and trained_loss and drift["loss"] > settings.DRIFT_MAX_LOSS_RATIO * trained_loss:
+        return f"loss drift (recent loss {drift['loss']:.4f} vs {trained_loss:.4f} in training)"
+    return None
+
+
+def refresh_model(
+    effective: Dict[str, Any],
+    features_with_target_df: pd.DataFrame,
+    registered: Tuple[StockPredictorPrototype, Dict[str, Any]],
+    progress_callback: Optional[Callable[[int, int, float], None]] = None
+) -> Tuple[StockPredictorPrototype, Dict[str, Any], float, str]:
+    """
+    Brings a stored model up to date with days it has not seen: fine-tunes it on them (a new registry
+    version), or trains a new model if it drifted or is too far behind (see _full_retrain_reason).
+    Returns (predictor, registry metadata, training seconds, mode): mode is "fine_tune" or "full", or
+    "current" if none of the new days completed a sequence (the model is marked as checked instead).
+    """
+    predictor, base_meta = registered
+    reason = _full_retrain_reason(predictor, base_meta, features_with_target_df)
+    if reason is not None:
+        print(f"Stored model {base_meta['version']} for {effective['symbol']} needs a full retrain: {reason}.")
+        predictor, model_meta, training_duration = train_model(effective, features_with_target_df, progress_callback)
+        return predictor, model_meta, training_duration, "full"
+
+    train_start_time = time.time()
+    fine_tuned = predictor.fine_tune(
+        features_df=features_with_target_df,
+        new_since=datetime.date.fromisoformat(base_meta["data_end"]),
+        epochs=settings.FINE_TUNE_EPOCHS,
+        batch_size=effective["hyperparameters"]["batch_size"],
+        learning_rate=settings.FINE_TUNE_LR,
+        replay_ratio=settings.FINE_TUNE_REPLAY_RATIO,
+        progress_callback=progress_callback
+    )
+    training_duration = time.time() - train_start_time
+    if not fine_tuned["new_sequences"]: # No day's outcome became known since: nothing to learn
+        return predictor, model_registry.mark_checked(base_meta, features_with_target_df.index[-1].date()), training_duration, "current"
+    model_meta = model_registry.save_model(
+        effective["symbol"], predictor, effective["hyperparameters"],
+        data_start=min(datetime.date.fromisoformat(base_meta["data_start"]), features_with_target_df.index[0].date()),
+        data_end=features_with_target_df.index[-1].date(),
+        fine_tuned_from=base_meta
+    )
+    return predictor, model_meta, training_duration, "fine_tune"
+
+
+def run_forecast(params: Dict[str, Any], progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                 heartbeat: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Next-step forecast: reuses the newest stored model for this config, refreshes it when the market
+    data has days it has not seen (see refresh_model), or trains one (when there is none or params["retrain"] is set). Returns the
+    StockPredictOutput fields.
+    progress_callback(epoch, epochs, loss) is called after every training epoch, heartbeat() before
+    and after the data fetch.
+    """
+    effective = effective_params(params)
+    effective_symbol = effective["symbol"]
+    features_with_target_df, market_df = _prepare_features(effective, heartbeat)
+
+    # 4. Reuse the newest stored model for this config or train one on this historical data, then predict the next step
+    last_market_date = market_df.index[-1].date()
+    feature_columns = [col for col in features_with_target_df.columns if col != 'target']
+    registered = None if params.get("retrain") else model_registry.load_latest(effective_symbol, effective["hyperparameters"], feature_columns)
+
+    training_duration, training_mode = None, None
+    if registered is None:
+        predictor, model_meta, training_duration = train_model(effective, features_with_target_df, progress_callback)
+        training_mode = "full"
+    elif model_registry.has_new_data(registered[1], last_market_date):
+        print(f"Stored model {registered[1]['version']} for {effective_symbol} has data up to {registered[1]['data_end']}, refreshing.")
+        predictor, model_meta, training_duration, training_mode = refresh_model(effective, features_with_target_df, registered, progress_callback)
+        if training_mode == "current":
+            training_duration, training_mode = None, None
+    else:
+        predictor, model_meta = registered
+        print(f"Using stored model {model_meta['version']} for {effective_symbol} (trained {model_meta['trained_at']}).")
+    probability_positive = predictor.predict_next_step(features_with_target_df)
+
+    # Determine the date for which the prediction is made
+    # This is typically the next business day after the last date in market_df
+    prediction_for_date = last_market_date + datetime.timedelta(days=1) # Simplistic, doesn't account for weekends/holidays
+    # A better way: find next trading day, or just state "next trading day after X"
+
+    prediction_label = "UP" if probability_positive > 0.55 else ("DOWN" if probability_positive < 0.45 else "NEUTRAL")
+
+    return {
+        "stock_symbol": effective_symbol,
+        "prediction_for_date": prediction_for_date,
+        "probability_positive_movement": probability_positive,
+        "prediction_label": prediction_label,
+        "model_training_duration_seconds": training_duration,
+        "data_used_for_training_period": f"{model_meta['data_start']} to {model_meta['data_end']}",
+        "model_version": model_meta["version"],
+        "model_trained_at": model_meta["trained_at"],
+        "model_reused": training_mode is None,
+        "model_training_mode": training_mode,
+        "message": {
+            None: "Prediction generated with a stored model.",
+            "fine_tune": "Prediction generated after fine-tuning the stored model on recent data.",
+            "full": "Prediction generated after on-the-fly model training.",
+        }[training_mode],
+    }
+
+
+def run_training(params: Dict[str, Any], progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                 heartbeat: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """Trains and stores a new model for the forecast config of `params` (no prediction). Returns its registry metadata and training time."""
+    effective = effective_params(params)
+    features_with_target_df, _ = _prepare_features(effective, heartbeat)
+    _, model_meta, training_duration = train_model(effective, features_with_target_df, progress_callback)
+    return dict(model_meta, training_duration_seconds=training_duration)
+
+
+def run_refresh(params: Dict[str, Any], progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                heartbeat: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Daily refresh of the stored model for the forecast config of `params` (no prediction): a model that
+    has seen every market day is kept, otherwise it is fine-tuned on the new days or retrained (see
+    refresh_model); a missing one is trained.
+    Returns the registry metadata of the resulting model, its training time and training_mode
+    ("current", "fine_tune" or "full").
+    """
+    effective = effective_params(params)
+    features_with_target_df, market_df = _prepare_features(effective, heartbeat)
+    feature_columns = [col for col in features_with_target_df.columns if col != 'target']
+    registered = model_registry.load_latest(effective["symbol"], effective["hyperparameters"], feature_columns)
+    if registered is None:
+        _, model_meta, training_duration = train_model(effective, features_with_target_df, progress_callback)
+        training_mode = "full"
+    elif model_registry.has_new_data(registered[1], market_df.index[-1].date()):
+        _, model_meta, training_duration, training_mode = refresh_model(effective, features_with_target_df, registered, progress_callback)
+        if training_mode == "current":
+            training_duration = None
+    else:
+        model_meta, training_duration, training_mode = registered[1], None, "current"
+    return dict(model_meta, training_duration_seconds=training_duration, training_mode=training_mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the stored forecast models of a watchlist (fine-tuning them on new days where possible).")
+    watchlist = parser.add_mutually_exclusive_group(required=True)
+    watchlist.add_argument("--symbols", nargs="+", help="Symbols to refresh")
+    watchlist.add_argument("--watchlist", type=Path, help="File with one symbol per line (# comments allowed)")
+    parser.add_argument("--history-days", type=int, default=None, help="Days of data per model (default: DEFAULT_DAYS_MARKET_DATA)")
+    parser.add_argument("--full", action="store_true", help="Retrain every model from scratch instead")
+    args = parser.parse_args()
+
+    if args.watchlist is not None:
+        lines = (line.split("#")[0].strip() for line in args.watchlist.read_text().splitlines())
+        symbols = [line for line in lines if line]
+    else:
+        symbols = args.symbols
+
+    configure_torch_threads()
+    started = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    for index, symbol in enumerate(symbols, start=1):
+        symbol_started = time.perf_counter()
+        params = {"stock_symbol": symbol, "data_history_days": args.history_days}
+        try:
+            result = run_training(params) if args.full else run_refresh(params)
+        except Exception as e:
+            print(f"[{index}/{len(symbols)}] {symbol}: failed: {e}")
+            continue
+        mode = "full" if args.full else result["training_mode"]
+        results.append(dict(result, training_mode=mode))
+        print(f"[{index}/{len(symbols)}] {symbol}: {mode} -> {result['version']} (data to {result['data_end']}) in {time.perf_counter() - symbol_started:.2f}s")
+
+    elapsed = time.perf_counter() - started
+    modes = {mode: sum(r["training_mode"] == mode for r in results) for mode in ("current", "fine_tune", "full")}
+    print(f"\nRefreshed {len(results)}/{len(symbols)} symbols in {elapsed:.2f}s: "
+          f"{modes['current']} current, {modes['fine_tune']} fine-tuned, {modes['full']} retrained.")
+
+
+if __name__ == "__main__":
+    main()
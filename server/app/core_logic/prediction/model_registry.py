@@ -0,0 +1,178 @@
+# backend/app/core_logic/prediction/model_registry.py
+# Registry of trained forecast models under MODEL_REGISTRY_PATH, one directory per model:
+#   {SYMBOL}/{config key}/{version}/model.pt      LSTM weights (state dict)
+#                                   scaler.joblib fitted RobustScaler
+#                                   meta.json     hyperparameters, feature columns, data range, trained_at
+# The config key is a digest of everything that shapes the model (hyperparameters and the sentiment
+# sources behind the features), so a forecast only reuses a model trained the same way. The newest
+# version is used as is until the market data has a day it has not seen; it is then refreshed, by
+# fine-tuning it (a new version) or training from scratch (see forecasting.refresh_model).
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import joblib
+import torch
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Tuple
+
+from ..models.sentiment_lstm import SentimentLSTM
+from .stock_predictor import StockPredictorPrototype
+from ...config import settings
+
+REGISTRY_VERSION = 1
+
+
+def _registry_path() -> Path:
+    return Path(".") / settings.MODEL_REGISTRY_PATH
+
+
+def config_key(hyperparameters: Dict[str, Any]) -> str:
+    """Digest of a training config (JSON-serializable values; list order matters only where it changes the features)."""
+    canonical = {key: sorted(value) if isinstance(value, list) else value for key, value in hyperparameters.items()}
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def save_model(
+    symbol: str,
+    predictor: StockPredictorPrototype,
+    hyperparameters: Dict[str, Any],
+    data_start: dt.date,
+    data_end: dt.date,
+    fine_tuned_from: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Stores a trained predictor as a new version and returns its metadata (older versions beyond
+    MODEL_REGISTRY_KEEP_VERSIONS are removed). fine_tuned_from is the metadata of the version a
+    warm-started model was fine-tuned from.
+    """
+    if predictor.model is None or predictor.scaler is None:
+        raise RuntimeError("Model not trained or essential components missing.")
+    symbol = symbol.upper()
+    key = config_key(hyperparameters)
+    trained_at = dt.datetime.now(dt.timezone.utc)
+    version = trained_at.strftime("%Y%m%dT%H%M%S%fZ")
+    meta = {
+        "registry_version": REGISTRY_VERSION,
+        "symbol": symbol,
+        "config_key": key,
+        "version": version,
+        "trained_at": trained_at.isoformat(),
+        "hyperparameters": hyperparameters,
+        "feature_columns": predictor.trained_feature_columns,
+        "input_feature_size": predictor.input_feature_size,
+        "sequence_length": predictor.sequence_length,
+        "data_start": data_start.isoformat(),
+        "data_end": data_end.isoformat(),
+        "final_loss": predictor.final_loss,
+        "training_mode": "fine_tune" if fine_tuned_from is not None else "full",
+        "fine_tuned_from": fine_tuned_from["version"] if fine_tuned_from is not None else None,
+        "fine_tune_chain": fine_tuned_from.get("fine_tune_chain", 0) + 1 if fine_tuned_from is not None else 0, # Fine-tunes since the last full training
+    }
+
+    config_dir = _registry_path() / symbol / key
+    tmp_dir = config_dir / f".{version}.tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    torch.save(predictor.model.state_dict(), tmp_dir / "model.pt")
+    joblib.dump(predictor.scaler, tmp_dir / "scaler.joblib")
+    (tmp_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    os.replace(tmp_dir, config_dir / version) # Readers only ever see complete versions
+    print(f"Model registry: saved {symbol} {key}/{version} (data {meta['data_start']} to {meta['data_end']}).")
+
+    for old_dir in _version_dirs(config_dir)[settings.MODEL_REGISTRY_KEEP_VERSIONS:]:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+def _version_dirs(config_dir: Path) -> List[Path]:
+    """Complete versions of one symbol and config, newest first (version names sort by training time)."""
+    if not config_dir.is_dir():
+        return []
+    return sorted((p for p in config_dir.iterdir() if p.is_dir() and not p.name.startswith(".")), key=lambda p: p.name, reverse=True)
+
+
+def _read_meta(version_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        meta = json.loads((version_dir / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("registry_version") == REGISTRY_VERSION else None
+
+
+def list_models(symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Metadata of every stored model (of one symbol if given), newest first within each config."""
+    root = _registry_path()
+    if not root.is_dir():
+        return []
+    symbol_dirs = [root / symbol.upper()] if symbol else sorted(p for p in root.iterdir() if p.is_dir())
+    models = []
+    for symbol_dir in symbol_dirs:
+        if not symbol_dir.is_dir():
+            continue
+        for config_dir in sorted(p for p in symbol_dir.iterdir() if p.is_dir()):
+            models.extend(meta for meta in map(_read_meta, _version_dirs(config_dir)) if meta is not None)
+    return models
+
+
+def load_latest(
+    symbol: str,
+    hyperparameters: Dict[str, Any],
+    feature_columns: Optional[List[str]] = None
+) -> Optional[Tuple[StockPredictorPrototype, Dict[str, Any]]]:
+    """
+    The newest model of the symbol trained with this config (and, if given, these feature columns),
+    ready for inference, with its metadata. None if there is no compatible model.
+    """
+    config_dir = _registry_path() / symbol.upper() / config_key(hyperparameters)
+    for version_dir in _version_dirs(config_dir):
+        meta = _read_meta(version_dir)
+        if meta is None or (feature_columns is not None and meta["feature_columns"] != feature_columns):
+            continue
+        try:
+            return _load_predictor(version_dir, meta), meta
+        except Exception as e: # Damaged or written by an incompatible version: try the next one
+            print(f"Model registry: skipping {version_dir}: {e}")
+    return None
+
+
+def _load_predictor(version_dir: Path, meta: Dict[str, Any]) -> StockPredictorPrototype:
+    predictor = StockPredictorPrototype()
+    predictor.trained_feature_columns = meta["feature_columns"]
+    predictor.input_feature_size = meta["input_feature_size"]
+    predictor.sequence_length = meta["sequence_length"]
+    predictor.model = SentimentLSTM(
+        input_size=predictor.input_feature_size,
+        hidden_size=meta["hyperparameters"]["hidden_size"],
+        num_layers=meta["hyperparameters"]["num_layers"]
+    ).to(predictor.device)
+    predictor.model.load_state_dict(torch.load(version_dir / "model.pt", map_location=predictor.device, weights_only=True))
+    predictor.model.eval()
+    predictor.scaler = joblib.load(version_dir / "scaler.joblib")
+    return predictor
+
+
+def has_new_data(meta: Dict[str, Any], latest_data_date: dt.date) -> bool:
+    """True if the market data has a day after the model's data that it has not been refreshed or checked for."""
+    seen_until = max(meta["data_end"], meta.get("last_checked") or meta["data_end"])
+    return latest_data_date > dt.date.fromisoformat(seen_until)
+
+
+def mark_checked(meta: Dict[str, Any], latest_data_date: dt.date) -> Dict[str, Any]:
+    """Records that the model was checked against the data up to latest_data_date and needed no new version."""
+    meta = dict(meta, last_checked=latest_data_date.isoformat())
+    version_dir = _registry_path() / meta["symbol"] / meta["config_key"] / meta["version"]
+    tmp_path = version_dir / f".meta.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        tmp_path.write_text(json.dumps(meta, indent=2))
+        os.replace(tmp_path, version_dir / "meta.json")
+    except OSError as e: # Pruned meanwhile: the next refresh checks it again
+        print(f"Model registry: could not update {version_dir}: {e}")
+        tmp_path.unlink(missing_ok=True)
+    return meta
+
+
+def is_stale(meta: Dict[str, Any], latest_data_date: dt.date) -> bool:
+    """True once the market data extends more than MODEL_MAX_AGE_DAYS past the data the model was trained on."""
+    return (latest_data_date - dt.date.fromisoformat(meta["data_end"])).days > settings.MODEL_MAX_AGE_DAYS
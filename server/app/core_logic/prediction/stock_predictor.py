@@ -219,12 +219,22 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader
+from typing import Optional, List, Callable, Dict, Any
+import datetime
 
 from ..models.sentiment_lstm import SentimentLSTM
-from ..models.stock_dataset import StockDataset
+from ..models.stock_dataset import StockWindowDataset
 from . import feature_engineering
 from ...config import settings
 
+def configure_torch_threads():
+    """
+    Applies TORCH_NUM_THREADS (process-wide). Called once when a training process starts (job workers,
+    the refresh CLI), not per training, so the API process keeps torch's default.
+    """
+    if settings.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
+
 class StockPredictorPrototype: # Renamed for clarity of its purpose
     def __init__(self):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -232,6 +242,8 @@ class StockPredictorPrototype: # Renamed for clarity of its purpose
         self.scaler = None
         self.trained_feature_columns: Optional[List[str]] = None
         self.input_feature_size: Optional[int] = None
+        self.sequence_length: Optional[int] = None
+        self.final_loss: Optional[float] = None # Mean training loss of the last epoch
 
     def train_and_predict_next_step(
         self,
@@ -247,6 +259,27 @@ class StockPredictorPrototype: # Renamed for clarity of its purpose
         Trains a model on the provided historical features_df and uses the
         very last sequence from this data to predict the step immediately following it.
         """
+        self.train(features_df, epochs, batch_size, sequence_length, learning_rate, hidden_size, num_layers)
+        return self.predict_next_step(features_df)
+
+    def train(
+        self,
+        features_df: pd.DataFrame, # Historical features including 'target'
+        epochs: int,
+        batch_size: int,
+        sequence_length: int,
+        learning_rate: float,
+        hidden_size: int,
+        num_layers: int,
+        progress_callback: Optional[Callable[[int, int, float], None]] = None,
+        early_stopping_patience: Optional[int] = None,
+        engine: Optional[str] = None
+    ):
+        """
+        Fits the scaler and trains a new model on all the sequences of features_df.
+        progress_callback(epoch, epochs, mean loss) is called after every epoch; an exception it raises stops the training.
+        early_stopping_patience (default TRAINING_EARLY_STOPPING_PATIENCE) and engine: see _fit.
+        """
         if 'target' not in features_df.columns:
             raise ValueError("'target' column missing from features_df.")
 
@@ -255,58 +288,215 @@ class StockPredictorPrototype: # Renamed for clarity of its purpose
             raise ValueError("No feature columns found.")
 
         X_data = features_df[self.trained_feature_columns]
-        y_data = features_df['target']
 
         X_scaled_df, self.scaler = feature_engineering.scale_features(X_data)
         self.input_feature_size = X_scaled_df.shape[1]
+        self.sequence_length = sequence_length
 
         # For this prototype, we train on almost all data to predict the next step.
         # A small test set can still be useful for a sanity check during this ad-hoc training.
-        # Or, we can train on ALL of X_seq, y_seq and then form the *very last* sequence for prediction.
+        # Or, we can train on ALL sequences and then form the *very last* sequence for prediction.
         
-        X_seq, y_seq = feature_engineering.create_lstm_sequences(X_scaled_df, y_data, sequence_length)
+        # Sequences are windows over the scaled rows, sliced per batch (see StockWindowDataset)
+        train_dataset = StockWindowDataset(X_scaled_df.to_numpy(dtype=np.float32), features_df['target'].to_numpy(dtype=np.float32), sequence_length)
 
-        if len(X_seq) < 2: # Need at least one for training, one for forming prediction input
+        if len(train_dataset) < 2: # Need at least one for training, one for forming prediction input
             raise ValueError("Not enough data to create at least two sequences after processing. Increase data_history_days.")
 
-        # Use all available sequences for training in this prototype predict flow
-        train_dataset = StockDataset(X_seq, y_seq)
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-
         self.model = SentimentLSTM(
             input_size=self.input_feature_size,
             hidden_size=hidden_size,
             num_layers=num_layers
         ).to(self.device)
 
+        # Use all available sequences for training in this prototype predict flow
+        print(f"Prototype: Training model for {epochs} epochs to predict next step...")
+        if early_stopping_patience is None:
+            early_stopping_patience = settings.TRAINING_EARLY_STOPPING_PATIENCE
+        self._fit(train_dataset, epochs, batch_size, learning_rate, progress_callback, early_stopping_patience, engine)
+
+    def _fit(
+        self,
+        train_dataset: StockWindowDataset,
+        epochs: int,
+        batch_size: int,
+        learning_rate: float,
+        progress_callback: Optional[Callable[[int, int, float], None]] = None,
+        early_stopping_patience: int = 0,
+        engine: Optional[str] = None
+    ):
+        """
+        Trains self.model (new or warm-started) on the given sequences with a fresh optimizer.
+        With early_stopping_patience, the last DEFAULT_PREDICTION_TEST_SIZE of the sequences are held out
+        and training stops once their loss has not improved for that many epochs, keeping the best weights.
+        engine ("tensor" or "dataloader", default TRAINING_ENGINE) picks the batching loop.
+        """
+        validation_dataset = None
+        if early_stopping_patience > 0:
+            num_validation = int(len(train_dataset) * settings.DEFAULT_PREDICTION_TEST_SIZE)
+            if num_validation > 0 and len(train_dataset) - num_validation > 0:
+                starts = np.sort(train_dataset.starts) # Hold out the most recent sequences
+                validation_dataset = train_dataset.subset(starts[-num_validation:])
+                train_dataset = train_dataset.subset(starts[:-num_validation])
+
         criterion = nn.BCELoss()
         optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
-
-        print(f"Prototype: Training model for {epochs} epochs to predict next step...")
+        engine = engine or settings.TRAINING_ENGINE
+        if engine == "tensor" and len(train_dataset) <= settings.TRAINING_TENSOR_MAX_SEQUENCES:
+            # Small enough to keep whole: one contiguous tensor, shuffled by permuting it once per epoch
+            X_train, y_train = (t.to(self.device) for t in train_dataset.tensors())
+            run_epoch = lambda: self._tensor_epoch(X_train, y_train, batch_size, criterion, optimizer)
+        else:
+            train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
+            run_epoch = lambda: self._loader_epoch(train_loader, criterion, optimizer)
+        if validation_dataset is not None:
+            X_validation, y_validation = (t.to(self.device) for t in validation_dataset.tensors())
+
+        best_validation_loss, best_state, best_train_loss, epochs_without_improvement = float("inf"), None, None, 0
         for epoch in range(epochs):
             self.model.train()
-            for batch_X, batch_y in train_loader:
-                batch_X, batch_y = batch_X.to(self.device), batch_y.to(self.device).unsqueeze(1)
-                outputs = self.model(batch_X)
-                loss = criterion(outputs, batch_y)
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+            self.final_loss = run_epoch() / len(train_dataset)
+            if progress_callback is not None:
+                progress_callback(epoch + 1, epochs, self.final_loss)
             if (epoch + 1) % (epochs // 2 if epochs > 1 else 1) == 0 or epoch == 0 : # Log a few times
                  print(f"Epoch [{epoch+1}/{epochs}] completed.")
-        
-        # Now, create the input for predicting the *actual* next step
-        # We need the last `sequence_length` worth of SCALED features from the *original* X_scaled_df
-        
-        if len(X_scaled_df) < sequence_length:
-            raise ValueError(f"Not enough historical scaled data ({len(X_scaled_df)}) to form a prediction sequence of length {sequence_length}.")
+            if validation_dataset is None:
+                continue
+
+            self.model.eval()
+            with torch.no_grad():
+                validation_loss = criterion(self.model(X_validation), y_validation.unsqueeze(1)).item()
+            if validation_loss < best_validation_loss:
+                best_validation_loss, best_train_loss, epochs_without_improvement = validation_loss, self.final_loss, 0
+                best_state = {key: value.detach().clone() for key, value in self.model.state_dict().items()}
+            else:
+                epochs_without_improvement += 1
+                if epochs_without_improvement >= early_stopping_patience:
+                    print(f"Early stopping after epoch {epoch+1}: held-out loss has not improved for {early_stopping_patience} epochs.")
+                    break
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+            self.final_loss = best_train_loss
+
+    def _tensor_epoch(self, X_train: torch.Tensor, y_train: torch.Tensor, batch_size: int, criterion, optimizer) -> float:
+        """One epoch over in-memory tensors: batches are slices of a permuted copy, no per-sample collation. Returns the summed loss."""
+        permutation = torch.randperm(len(X_train), device=X_train.device)
+        X_shuffled, y_shuffled = X_train[permutation], y_train[permutation].unsqueeze(1)
+        epoch_loss = torch.zeros((), device=X_train.device)
+        for batch_start in range(0, len(X_shuffled), batch_size):
+            batch_X = X_shuffled[batch_start:batch_start + batch_size]
+            batch_y = y_shuffled[batch_start:batch_start + batch_size]
+            loss = criterion(self.model(batch_X), batch_y)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.detach() * len(batch_X)
+        return epoch_loss.item()
+
+    def _loader_epoch(self, train_loader: DataLoader, criterion, optimizer) -> float:
+        """One epoch through a shuffled DataLoader. Returns the summed loss."""
+        epoch_loss = 0.0
+        for batch_X, batch_y in train_loader:
+            batch_X, batch_y = batch_X.to(self.device), batch_y.to(self.device).unsqueeze(1)
+            outputs = self.model(batch_X)
+            loss = criterion(outputs, batch_y)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.item() * len(batch_X)
+        return epoch_loss
+
+    def _scaled_rows(self, features_df: pd.DataFrame):
+        """
+        (rows, row targets, target dates) of features_df, float32 and scaled with the training scaler;
+        sequence i is rows i..i+sequence_length-1 and predicts row i + sequence_length, dated target_dates[i].
+        """
+        X_scaled_df, _ = feature_engineering.scale_features(features_df[self.trained_feature_columns], self.scaler)
+        target_dates = np.array([timestamp.date() for timestamp in features_df.index[self.sequence_length:]])
+        return X_scaled_df.to_numpy(dtype=np.float32), features_df['target'].to_numpy(dtype=np.float32), target_dates
 
-        last_sequence_for_prediction_np = X_scaled_df.iloc[-sequence_length:].values
-        last_sequence_tensor = torch.FloatTensor([last_sequence_for_prediction_np]).to(self.device) # Batch of 1
+    def drift_report(self, features_df: pd.DataFrame, window_rows: int) -> Dict[str, Any]:
+        """
+        How far the last `window_rows` rows of features_df are from what the model was trained on:
+        feature_shift is the largest shift of a feature's median, in training interquartile ranges (the
+        RobustScaler's units), and loss is the model's mean loss on the sequences predicting those rows.
+        """
+        if self.model is None or self.scaler is None:
+            raise RuntimeError("Model not trained or loaded.")
+        recent_df = features_df.iloc[-window_rows:]
+        recent_scaled_df, _ = feature_engineering.scale_features(recent_df[self.trained_feature_columns], self.scaler)
+        feature_shifts = recent_scaled_df.median().abs()
+
+        rows, row_targets, _ = self._scaled_rows(features_df)
+        X_seq, y_seq = feature_engineering.create_lstm_sequences(pd.DataFrame(rows), row_targets, self.sequence_length)
+        X_seq, y_seq = X_seq[:-1][-window_rows:], y_seq[:-1][-window_rows:] # The last row's target is not known yet
+        loss = None
+        if len(X_seq):
+            self.model.eval()
+            with torch.no_grad():
+                outputs = self.model(torch.from_numpy(np.ascontiguousarray(X_seq)).to(self.device))
+                loss = nn.BCELoss()(outputs, torch.from_numpy(y_seq).to(self.device).unsqueeze(1)).item()
+        return {
+            "feature_shift": float(feature_shifts.max()),
+            "shifted_feature": str(feature_shifts.idxmax()),
+            "loss": loss,
+        }
+
+    def fine_tune(
+        self,
+        features_df: pd.DataFrame, # Historical features including 'target', covering the new days
+        new_since: datetime.date, # Last day the model was trained on
+        epochs: int,
+        batch_size: int,
+        learning_rate: float,
+        replay_ratio: float,
+        progress_callback: Optional[Callable[[int, int, float], None]] = None,
+        seed: int = 0
+    ) -> Dict[str, int]:
+        """
+        Warm start: keeps the architecture, weights and scaler and trains a few more epochs on the
+        sequences whose target became known after the model was trained (days from new_since on, whose
+        next-day return was still missing then), mixed with a random replay sample of older sequences
+        (replay_ratio per new one, at least a batch) so the model does not forget them.
+        Returns the number of new and replayed sequences trained on.
+        """
+        if self.model is None or self.scaler is None:
+            raise RuntimeError("Model not trained or loaded.")
+        rows, row_targets, target_dates = self._scaled_rows(features_df)
+        target_dates = target_dates[:-1] # The last row's target is not known yet
+        is_new = target_dates >= new_since
+        new_indices = np.flatnonzero(is_new)
+        if not len(new_indices):
+            return {"new_sequences": 0, "replayed_sequences": 0}
+        old_indices = np.flatnonzero(~is_new)
+        replay_size = min(len(old_indices), max(int(replay_ratio * len(new_indices)), batch_size))
+        replay_indices = np.random.default_rng(seed).choice(old_indices, size=replay_size, replace=False)
+        selected = np.concatenate([new_indices, replay_indices])
+
+        print(f"Prototype: Fine-tuning for {epochs} epochs on {len(new_indices)} new and {replay_size} replayed sequences...")
+        self._fit(StockWindowDataset(rows, row_targets, self.sequence_length, starts=selected), epochs, batch_size, learning_rate, progress_callback)
+        return {"new_sequences": int(len(new_indices)), "replayed_sequences": int(replay_size)}
+
+    def predict_next_step(self, features_df: pd.DataFrame) -> float: # Returns probability for the next step
+        """
+        Predicts the step following the last row of features_df with the trained (or loaded) model:
+        the last `sequence_length` rows are scaled with the scaler fitted at training time.
+        """
+        if self.model is None or self.scaler is None:
+            raise RuntimeError("Model not trained or loaded.")
+        missing = [col for col in self.trained_feature_columns if col not in features_df.columns]
+        if missing:
+            raise ValueError(f"Feature column(s) {', '.join(missing)} used in training are missing.")
+        # We need the last `sequence_length` worth of SCALED features, in the training column order
+        if len(features_df) < self.sequence_length:
+            raise ValueError(f"Not enough historical data ({len(features_df)}) to form a prediction sequence of length {self.sequence_length}.")
+
+        recent_scaled_df, _ = feature_engineering.scale_features(features_df[self.trained_feature_columns].iloc[-self.sequence_length:], self.scaler)
+        last_sequence_tensor = torch.FloatTensor(recent_scaled_df.values[np.newaxis]).to(self.device) # Batch of 1
 
         self.model.eval()
         with torch.no_grad():
             prediction_prob = self.model(last_sequence_tensor).item()
         
         print(f"Prototype: Prediction probability for next step: {prediction_prob}")
-        return prediction_prob
\ No newline at end of file
+        return prediction_prob
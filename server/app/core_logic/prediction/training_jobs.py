@@ -0,0 +1,233 @@
+# backend/app/core_logic/prediction/training_jobs.py
+# Background training and forecast jobs. A submitted job is stored in the training_jobs table and run
+# in a bounded process pool (TRAINING_JOB_WORKERS), so model training never blocks the API's event
+# loop. Workers record per-epoch progress, which doubles as a heartbeat and the cancellation check
+# (the data fetch before training is bracketed by heartbeats too);
+# an identical job of the same user (same type and effective parameters) that is still queued or
+# running is shared instead of being submitted again. Running jobs whose worker died are marked
+# failed (at once when the pool notices, else once their heartbeat is TRAINING_JOB_STALE_SECONDS old),
+# and queued jobs survive a restart: recover_jobs() resubmits them.
+import datetime
+import functools
+import hashlib
+import json
+import multiprocessing
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ...config import settings
+from ...crud import job_crud
+from ...db import models
+from ...db.database import SessionLocal
+from . import forecasting
+from .stock_predictor import configure_torch_threads
+
+try:
+    import fcntl
+except ImportError: # No flock on Windows: every server process then recovers jobs (claiming still runs each once)
+    fcntl = None
+
+JOB_TYPES = ["train", "forecast", "refresh"]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Process pool for training jobs, created on first use and again after a worker crash broke it;
+# spawned (not forked) so workers do not inherit the server's torch threads or database connections
+_job_pool: Optional[ProcessPoolExecutor] = None
+_job_pool_lock = threading.Lock()
+_recovery_lock_file = None # Held for the life of the server process that recovers jobs
+
+def _get_job_pool() -> ProcessPoolExecutor:
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is None:
+            _job_pool = ProcessPoolExecutor(
+                max_workers=settings.TRAINING_JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_torch_threads
+            )
+        return _job_pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drops a broken pool so the next submission creates a new one."""
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is pool:
+            _job_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _job_pool
+    with _job_pool_lock:
+        pool, _job_pool = _job_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True) # Queued jobs stay queued in the table
+
+
+def _submit_to_pool(job_id: int):
+    """Hands a job to the pool, replacing the pool once if a crashed worker broke it."""
+    for attempt in range(2):
+        pool = _get_job_pool()
+        try:
+            future = pool.submit(run_job, job_id)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if attempt:
+                raise
+            continue
+        future.add_done_callback(functools.partial(_on_job_done, job_id, pool))
+        return
+
+
+def _on_job_done(job_id: int, pool: ProcessPoolExecutor, future: Future):
+    """
+    run_job handles its own errors, so a failed future means its worker process died (the pool is then
+    broken and every pending job fails with it): the job is marked failed if it was running, and
+    resubmitted to a new pool if it had not started yet.
+    """
+    if future.cancelled() or future.exception() is None:
+        return
+    _discard_pool(pool)
+    db = SessionLocal()
+    try:
+        if job_crud.fail_running_job(db, job_id, f"The worker process running the job died: {future.exception()}"):
+            print(f"Training job {job_id} failed: its worker process died.")
+        elif (job := job_crud.get_job(db, job_id)) is not None and job.status == "queued":
+            _submit_to_pool(job_id)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+def _fail_stale_jobs(db: Session):
+    """Running jobs without a heartbeat for TRAINING_JOB_STALE_SECONDS died with their worker or server."""
+    stale_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=settings.TRAINING_JOB_STALE_SECONDS)
+    failed = job_crud.fail_stale_jobs(db, stale_before)
+    if failed:
+        print(f"Marked {failed} stale running training job(s) failed.")
+
+
+def dedup_key(job_type: str, params: Dict[str, Any], user_id: int) -> str:
+    """Digest of the user, the job type and the effective forecast config, so omitted and default parameters match."""
+    effective = forecasting.effective_params(params)
+    identity = {"user_id": user_id, "job_type": job_type, "symbol": effective["symbol"].upper(), "hyperparameters": effective["hyperparameters"]}
+    if job_type == "forecast":
+        identity["retrain"] = bool(params.get("retrain"))
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+def submit_job(db: Session, user_id: int, job_type: str, params: Dict[str, Any]) -> Tuple[models.TrainingJob, bool]:
+    """Queues a job, or returns the identical job of this user already queued or running. Returns (job, deduplicated)."""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type '{job_type}'. Choose one of {', '.join(JOB_TYPES)}.")
+    key = dedup_key(job_type, params, user_id)
+    _fail_stale_jobs(db) # A dead job must not hold its dedup key
+    existing = job_crud.get_active_job(db, key)
+    if existing is not None:
+        return existing, True
+    try:
+        job = job_crud.create_job(db, user_id=user_id, job_type=job_type, params=params, dedup_key=key)
+    except IntegrityError: # Submitted concurrently by another request
+        db.rollback()
+        existing = job_crud.get_active_job(db, key)
+        if existing is None:
+            raise
+        return existing, True
+    try:
+        _submit_to_pool(job.id)
+    except Exception as e: # Otherwise the queued row would never run and would hold its dedup key
+        job_crud.finish_job(db, job.id, "failed", error=f"Could not start the job: {e}", from_status="queued")
+        raise
+    print(f"Training job {job.id} ({job_type}) queued.")
+    return job, False
+
+
+def _to_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    return json.loads(json.dumps(result, default=lambda v: v.isoformat() if isinstance(v, (datetime.date, datetime.datetime)) else str(v)))
+
+
+def run_job(job_id: int):
+    """Worker task: runs one job unless it was cancelled (or claimed by another worker) while queued."""
+    db = SessionLocal()
+    try:
+        job = job_crud.claim_job(db, job_id)
+        if job is None:
+            return
+
+        def on_epoch(epoch: int, epochs: int, loss: float):
+            if job_crud.update_progress(db, job_id, {"epoch": epoch, "epochs": epochs, "loss": loss}):
+                raise JobCancelled()
+
+        def heartbeat(): # Fetching the data can outlast TRAINING_JOB_STALE_SECONDS
+            if job_crud.touch_job(db, job_id):
+                raise JobCancelled()
+
+        print(f"Training job {job_id} ({job.job_type}) started.")
+        try:
+            if job.job_type == "train":
+                result = forecasting.run_training(job.params, progress_callback=on_epoch, heartbeat=heartbeat)
+            elif job.job_type == "refresh":
+                result = forecasting.run_refresh(job.params, progress_callback=on_epoch, heartbeat=heartbeat)
+            else:
+                result = forecasting.run_forecast(job.params, progress_callback=on_epoch, heartbeat=heartbeat)
+        except JobCancelled:
+            status, outcome = "cancelled", {}
+        except Exception as e:
+            traceback.print_exc()
+            status, outcome = "failed", {"error": str(e)}
+        else:
+            status, outcome = "succeeded", {"result": _to_json(result)}
+        if job_crud.finish_job(db, job_id, status, **outcome):
+            print(f"Training job {job_id} {status}.")
+        else: # Reaped as stale meanwhile: its recorded failure stands
+            print(f"Training job {job_id} {status}, but it was no longer running (already {job_crud.get_job(db, job_id).status}); outcome not recorded.")
+    finally:
+        db.close()
+
+
+def _acquire_recovery_lock() -> bool:
+    """True in the one server process (of several workers) that recovers jobs; the lock is held until it exits."""
+    global _recovery_lock_file
+    if fcntl is None or _recovery_lock_file is not None:
+        return True
+    lock_path = Path(".") / settings.TRAINING_JOB_LOCK_PATH
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    lock_file = open(lock_path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _recovery_lock_file = lock_file
+    return True
+
+
+def recover_jobs():
+    """
+    At startup, in one server process only: running jobs without a heartbeat for TRAINING_JOB_STALE_SECONDS
+    died with their server and are marked failed; queued jobs are resubmitted (claiming keeps each from running twice).
+    """
+    if not _acquire_recovery_lock():
+        return
+    db = SessionLocal()
+    try:
+        _fail_stale_jobs(db)
+        queued = job_crud.get_jobs_by_status(db, "queued")
+        for job in queued:
+            _submit_to_pool(job.id)
+        if queued:
+            print(f"Resubmitted {len(queued)} queued training job(s).")
+    finally:
+        db.close()
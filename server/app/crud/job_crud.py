@@ -0,0 +1,108 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from typing import Any, Dict, List, Optional
+from ..db import models
+
+ACTIVE_STATUSES = ("queued", "running")
+
+def create_job(db: Session, user_id: int, job_type: str, params: Dict[str, Any], dedup_key: str) -> models.TrainingJob:
+    """Raises IntegrityError if an identical job is already queued or running (see TrainingJob.__table_args__)."""
+    db_job = models.TrainingJob(
+        user_id=user_id,
+        job_type=job_type,
+        status="queued",
+        dedup_key=dedup_key,
+        params=params,
+        cancel_requested=False
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: int) -> Optional[models.TrainingJob]:
+    return db.query(models.TrainingJob).filter(models.TrainingJob.id == job_id).first()
+
+def get_active_job(db: Session, dedup_key: str) -> Optional[models.TrainingJob]:
+    """The queued or running job with this dedup key, if any."""
+    return db.query(models.TrainingJob)\
+             .filter(models.TrainingJob.dedup_key == dedup_key, models.TrainingJob.status.in_(ACTIVE_STATUSES))\
+             .first()
+
+def get_jobs_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 20) -> List[models.TrainingJob]:
+    return db.query(models.TrainingJob)\
+             .filter(models.TrainingJob.user_id == user_id)\
+             .order_by(models.TrainingJob.created_at.desc())\
+             .offset(skip)\
+             .limit(limit)\
+             .all()
+
+def claim_job(db: Session, job_id: int) -> Optional[models.TrainingJob]:
+    """Moves a queued job to running (atomically: only one worker wins). None if it is no longer queued."""
+    claimed = db.query(models.TrainingJob)\
+                .filter(models.TrainingJob.id == job_id, models.TrainingJob.status == "queued")\
+                .update({"status": "running", "started_at": func.now(), "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return get_job(db, job_id) if claimed else None
+
+def update_progress(db: Session, job_id: int, progress: Dict[str, Any]) -> bool:
+    """Records a running job's progress (and heartbeat). Returns True if its cancellation was requested."""
+    db.query(models.TrainingJob)\
+      .filter(models.TrainingJob.id == job_id)\
+      .update({"progress": progress, "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return bool(db.query(models.TrainingJob.cancel_requested).filter(models.TrainingJob.id == job_id).scalar())
+
+def touch_job(db: Session, job_id: int) -> bool:
+    """Records a running job's heartbeat between epochs (progress unchanged). Returns True if its cancellation was requested."""
+    db.query(models.TrainingJob)\
+      .filter(models.TrainingJob.id == job_id)\
+      .update({"updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return bool(db.query(models.TrainingJob.cancel_requested).filter(models.TrainingJob.id == job_id).scalar())
+
+def finish_job(db: Session, job_id: int, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+               from_status: str = "running") -> bool:
+    """
+    Records the job's outcome if it is still in from_status (a job already reaped as stale or
+    finished elsewhere is left as it is). Returns True if it was.
+    """
+    finished = db.query(models.TrainingJob)\
+                 .filter(models.TrainingJob.id == job_id, models.TrainingJob.status == from_status)\
+                 .update({"status": status, "result": result, "error": error, "finished_at": func.now(), "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return bool(finished)
+
+def fail_running_job(db: Session, job_id: int, error: str) -> bool:
+    """Marks the job failed if it is still running (its worker died). Returns True if it was."""
+    failed = db.query(models.TrainingJob)\
+               .filter(models.TrainingJob.id == job_id, models.TrainingJob.status == "running")\
+               .update({"status": "failed", "error": error, "finished_at": func.now(), "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return bool(failed)
+
+def fail_stale_jobs(db: Session, stale_before) -> int:
+    """Marks running jobs without a heartbeat since stale_before failed. Returns how many there were."""
+    failed = db.query(models.TrainingJob)\
+               .filter(models.TrainingJob.status == "running", models.TrainingJob.updated_at < stale_before)\
+               .update({"status": "failed", "error": "Interrupted: the worker running the job stopped.", "finished_at": func.now(), "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return failed
+
+def request_cancel(db: Session, job_id: int) -> Optional[models.TrainingJob]:
+    """A queued job is cancelled at once; a running one is flagged and stops after its current epoch."""
+    cancelled = db.query(models.TrainingJob)\
+                  .filter(models.TrainingJob.id == job_id, models.TrainingJob.status == "queued")\
+                  .update({"status": "cancelled", "finished_at": func.now(), "updated_at": func.now()}, synchronize_session=False)
+    if not cancelled:
+        db.query(models.TrainingJob)\
+          .filter(models.TrainingJob.id == job_id, models.TrainingJob.status == "running")\
+          .update({"cancel_requested": True}, synchronize_session=False)
+    db.commit()
+    return get_job(db, job_id)
+
+def get_jobs_by_status(db: Session, status: str) -> List[models.TrainingJob]:
+    return db.query(models.TrainingJob)\
+             .filter(models.TrainingJob.status == status)\
+             .order_by(models.TrainingJob.id)\
+             .all()
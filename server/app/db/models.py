@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship 
 from .database import Base
@@ -29,4 +29,32 @@ class HistoryEntry(Base):
     # Optional: Store a reference to more detailed results if they are persisted elsewhere
     # result_reference_id = Column(Integer, nullable=True) # e.g., ID of an analysis result table
 
-    user = relationship("User", back_populates="history_entries")
\ No newline at end of file
+    user = relationship("User", back_populates="history_entries")
+
+class TrainingJob(Base):
+    __tablename__ = "training_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False) # Who submitted it
+    job_type = Column(String, index=True, nullable=False) # "train" or "forecast"
+    status = Column(String, index=True, nullable=False, default="queued") # queued, running, succeeded, failed, cancelled
+    dedup_key = Column(String, nullable=False) # Digest of the user, job type and effective parameters
+    params = Column(JSON, nullable=False) # StockPredictInput fields
+    progress = Column(JSON, nullable=True) # {"epoch", "epochs", "loss"} of the last finished epoch
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now()) # Heartbeat of running jobs
+
+    # At most one queued or running job per dedup key: identical submissions of a user share it
+    __table_args__ = (
+        Index(
+            "ix_training_jobs_active_dedup_key", "dedup_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"), sqlite_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+    user = relationship("User")
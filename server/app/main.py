@@ -5,15 +5,28 @@ from fastapi.middleware.cors import CORSMiddleware # For frontend later
 from starlette.middleware.sessions import SessionMiddleware
 from .config import settings # App settings
 from .routers import auth_router, analysis_router, history_router, prediction_router, comparison_router# Import your auth router
+from .core_logic.prediction import training_jobs
+from contextlib import asynccontextmanager
 # from .db.database import engine, Base # If you were creating tables directly
 
 # Optional: If you weren't using Alembic and wanted FastAPI to create tables
 # (Not recommended if using Alembic for schema management)
 # Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Training jobs queued before a restart are picked up again; the job pool is stopped on shutdown
+    try:
+        training_jobs.recover_jobs()
+    except Exception as e:
+        print(f"Could not recover training jobs: {e}")
+    yield
+    training_jobs.shutdown_pool()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url="/api/v1/openapi.json" # Standard practice to version your API docs URL
+    openapi_url="/api/v1/openapi.json", # Standard practice to version your API docs URL
+    lifespan=lifespan
 )
 
 
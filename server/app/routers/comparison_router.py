@@ -1,12 +1,21 @@
 # backend/app/routers/comparison_router.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 import datetime as dt
+import json
+import time
 
 from .. import schemas, crud, dependencies, config
 from ..db.database import get_db
 from ..core_logic.comparison import pattern_matcher # Core logic function
+from ..core_logic.comparison import subsequence_search
+from ..core_logic.comparison import matrix_profile
+from ..core_logic.comparison import day_similarity
+from ..core_logic.comparison import symbol_catalog
+from ..core_logic.comparison import watchlist_scan
 from ..schemas import comparison_schemas
 
 router = APIRouter(
@@ -15,6 +24,18 @@ router = APIRouter(
     dependencies=[Depends(dependencies.get_current_active_user)] # Protect all routes
 )
 
+def _last_trading_day() -> dt.date:
+    """Today's date (UTC), moved back to Friday on weekends."""
+    query_date = dt.datetime.now(dt.timezone.utc).date()
+    weekday = query_date.weekday() # Monday is 0, Sunday is 6
+
+    if weekday == 5: # If today is Saturday
+        query_date -= dt.timedelta(days=1) # Use Friday's date
+    elif weekday == 6: # If today is Sunday
+        query_date -= dt.timedelta(days=2) # Use Friday's date
+    # This logic can be expanded to handle public holidays if needed.
+    return query_date
+
 @router.post("/find-similar-patterns", response_model=comparison_schemas.ComparisonOutput)
 async def find_similar_intraday_patterns(
     comparison_input: schemas.comparison_schemas.ComparisonInput,
@@ -34,22 +55,28 @@ async def find_similar_intraday_patterns(
 
         # --- FIX: Dynamically find the last trading day ---
         # This makes testing reliable and independent of market hours.
-        query_date = dt.datetime.now(dt.timezone.utc).date()
-        weekday = query_date.weekday() # Monday is 0, Sunday is 6
-
-        if weekday == 5: # If today is Saturday
-            query_date -= dt.timedelta(days=1) # Use Friday's date
-        elif weekday == 6: # If today is Sunday
-            query_date -= dt.timedelta(days=2) # Use Friday's date
-        # This logic can be expanded to handle public holidays if needed.
+        # An explicit query_date replays a past session (with the local or fixture query source).
+        query_date = comparison_input.query_date or _last_trading_day()
 
-        similar_results = pattern_matcher.find_similar_historical_patterns(
+        # Cross-symbol mode searches the whole historical library instead of the symbol's own CSV
+        search_function = (
+            pattern_matcher.find_similar_patterns_across_symbols
+            if comparison_input.search_all_symbols
+            else pattern_matcher.find_similar_historical_patterns
+        )
+        # The search (cross-symbol mode waits on the process pool) runs in the threadpool, not on the event loop
+        similar_results = await run_in_threadpool(
+            search_function,
             stock_symbol=comparison_input.stock_symbol.upper(),
             query_start_time=query_start_time_obj,
             query_end_time=query_end_time_obj,
             similarity_threshold=effective_threshold,
             num_results=effective_n_results,
-            query_date_override=query_date # Pass the adjusted date to the core logic
+            query_date_override=query_date, # Pass the adjusted date to the core logic
+            use_approximate_index=comparison_input.use_approximate_index,
+            probe_radius=comparison_input.probe_radius,
+            metric=comparison_input.metric,
+            query_source=comparison_input.query_source
         )
 
         # Use the adjusted date for the response, for consistency
@@ -66,7 +93,7 @@ async def find_similar_intraday_patterns(
             api_output.message = "No sufficiently similar historical patterns found."
 
         # History Logging
-        input_summary = comparison_input.model_dump(exclude_none=True)
+        input_summary = comparison_input.model_dump(mode="json", exclude_none=True)
         output_summary = {
             "patterns_found": len(similar_results),
             "threshold_used": effective_threshold,
@@ -89,4 +116,297 @@ async def find_similar_intraday_patterns(
     except Exception as e:
         import traceback
         traceback.print_exc() # Log full error to server console
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred during pattern comparison: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred during pattern comparison: {str(e)}")
+
+@router.post("/find-similar-patterns/batch", response_model=comparison_schemas.BatchComparisonOutput)
+async def find_similar_intraday_patterns_batch(
+    batch_input: schemas.comparison_schemas.BatchComparisonInput,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Several time windows of the same symbol in one request: today's bars are fetched and the history
+    loaded once, and every window gets its own result set (same rules as /find-similar-patterns).
+    """
+    try:
+        windows = [
+            {
+                "start_time": dt.datetime.strptime(window.start_time, '%H:%M').time(),
+                "end_time": dt.datetime.strptime(window.end_time, '%H:%M').time(),
+                "similarity_threshold": window.similarity_threshold if window.similarity_threshold is not None else config.settings.DEFAULT_COMPARISON_SIMILARITY_THRESHOLD,
+                "num_results": window.num_results or config.settings.DEFAULT_COMPARISON_N_RESULTS,
+            }
+            for window in batch_input.windows
+        ]
+        query_date = batch_input.query_date or _last_trading_day()
+
+        window_results = await run_in_threadpool(
+            pattern_matcher.find_similar_patterns_multi_window,
+            stock_symbol=batch_input.stock_symbol.upper(),
+            windows=windows,
+            query_date_override=query_date,
+            metric=batch_input.metric,
+            query_source=batch_input.query_source
+        )
+
+        api_output = schemas.comparison_schemas.BatchComparisonOutput(
+            query_stock_symbol=batch_input.stock_symbol.upper(),
+            query_date=query_date.isoformat(),
+            results=[
+                {
+                    "query_time_window": f"{result['start_time'].strftime('%H:%M')}-{result['end_time'].strftime('%H:%M')}",
+                    "similarity_threshold": result["similarity_threshold"],
+                    "similar_historical_patterns": result["patterns"],
+                    "message": result["message"],
+                }
+                for result in window_results
+            ]
+        )
+
+        # History Logging
+        history_entry = schemas.history_schemas.HistoryEntryCreate(
+            user_id=current_user.id,
+            action_type="PATTERN_COMPARISON_BATCH",
+            input_summary=batch_input.model_dump(mode="json", exclude_none=True),
+            output_summary={
+                "windows": len(window_results),
+                "patterns_found": [len(result["patterns"]) for result in window_results]
+            }
+        )
+        crud.history_crud.create_history_entry(db, entry=history_entry)
+
+        return api_output
+
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred during batch pattern comparison: {str(e)}")
+
+@router.post("/watchlist-scan")
+async def scan_watchlist(
+    scan_input: schemas.comparison_schemas.WatchlistScanInput,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Similar-pattern search for every symbol of a watchlist, streamed as newline-delimited JSON: one
+    WatchlistSymbolResult line per symbol as soon as it finishes, then a WatchlistScanSummary line
+    ranking the symbols by best similarity.
+    """
+    effective_start_time_str = scan_input.start_time or config.settings.DEFAULT_COMPARISON_START_TIME
+    effective_end_time_str = scan_input.end_time or config.settings.DEFAULT_COMPARISON_END_TIME
+    effective_n_results = scan_input.num_results or config.settings.DEFAULT_COMPARISON_N_RESULTS
+    effective_threshold = scan_input.similarity_threshold if scan_input.similarity_threshold is not None else config.settings.DEFAULT_COMPARISON_SIMILARITY_THRESHOLD
+    query_start_time_obj = dt.datetime.strptime(effective_start_time_str, '%H:%M').time()
+    query_end_time_obj = dt.datetime.strptime(effective_end_time_str, '%H:%M').time()
+    query_date = scan_input.query_date or _last_trading_day()
+
+    # History Logging (before streaming starts: the session is not used once the response is returned)
+    history_entry = schemas.history_schemas.HistoryEntryCreate(
+        user_id=current_user.id,
+        action_type="WATCHLIST_SCAN",
+        input_summary=scan_input.model_dump(mode="json", exclude_none=True),
+        output_summary={"symbols": len(scan_input.symbols), "threshold_used": effective_threshold, "results_requested": effective_n_results}
+    )
+    crud.history_crud.create_history_entry(db, entry=history_entry)
+
+    def result_lines():
+        started = time.perf_counter()
+        results = []
+        try:
+            for result in watchlist_scan.scan_watchlist(
+                scan_input.symbols, query_start_time_obj, query_end_time_obj, effective_threshold, effective_n_results,
+                query_date=query_date, metric=scan_input.metric, source=scan_input.query_source
+            ):
+                results.append(result)
+                yield schemas.comparison_schemas.WatchlistSymbolResult(
+                    symbol=result["symbol"],
+                    best_similarity=result["best_similarity"],
+                    similar_historical_patterns=result["patterns"],
+                    message=result["message"]
+                ).model_dump_json() + "\n"
+        except ValueError as e: # E.g. a query date the source has no data for
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+            return
+        except Exception as e: # The status line is already sent: report the failure in the stream
+            import traceback
+            traceback.print_exc()
+            yield json.dumps({"event": "error", "detail": f"An unexpected error occurred during the watchlist scan: {str(e)}"}) + "\n"
+            return
+        yield schemas.comparison_schemas.WatchlistScanSummary(
+            query_date=query_date.isoformat(),
+            query_time_window=f"{effective_start_time_str}-{effective_end_time_str}",
+            ranking=[
+                {"symbol": r["symbol"], "best_similarity": r["best_similarity"], "patterns_found": len(r["patterns"])}
+                for r in watchlist_scan.rank_results(results)
+            ],
+            elapsed_seconds=time.perf_counter() - started
+        ).model_dump_json() + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+@router.post("/find-similar-subsequences", response_model=comparison_schemas.SubsequenceSearchOutput)
+async def find_similar_subsequences(
+    search_input: schemas.comparison_schemas.SubsequenceSearchInput,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Finds the best-matching stretches of the symbol's whole intraday history for today's window,
+    at any time of day (not just the same clock window), via FFT distance profiles.
+    """
+    effective_start_time_str = search_input.start_time or config.settings.DEFAULT_COMPARISON_START_TIME
+    effective_end_time_str = search_input.end_time or config.settings.DEFAULT_COMPARISON_END_TIME
+    effective_n_results = search_input.num_results or config.settings.DEFAULT_COMPARISON_N_RESULTS
+    effective_threshold = search_input.similarity_threshold if search_input.similarity_threshold is not None else config.settings.DEFAULT_COMPARISON_SIMILARITY_THRESHOLD
+
+    try:
+        query_start_time_obj = dt.datetime.strptime(effective_start_time_str, '%H:%M').time()
+        query_end_time_obj = dt.datetime.strptime(effective_end_time_str, '%H:%M').time()
+        query_date = search_input.query_date or _last_trading_day()
+
+        matches = await run_in_threadpool(
+            subsequence_search.find_similar_subsequences,
+            stock_symbol=search_input.stock_symbol.upper(),
+            query_start_time=query_start_time_obj,
+            query_end_time=query_end_time_obj,
+            similarity_threshold=effective_threshold,
+            num_results=effective_n_results,
+            query_date_override=query_date,
+            columns=search_input.columns,
+            allow_cross_day=search_input.allow_cross_day,
+            query_source=search_input.query_source
+        )
+
+        api_output = schemas.comparison_schemas.SubsequenceSearchOutput(
+            query_stock_symbol=search_input.stock_symbol.upper(),
+            query_time_window=f"{effective_start_time_str}-{effective_end_time_str}",
+            query_date=query_date.isoformat(),
+            similar_subsequences=matches
+        )
+        if not matches:
+            api_output.message = "No sufficiently similar historical subsequences found."
+
+        # History Logging
+        history_entry = schemas.history_schemas.HistoryEntryCreate(
+            user_id=current_user.id,
+            action_type="SUBSEQUENCE_SEARCH",
+            input_summary=search_input.model_dump(mode="json", exclude_none=True),
+            output_summary={
+                "matches_found": len(matches),
+                "threshold_used": effective_threshold,
+                "results_requested": effective_n_results
+            }
+        )
+        crud.history_crud.create_history_entry(db, entry=history_entry)
+
+        return api_output
+
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred during subsequence search: {str(e)}")
+
+@router.get("/motifs/{stock_symbol}", response_model=comparison_schemas.MotifCatalogOutput)
+async def get_motif_catalog(
+    stock_symbol: str,
+    window: int = Query(default=12, ge=2, description="Window length in bars (must have been precomputed)"),
+    num_results: int = Query(default=5, ge=1, le=50),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Top recurring intraday motifs and most unusual sessions of a symbol, read from the precomputed
+    matrix profile (python -m app.core_logic.comparison.matrix_profile).
+    """
+    symbol = stock_symbol.upper()
+    try:
+        profile = matrix_profile.get_matrix_profile(symbol, window)
+        if profile is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No matrix profile for {symbol} with a {window}-bar window. "
+                       f"Available windows: {matrix_profile.available_windows(symbol) or 'none (run the matrix profile job)'}."
+            )
+        return schemas.comparison_schemas.MotifCatalogOutput(
+            stock_symbol=symbol,
+            window_bars=window,
+            top_motifs=profile.top_motifs(num_results),
+            unusual_sessions=profile.unusual_sessions(num_results),
+            available_windows=matrix_profile.available_windows(symbol),
+            stale=profile.stale,
+            message="The symbol's data changed since this profile was computed; a recompute is pending." if profile.stale else None
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred reading the motif catalog: {str(e)}")
+
+@router.get("/day-neighbours/{stock_symbol}", response_model=comparison_schemas.DayNeighboursOutput)
+async def get_day_neighbours(
+    stock_symbol: str,
+    date: dt.date = Query(..., description="Session to find neighbours for (YYYY-MM-DD)"),
+    start_time: str = Query(default=None, pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$"),
+    end_time: str = Query(default=None, pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$"),
+    num_results: int = Query(default=None, ge=1, le=100),
+    min_similarity: float = Query(default=-1.0, ge=-1.0, le=1.0),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Most similar historical sessions to a given session for a time window, read from the precomputed
+    all-pairs matrix (python -m app.core_logic.comparison.day_similarity).
+    """
+    symbol = stock_symbol.upper()
+    effective_start_time_str = start_time or config.settings.DEFAULT_COMPARISON_START_TIME
+    effective_end_time_str = end_time or config.settings.DEFAULT_COMPARISON_END_TIME
+    effective_n_results = num_results or config.settings.DEFAULT_COMPARISON_N_RESULTS
+    try:
+        start_time_obj = dt.datetime.strptime(effective_start_time_str, '%H:%M').time()
+        end_time_obj = dt.datetime.strptime(effective_end_time_str, '%H:%M').time()
+        matrix = day_similarity.get_day_similarity_matrix(symbol, start_time_obj, end_time_obj)
+        if matrix is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No precomputed similarity matrix for {symbol} and window {effective_start_time_str}-{effective_end_time_str}."
+            )
+        neighbours = matrix.neighbours(date, effective_n_results, min_similarity=min_similarity)
+        return schemas.comparison_schemas.DayNeighboursOutput(
+            stock_symbol=symbol,
+            date=date.isoformat(),
+            time_window=f"{effective_start_time_str}-{effective_end_time_str}",
+            neighbours=[{"date": day.isoformat(), "similarity_score": score} for day, score in neighbours],
+            stale=matrix.stale,
+            message="The symbol's data changed since this matrix was computed; a recompute is pending." if matrix.stale else None
+        )
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred reading day neighbours: {str(e)}")
+
+@router.get("/symbols", response_model=comparison_schemas.SymbolCatalogOutput)
+async def list_symbols(
+    refresh: bool = Query(default=False, description="Re-check the data directory now instead of waiting for the refresh interval"),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """Historical datasets available for comparison, with their row counts, date ranges and checksums (from the symbol catalog)."""
+    try:
+        catalog = symbol_catalog.get_catalog(refresh=refresh)
+        return schemas.comparison_schemas.SymbolCatalogOutput(
+            symbols=[
+                {**catalog.get(symbol), "file": catalog.path(symbol).name}
+                for symbol in catalog.symbols()
+            ]
+        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred reading the symbol catalog: {str(e)}")
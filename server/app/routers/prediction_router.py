@@ -222,17 +222,15 @@
 
 
 # backend/app/routers/prediction_router.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import pandas as pd
-import time
-import datetime
+from typing import List
 
 from .. import schemas, crud, dependencies, config
 from ..db.database import get_db
-from ..core_logic.analysis import sentiment_analyzer
-from ..core_logic.prediction import market_data_fetcher, feature_engineering
-from ..core_logic.prediction.stock_predictor import StockPredictorPrototype
+from ..core_logic.prediction import forecasting, training_jobs
+from ..crud import job_crud
 from ..schemas import prediction_schemas # Use the prototype predictor
 
 router = APIRouter(
@@ -251,106 +249,11 @@ async def get_stock_forecast_prototype(
     db: Session = Depends(get_db),
     current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
 ):
-    train_start_time = time.time()
-    process_start_datetime = datetime.datetime.now(datetime.timezone.utc)
-
-    effective_symbol = predict_input.stock_symbol or config.settings.DEFAULT_STOCK_SYMBOL
-    effective_history_days = predict_input.data_history_days or config.settings.DEFAULT_DAYS_MARKET_DATA # This is for historical data
-    
-    # Use prototype-specific (faster) training params, allowing user override if provided
-    effective_epochs = predict_input.epochs or config.settings.DEFAULT_LSTM_EPOCHS
-    effective_sequence_length = predict_input.sequence_length or config.settings.DEFAULT_LSTM_SEQUENCE_LENGTH
-    # Get other params from settings for simplicity in prototype
-    effective_batch_size = config.settings.DEFAULT_LSTM_BATCH_SIZE
-    effective_lr = config.settings.DEFAULT_PREDICTION_LR
-    effective_hidden_size = config.settings.DEFAULT_LSTM_HIDDEN_SIZE
-    effective_num_layers = config.settings.DEFAULT_LSTM_NUM_LAYERS
-
-    # Determine reddit keywords
-    if predict_input.reddit_keywords:
-        effective_reddit_keywords = predict_input.reddit_keywords
-    elif effective_symbol:
-        effective_reddit_keywords = [effective_symbol]
-    else:
-        effective_reddit_keywords = [] # Or a default set of general keywords
-
-    effective_reddit_subreddits = predict_input.reddit_subreddits or ["wallstreetbets", "stocks"]
-
-
     try:
-        print(f"Forecast for {effective_symbol}: Fetching data for past {effective_history_days} days.")
-        # 1. Fetch historical sentiment data
-        sentiment_df = pd.DataFrame() # Default to empty
-        if effective_reddit_keywords and effective_reddit_subreddits:
-            sentiment_df = sentiment_analyzer.analyze_reddit_sentiment(
-                subreddits=effective_reddit_subreddits,
-                keywords=effective_reddit_keywords,
-                days_back=effective_history_days # Use the same history length for sentiment
-            )
-        print(f"Sentiment data shape: {sentiment_df.shape}")
-
-        # 2. Fetch historical market data
-        md_fetcher = market_data_fetcher.MarketDataFetcher()
-        end_dt_market = datetime.datetime.now(datetime.timezone.utc) # Fetch up to today
-        start_dt_market = end_dt_market - datetime.timedelta(days=effective_history_days)
-        print(f"\n=== Before Market Data Fetch ===")
-        print(f"Effective symbol: {effective_symbol}")
-        print(f"Effective history days: {effective_history_days}")
-        print(f"Start date: {start_dt_market.date()}")
-        print(f"End date: {end_dt_market.date()}")
-        print(f"Timezone: {datetime.timezone.utc}")
-        market_df = md_fetcher.get_stock_data(
-            symbol=effective_symbol,
-            start_date_str=start_dt_market.strftime('%Y-%m-%d'), # yfinance needs YYYY-MM-DD
-            end_date_str=end_dt_market.strftime('%Y-%m-%d')
-        )
-        print(market_df)
-        if market_df.empty:
-            raise ValueError(f"No market data found for {effective_symbol} for the period.")
-        print(f"Market data shape: {market_df.shape}. Last date: {market_df.index[-1]}")
-
-        # 3. Prepare features (this creates the 'target' column based on historical data)
-        features_with_target_df = feature_engineering.prepare_prediction_features(
-            sentiment_df=sentiment_df,
-            market_df=market_df,
-            target_shift_days=1 # Predict 1 day ahead
-        )
-        if features_with_target_df.empty:
-            raise ValueError("Feature preparation resulted in empty data. Try increasing data_history_days.")
-        print(f"Features with target shape: {features_with_target_df.shape}")
-        
-        # 4. Train model on this historical data & predict next step
-        predictor = StockPredictorPrototype()
-        probability_positive = predictor.train_and_predict_next_step(
-            features_df=features_with_target_df,
-            epochs=effective_epochs,
-            batch_size=effective_batch_size,
-            sequence_length=effective_sequence_length,
-            learning_rate=effective_lr,
-            hidden_size=effective_hidden_size,
-            num_layers=effective_num_layers
-        )
-
-        # Determine the date for which the prediction is made
-        # This is typically the next business day after the last date in market_df
-        last_market_date = market_df.index[-1].date()
-        prediction_for_date = last_market_date + datetime.timedelta(days=1) # Simplistic, doesn't account for weekends/holidays
-        # A better way: find next trading day, or just state "next trading day after X"
-
-        prediction_label = "UP" if probability_positive > 0.55 else ("DOWN" if probability_positive < 0.45 else "NEUTRAL")
-        
-        train_end_time = time.time()
-        training_duration = train_end_time - train_start_time
-
-        api_output = schemas.prediction_schemas.StockPredictOutput(
-            stock_symbol=effective_symbol,
-            prediction_for_date=prediction_for_date,
-            probability_positive_movement=probability_positive,
-            prediction_label=prediction_label,
-            model_training_duration_seconds=training_duration,
-            data_used_for_training_period=f"{start_dt_market.strftime('%Y-%m-%d')} to {end_dt_market.strftime('%Y-%m-%d')}",
-            message="Prediction generated after on-the-fly model training."
-        )
+        # Fetching, training and inference run in the threadpool, not on the event loop; a stored
+        # model for this config is reused unless it is stale or a retrain was asked for
+        forecast = await run_in_threadpool(forecasting.run_forecast, predict_input.model_dump())
+        api_output = schemas.prediction_schemas.StockPredictOutput(**forecast)
 
         # History Logging
         input_summary = predict_input.model_dump(exclude_none=True)
@@ -359,7 +262,9 @@ async def get_stock_forecast_prototype(
             "prediction_for_date": api_output.prediction_for_date.isoformat(),
             "probability_up": api_output.probability_positive_movement,
             "label": api_output.prediction_label,
-            "training_duration": api_output.model_training_duration_seconds
+            "training_duration": api_output.model_training_duration_seconds,
+            "model_version": api_output.model_version,
+            "model_reused": api_output.model_reused
         }
         history_entry = schemas.history_schemas.HistoryEntryCreate(
             user_id=current_user.id,
@@ -380,4 +285,89 @@ async def get_stock_forecast_prototype(
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"An error occurred during prediction: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred during prediction: {str(e)}")
+
+@router.post("/jobs", response_model=prediction_schemas.TrainingJobStatus, status_code=status.HTTP_202_ACCEPTED)
+def submit_training_job(
+    job_input: schemas.prediction_schemas.TrainingJobInput,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """
+    Queues a training or forecast job and returns at once with its id; poll /jobs/{id} for progress and
+    fetch /jobs/{id}/result when it has succeeded. An identical job of this user still queued or running is returned instead.
+    """
+    try:
+        params = job_input.model_dump(exclude={"job_type"}, exclude_none=True)
+        job, deduplicated = training_jobs.submit_job(db, user_id=current_user.id, job_type=job_input.job_type, params=params)
+
+        # History Logging
+        history_entry = schemas.history_schemas.HistoryEntryCreate(
+            user_id=current_user.id,
+            action_type="TRAINING_JOB_SUBMIT",
+            input_summary=job_input.model_dump(exclude_none=True),
+            output_summary={"job_id": job.id, "deduplicated": deduplicated}
+        )
+        crud.history_crud.create_history_entry(db, entry=history_entry)
+
+        job_status = prediction_schemas.TrainingJobStatus.model_validate(job)
+        job_status.deduplicated = deduplicated
+        return job_status
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An error occurred while submitting the job: {str(e)}")
+
+@router.get("/jobs", response_model=List[prediction_schemas.TrainingJobStatus])
+def list_training_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """Jobs submitted by the current user, newest first."""
+    return job_crud.get_jobs_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+
+def _get_own_job(db: Session, job_id: int, user_id: int):
+    """The job if the user submitted it; other users' jobs are reported as not found."""
+    job = job_crud.get_job(db, job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=prediction_schemas.TrainingJobStatus)
+def read_training_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """Status and progress (last finished epoch and its loss) of a job."""
+    return _get_own_job(db, job_id, current_user.id)
+
+@router.get("/jobs/{job_id}/result", response_model=prediction_schemas.TrainingJobResult)
+def read_training_job_result(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    job = _get_own_job(db, job_id, current_user.id)
+    if job.status != "succeeded":
+        detail = f"Job {job_id} is {job.status}" + (f": {job.error}" if job.error else ".")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+    if job.job_type == "forecast":
+        return prediction_schemas.TrainingJobResult(id=job.id, job_type=job.job_type, forecast=job.result)
+    return prediction_schemas.TrainingJobResult(id=job.id, job_type=job.job_type, model=job.result)
+
+@router.post("/jobs/{job_id}/cancel", response_model=prediction_schemas.TrainingJobStatus)
+def cancel_training_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.user_schemas.User = Depends(dependencies.get_current_active_user)
+):
+    """Cancels a queued job at once; a running one stops after its current epoch (cancel_requested is set until then)."""
+    job = _get_own_job(db, job_id, current_user.id)
+    if job.status not in job_crud.ACTIVE_STATUSES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job {job_id} is already {job.status}.")
+    return job_crud.request_cancel(db, job_id)
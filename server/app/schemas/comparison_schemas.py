@@ -1,6 +1,6 @@
 # backend/app/schemas/comparison_schemas.py
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 import datetime
 
 class OHLCDataPoint(BaseModel):
@@ -12,6 +12,7 @@ class OHLCDataPoint(BaseModel):
 
 class SimilarDayPattern(BaseModel):
     date: str # YYYY-MM-DD format
+    symbol: Optional[str] = None # Set when the match comes from a cross-symbol search
     similarity_score: float
     window_pattern_data: List[OHLCDataPoint]
     full_day_data: List[OHLCDataPoint]
@@ -42,6 +43,29 @@ class ComparisonInput(BaseModel):
         example=0.90,
         description="Minimum cosine similarity threshold (0.0 to 1.0). Uses system default if None."
     )
+    metric: Literal["cosine", "zeuclidean", "dtw"] = Field(
+        default="cosine",
+        description="Similarity measure: cosine on min-max normalized OHLC (original), z-normalized Euclidean, or constrained DTW. "
+                    "zeuclidean and dtw also match days with missing bars; their scores are on a correlation-like scale."
+    )
+    search_all_symbols: bool = Field(
+        default=False,
+        description="Compare the query window against every symbol in the historical library, not just the same symbol."
+    )
+    use_approximate_index: bool = Field(
+        default=False,
+        description="Retrieve candidates from the approximate (LSH) pattern index and rescore them exactly. Faster on large libraries, may miss some matches."
+    )
+    probe_radius: Optional[int] = Field(
+        default=None,
+        ge=0, le=2,
+        description="Recall/latency knob for the approximate index (bit flips probed per hash table). Uses system default if None."
+    )
+    query_source: Literal["yfinance", "local", "fixture"] = Field(
+        default="yfinance",
+        description="Where the query day's bars come from: yfinance, the local history or a recorded fixture (the last two replay past sessions offline)."
+    )
+    query_date: Optional[datetime.date] = Field(default=None, description="Query day (YYYY-MM-DD). Last trading day if None.")
 
     @validator('end_time')
     def end_time_after_start_time(cls, v, values):
@@ -58,4 +82,203 @@ class ComparisonOutput(BaseModel):
     query_date: str # Date for which the yfinance pattern was fetched (today)
     # today_query_pattern_data: List[OHLCDataPoint] # Optional: include today's window data in response
     similar_historical_patterns: List[SimilarDayPattern]
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+
+class ComparisonWindow(BaseModel):
+    start_time: str = Field(
+        ...,
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="09:15",
+        description="Start time of the window (HH:MM)."
+    )
+    end_time: str = Field(
+        ...,
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="10:15",
+        description="End time of the window (HH:MM)."
+    )
+    num_results: Optional[int] = Field(default=None, ge=1, le=20, example=5, description="Uses system default if None.")
+    similarity_threshold: Optional[float] = Field(
+        default=None,
+        ge=0.0, le=1.0,
+        example=0.90,
+        description="Minimum similarity for this window. Uses system default if None."
+    )
+
+    @validator('end_time')
+    def end_time_after_start_time(cls, v, values):
+        if 'start_time' in values and v is not None and values['start_time'] is not None:
+            start = datetime.datetime.strptime(values['start_time'], '%H:%M').time()
+            end = datetime.datetime.strptime(v, '%H:%M').time()
+            if end <= start:
+                raise ValueError('End time must be after start time.')
+        return v
+
+class BatchComparisonInput(BaseModel):
+    stock_symbol: str = Field(..., example="HEROMOTOCO")
+    windows: List[ComparisonWindow] = Field(
+        ...,
+        min_length=1, max_length=12,
+        description="Time windows compared against the same query day in one pass (e.g. 09:15-09:45, 09:15-10:15, 09:15-11:00)."
+    )
+    metric: Literal["cosine", "zeuclidean", "dtw"] = Field(default="cosine", description="Similarity measure, as for /find-similar-patterns.")
+    query_source: Literal["yfinance", "local", "fixture"] = Field(default="yfinance", description="Query day source, as for /find-similar-patterns.")
+    query_date: Optional[datetime.date] = Field(default=None, description="Query day (YYYY-MM-DD). Last trading day if None.")
+
+class WindowComparisonResult(BaseModel):
+    query_time_window: str # e.g., "09:15-09:45"
+    similarity_threshold: float
+    similar_historical_patterns: List[SimilarDayPattern]
+    message: Optional[str] = None
+
+class BatchComparisonOutput(BaseModel):
+    query_stock_symbol: str
+    query_date: str
+    results: List[WindowComparisonResult] # Same order as the input windows
+
+class WatchlistScanInput(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=200, example=["GLAND", "SBICARD", "HDFCAMC"])
+    start_time: str = Field(
+        default=None, # Will use default from config
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="09:15",
+        description="Start time of the window (HH:MM). Uses system default if None."
+    )
+    end_time: str = Field(
+        default=None, # Will use default from config
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="09:45",
+        description="End time of the window (HH:MM). Uses system default if None."
+    )
+    num_results: Optional[int] = Field(default=None, ge=1, le=20, example=5, description="Matches per symbol. Uses system default if None.")
+    similarity_threshold: Optional[float] = Field(default=None, ge=0.0, le=1.0, example=0.90, description="Uses system default if None.")
+    metric: Literal["cosine", "zeuclidean", "dtw"] = Field(default="cosine", description="Similarity measure, as for /find-similar-patterns.")
+    query_source: Literal["yfinance", "local", "fixture"] = Field(
+        default="yfinance",
+        description="Where the query day's bars come from: one batched yfinance download, the local history or recorded fixtures (past dates, offline use)."
+    )
+    query_date: Optional[datetime.date] = Field(default=None, description="Query day (YYYY-MM-DD). Last trading day if None.")
+
+    @validator('end_time')
+    def end_time_after_start_time(cls, v, values):
+        if 'start_time' in values and v is not None and values['start_time'] is not None:
+            start = datetime.datetime.strptime(values['start_time'], '%H:%M').time()
+            end = datetime.datetime.strptime(v, '%H:%M').time()
+            if end <= start:
+                raise ValueError('End time must be after start time.')
+        return v
+
+class WatchlistSymbolResult(BaseModel):
+    event: Literal["result"] = "result"
+    symbol: str
+    best_similarity: Optional[float] = None
+    similar_historical_patterns: List[SimilarDayPattern]
+    message: Optional[str] = None
+
+class WatchlistRankEntry(BaseModel):
+    symbol: str
+    best_similarity: Optional[float] = None
+    patterns_found: int
+
+class WatchlistScanSummary(BaseModel):
+    event: Literal["summary"] = "summary"
+    query_date: str
+    query_time_window: str
+    ranking: List[WatchlistRankEntry] # Best similarity first
+    elapsed_seconds: float
+
+class SimilarSubsequence(BaseModel):
+    date: str # Trading day the match starts on (YYYY-MM-DD)
+    start: datetime.datetime
+    end: datetime.datetime
+    similarity_score: float
+    window_pattern_data: List[OHLCDataPoint]
+    full_day_data: List[OHLCDataPoint] # The day the match starts on
+
+class SubsequenceSearchInput(BaseModel):
+    stock_symbol: str = Field(..., example="HEROMOTOCO")
+    start_time: str = Field(
+        default=None, # Will use default from config
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="09:15",
+        description="Start time of today's query window (HH:MM). Uses system default if None."
+    )
+    end_time: str = Field(
+        default=None, # Will use default from config
+        pattern=r"^(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])$",
+        example="09:45",
+        description="End time of today's query window (HH:MM). Uses system default if None."
+    )
+    num_results: Optional[int] = Field(default=None, ge=1, le=20, example=5)
+    similarity_threshold: Optional[float] = Field(
+        default=None,
+        ge=-1.0, le=1.0,
+        example=0.90,
+        description="Minimum z-normalized correlation of a match. Uses system default if None."
+    )
+    columns: Literal["close", "ohlc"] = Field(default="ohlc", description="Series to match on.")
+    allow_cross_day: bool = Field(default=False, description="Allow matches that span the overnight gap between sessions.")
+    query_source: Literal["yfinance", "local", "fixture"] = Field(default="yfinance", description="Query day source, as for /find-similar-patterns.")
+    query_date: Optional[datetime.date] = Field(default=None, description="Query day (YYYY-MM-DD). Last trading day if None.")
+
+    @validator('end_time')
+    def end_time_after_start_time(cls, v, values):
+        if 'start_time' in values and v is not None and values['start_time'] is not None:
+            start = datetime.datetime.strptime(values['start_time'], '%H:%M').time()
+            end = datetime.datetime.strptime(v, '%H:%M').time()
+            if end <= start:
+                raise ValueError('End time must be after start time.')
+        return v
+
+class SubsequenceSearchOutput(BaseModel):
+    query_stock_symbol: str
+    query_time_window: str
+    query_date: str
+    similar_subsequences: List[SimilarSubsequence]
+    message: Optional[str] = None
+
+class Motif(BaseModel):
+    start: datetime.datetime
+    neighbour_start: datetime.datetime # Start of the closest recurrence elsewhere in the history
+    distance: float # z-normalized Euclidean distance between the pair
+    similarity_score: float
+
+class UnusualSession(BaseModel):
+    date: str # YYYY-MM-DD
+    session_score: float # Mean nearest-neighbour distance of the day's windows (higher = more unusual)
+    discord_start: datetime.datetime # The day's single most unusual window
+    discord_distance: float
+
+class MotifCatalogOutput(BaseModel):
+    stock_symbol: str
+    window_bars: int
+    top_motifs: List[Motif]
+    unusual_sessions: List[UnusualSession]
+    available_windows: List[int]
+    stale: bool = False # Computed before the symbol's data last changed; recomputed offline
+    message: Optional[str] = None
+
+class DayNeighbour(BaseModel):
+    date: str # YYYY-MM-DD
+    similarity_score: float
+
+class DayNeighboursOutput(BaseModel):
+    stock_symbol: str
+    date: str
+    time_window: str # e.g., "09:15-09:45"
+    neighbours: List[DayNeighbour]
+    stale: bool = False # Computed before the symbol's data last changed; recomputed offline
+    message: Optional[str] = None
+
+class SymbolDataset(BaseModel):
+    symbol: str
+    file: str # CSV file name under HISTORICAL_DATA_PATH
+    rows: int
+    first_timestamp: Optional[datetime.datetime] = None
+    last_timestamp: Optional[datetime.datetime] = None
+    trading_days: int
+    bar_interval_minutes: Optional[int] = None
+    sha1: str # Checksum of the CSV
+
+class SymbolCatalogOutput(BaseModel):
+    symbols: List[SymbolDataset]
@@ -1,6 +1,6 @@
 # backend/app/schemas/prediction_schemas.py
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 import datetime
 
 # --- Schemas for Model Training (Optional API Endpoint) ---
@@ -57,6 +57,10 @@ class StockPredictInput(BaseModel):
     )
     epochs: Optional[int] = Field(default=None, ge=1, le=50)
     sequence_length: Optional[int] = Field(default=None, ge=3, le=30)
+    retrain: bool = Field(
+        default=False,
+        description="Train a new model even if the registry holds a current one for this symbol and configuration."
+    )
     # model_id_or_version: Optional[str] = Field(default="latest", description="Identifier of the trained model to use.") # For later
     
 class StockPredictOutput(BaseModel):
@@ -65,6 +69,44 @@ class StockPredictOutput(BaseModel):
     # Probability of the price going up (output of sigmoid)
     probability_positive_movement: float = Field(..., ge=0, le=1)
     prediction_label: str # e.g., "UP", "DOWN", "NEUTRAL"
-    model_training_duration_seconds: Optional[float] = None # How long this ad-hoc training took
+    model_training_duration_seconds: Optional[float] = None # How long this ad-hoc training took (None if a stored model was used)
+    model_version: Optional[str] = None # Registry version of the model used
+    model_trained_at: Optional[datetime.datetime] = None
+    model_reused: bool = False # True if a stored model was used without retraining
+    model_training_mode: Optional[str] = None # "full" or "fine_tune" when a model was trained for this prediction
     data_used_for_training_period: Optional[str] = None # e.g., "2023-01-01 to 2023-12-31"
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+
+class TrainingJobInput(StockPredictInput):
+    job_type: Literal["train", "forecast", "refresh"] = Field(
+        default="forecast",
+        description="'train' trains and stores a new model; 'forecast' runs /stock-forecast (training only if needed); "
+                    "'refresh' brings the stored model up to date, fine-tuning it when it has not drifted."
+    )
+
+class TrainingJobProgress(BaseModel):
+    epoch: int
+    epochs: int
+    loss: float # Mean training loss of the epoch
+
+class TrainingJobStatus(BaseModel):
+    id: int
+    job_type: str
+    status: str # queued, running, succeeded, failed, cancelled
+    params: Dict[str, Any]
+    progress: Optional[TrainingJobProgress] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    created_at: Optional[datetime.datetime] = None
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    deduplicated: bool = False # True if an identical queued or running job was returned instead of a new one
+
+    class Config:
+        from_attributes = True
+
+class TrainingJobResult(BaseModel):
+    id: int
+    job_type: str
+    forecast: Optional[StockPredictOutput] = None # forecast jobs
+    model: Optional[Dict[str, Any]] = None # train/refresh jobs: registry metadata of the resulting model and its training time
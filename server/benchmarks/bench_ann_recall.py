@@ -0,0 +1,78 @@
+# backend/benchmarks/bench_ann_recall.py
+# Recall@k and latency of the approximate (LSH) pattern index against the exact engine.
+# Queries are historical days taken from the library itself, so no network access is needed.
+# Run from the backend root:  python -m benchmarks.bench_ann_recall --window 09:15-10:15 --queries 200
+import argparse
+import datetime as dt
+import time
+import numpy as np
+
+from app.core_logic.comparison import ann_index, pattern_index, pattern_matcher
+from app.core_logic.comparison.data_loader import list_available_symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of the ANN pattern index vs the exact engine.")
+    parser.add_argument("--window", default="09:15-10:15", help="HH:MM-HH:MM comparison window")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.0)
+    parser.add_argument("--symbols", nargs="*", default=None)
+    args = parser.parse_args()
+
+    start_str, end_str = args.window.split("-")
+    start_time = dt.datetime.strptime(start_str, "%H:%M").time()
+    end_time = dt.datetime.strptime(end_str, "%H:%M").time()
+    symbols = sorted(s.upper() for s in (args.symbols or list_available_symbols()))
+
+    # Exact library: every symbol's eligible days for the window (full window length only)
+    slot_ranges = [pattern_index.get_pattern_index(symbol).slot_range(start_time, end_time) for symbol in symbols]
+    pattern_length = max(last - first for first, last in slot_ranges)
+    library = []
+    for symbol in symbols:
+        day_dates, windows = pattern_matcher._candidate_windows(symbol, start_time, end_time, pattern_length)
+        library += [(symbol, day, window) for day, window in zip(day_dates, windows)]
+    all_windows = np.stack([window for _, _, window in library])
+    all_vectors = pattern_matcher._normalize_ohlc_batch(all_windows)
+    library_days = np.array([day for _, day, _ in library], dtype="datetime64[D]")
+    print(f"Library: {len(library)} days across {len(symbols)} symbols, window {args.window} ({pattern_length} bars)")
+
+    build_start = time.perf_counter()
+    index = ann_index.build_ann_index(symbols, start_time, end_time, pattern_length)
+    print(f"ANN build: {(time.perf_counter() - build_start) * 1000:.0f}ms")
+
+    rng = np.random.default_rng(0)
+    query_positions = rng.choice(len(library), size=min(args.queries, len(library)), replace=False)
+
+    exact_results, exact_latencies = [], []
+    for position in query_positions:
+        _, query_day, _ = library[position]
+        query_pattern = all_vectors[position]
+        started = time.perf_counter()
+        scores = pattern_matcher._cosine_similarity_batch(all_vectors, query_pattern)
+        scores[library_days == np.datetime64(query_day, "D")] = np.nan # Same exclusion as the ANN query
+        top = pattern_matcher._select_top_k(scores, args.threshold, args.k)
+        exact_latencies.append(time.perf_counter() - started)
+        exact_results.append({(library[i][0], library[i][1]) for i in top})
+    print(f"exact      : p50={np.median(exact_latencies) * 1000:.2f}ms p99={np.percentile(exact_latencies, 99) * 1000:.2f}ms")
+
+    for radius in (0, 1, 2):
+        recalls, latencies, candidate_counts = [], [], []
+        for position, exact in zip(query_positions, exact_results):
+            _, query_day, _ = library[position]
+            query_pattern = all_vectors[position]
+            started = time.perf_counter()
+            matches = index.query(query_pattern, args.threshold, args.k, exclude_date=query_day, probe_radius=radius)
+            latencies.append(time.perf_counter() - started)
+            candidate_counts.append(len(index.candidates(query_pattern, probe_radius=radius)))
+            found = {(symbol, day) for symbol, day, _ in matches}
+            recalls.append(len(found & exact) / len(exact) if exact else 1.0)
+        print(
+            f"ann r={radius}   : recall@{args.k}={np.mean(recalls):.3f} "
+            f"p50={np.median(latencies) * 1000:.2f}ms p99={np.percentile(latencies, 99) * 1000:.2f}ms "
+            f"candidates={np.mean(candidate_counts):.0f}/{len(library)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
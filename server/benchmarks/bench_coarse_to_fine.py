@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_coarse_to_fine.py
+# Latency of the coarse-to-fine (pyramid) cosine search against scoring every day at 5-minute
+# resolution, and a check that both return the same top-k. Queries are historical days, so no
+# network access is needed.
+# Run from the backend root:  python -m benchmarks.bench_coarse_to_fine --window 09:15-15:30 --queries 100
+import argparse
+import datetime as dt
+import time
+import numpy as np
+
+from app.core_logic.comparison import pattern_matcher
+from app.core_logic.comparison.data_loader import get_historical_frame, get_day_row_index, list_available_symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coarse-to-fine vs full-resolution cosine search.")
+    parser.add_argument("--window", default="09:15-15:30", help="HH:MM-HH:MM comparison window")
+    parser.add_argument("--queries", type=int, default=100, help="Query days per symbol")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--symbols", nargs="*", default=None)
+    args = parser.parse_args()
+
+    start_str, end_str = args.window.split("-")
+    start_time = dt.datetime.strptime(start_str, "%H:%M").time()
+    end_time = dt.datetime.strptime(end_str, "%H:%M").time()
+    symbols = sorted(s.upper() for s in (args.symbols or list_available_symbols()))
+    rng = np.random.default_rng(0)
+
+    full_latencies, coarse_latencies, mismatches, total = [], [], 0, 0
+    for symbol in symbols:
+        df = get_historical_frame(symbol)
+        day_row_index = get_day_row_index(symbol)
+        query_days = rng.choice(len(day_row_index), size=min(args.queries, len(day_row_index)), replace=False)
+        for position in query_days:
+            query_day = day_row_index.dates[position]
+            query_df = pattern_matcher._filter_by_time_window(day_row_index.day_slice(df, query_day), start_time, end_time)
+            query_pattern = pattern_matcher._normalize_ohlc_pattern(query_df)
+            if query_pattern.size == 0:
+                continue
+
+            started = time.perf_counter()
+            day_dates, windows = pattern_matcher._candidate_windows(symbol, start_time, end_time, len(query_df), exclude_date=query_day)
+            scores = pattern_matcher._score_windows(windows, query_pattern)
+            full_top = [(day_dates[i], scores[i]) for i in pattern_matcher._select_top_k(scores, args.threshold, args.k)]
+            full_latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            coarse = pattern_matcher._coarse_to_fine_cosine(
+                symbol, query_df, query_pattern, start_time, end_time, args.threshold, args.k, exclude_date=query_day
+            )
+            if coarse is None:
+                print(f"{symbol}: window {args.window} is not aligned to any pyramid level, nothing to compare.")
+                break
+            coarse_dates, coarse_scores = coarse
+            coarse_top = [(coarse_dates[i], coarse_scores[i]) for i in pattern_matcher._select_top_k(coarse_scores, args.threshold, args.k)]
+            coarse_latencies.append(time.perf_counter() - started)
+
+            total += 1
+            if [d for d, _ in full_top] != [d for d, _ in coarse_top] or not np.allclose([s for _, s in full_top], [s for _, s in coarse_top]):
+                mismatches += 1
+                print(f"MISMATCH {symbol} {query_day}: {full_top} vs {coarse_top}")
+
+    if not total:
+        return
+    print(f"{total} queries, window {args.window}, k={args.k}, threshold={args.threshold}: {mismatches} top-k mismatches")
+    print(f"full resolution : p50={np.median(full_latencies) * 1000:.2f}ms p99={np.percentile(full_latencies, 99) * 1000:.2f}ms")
+    print(f"coarse-to-fine  : p50={np.median(coarse_latencies) * 1000:.2f}ms p99={np.percentile(coarse_latencies, 99) * 1000:.2f}ms")
+    print(f"speedup (p50)   : {np.median(full_latencies) / np.median(coarse_latencies):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
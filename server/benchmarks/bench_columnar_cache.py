@@ -0,0 +1,58 @@
+# backend/benchmarks/bench_columnar_cache.py
+# Cold-load time and memory of get_historical_frame from the CSVs vs from the columnar cache.
+# Every measurement runs in a fresh interpreter, like a new worker process would.
+# Run from the backend root:  python -m benchmarks.bench_columnar_cache
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from app.core_logic.comparison.data_loader import list_available_symbols
+
+# Runs inside the child process: loads one symbol and reports time and RSS (Linux /proc, else peak RSS)
+_CHILD = """
+import json, resource, sys, time
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+from app.core_logic.comparison import data_loader
+rss_before = rss_mb()
+started = time.perf_counter()
+df = data_loader.get_historical_frame(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "rss_delta_mb": rss_mb() - rss_before, "rows": len(df)}))
+"""
+
+
+def _measure(symbol: str, use_cache: bool) -> dict:
+    env = dict(os.environ, COLUMNAR_CACHE_ENABLED="true" if use_cache else "false")
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", _CHILD, symbol], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs columnar cache cold-load benchmark.")
+    parser.add_argument("--symbols", nargs="*", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    symbols = sorted(s.upper() for s in (args.symbols or list_available_symbols()))
+
+    print(f"{'symbol':<12}{'rows':>8}{'csv ms':>10}{'cache ms':>10}{'speedup':>9}{'csv MB':>9}{'cache MB':>10}")
+    for symbol in symbols:
+        _measure(symbol, use_cache=True) # Builds the cache if missing or stale
+        csv_runs = [_measure(symbol, use_cache=False) for _ in range(args.repeats)]
+        cache_runs = [_measure(symbol, use_cache=True) for _ in range(args.repeats)]
+        csv_ms = min(r["seconds"] for r in csv_runs) * 1000
+        cache_ms = min(r["seconds"] for r in cache_runs) * 1000
+        print(
+            f"{symbol:<12}{csv_runs[0]['rows']:>8}{csv_ms:>10.1f}{cache_ms:>10.1f}{csv_ms / cache_ms:>8.1f}x"
+            f"{min(r['rss_delta_mb'] for r in csv_runs):>9.1f}{min(r['rss_delta_mb'] for r in cache_runs):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
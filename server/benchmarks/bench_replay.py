@@ -0,0 +1,93 @@
+# backend/benchmarks/bench_replay.py
+# Replays historical sessions through find_similar_historical_patterns with the local query source
+# (no network): each query is a (symbol, day, window) sampled from the history, and the day itself is
+# excluded from its candidates as for a live query. Reports throughput and latency percentiles, and a
+# digest of all the results so two runs (e.g. before/after a change) can be checked for regressions.
+# Run from the backend root:  python -m benchmarks.bench_replay --queries 1000 --windows 09:15-09:45 09:15-10:15
+import argparse
+import contextlib
+import datetime as dt
+import hashlib
+import io
+import time
+import numpy as np
+
+from app.core_logic.comparison import pattern_matcher
+from app.core_logic.comparison.data_loader import get_day_row_index, list_available_symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay historical queries through the pattern matcher.")
+    parser.add_argument("--queries", type=int, default=1000, help="Total queries replayed")
+    parser.add_argument("--windows", nargs="+", default=["09:15-09:45"], help="HH:MM-HH:MM windows, sampled per query")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--metric", default="cosine", choices=["cosine", "zeuclidean", "dtw"])
+    parser.add_argument("--symbols", nargs="*", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    windows = []
+    for window in args.windows:
+        start_str, end_str = window.split("-")
+        windows.append((dt.datetime.strptime(start_str, "%H:%M").time(), dt.datetime.strptime(end_str, "%H:%M").time()))
+    symbols = sorted(s.upper() for s in (args.symbols or list_available_symbols()))
+    rng = np.random.default_rng(args.seed)
+
+    # Sampled up front so the replayed workload does not depend on the results
+    day_dates = {symbol: get_day_row_index(symbol).dates for symbol in symbols}
+    symbols = [symbol for symbol in symbols if len(day_dates[symbol])]
+    if not symbols:
+        print("No historical data to replay.")
+        return
+    queries = []
+    for _ in range(args.queries):
+        symbol = symbols[rng.integers(len(symbols))]
+        query_day = day_dates[symbol][rng.integers(len(day_dates[symbol]))]
+        queries.append((symbol, query_day, windows[rng.integers(len(windows))]))
+
+    # Warm-up: first use of a symbol loads its history and builds its indexes
+    with contextlib.redirect_stdout(io.StringIO()):
+        for symbol in symbols:
+            try:
+                pattern_matcher.find_similar_historical_patterns(
+                    symbol, windows[0][0], windows[0][1], args.threshold, args.k,
+                    query_date_override=day_dates[symbol][0], metric=args.metric, query_source="local"
+                )
+            except ValueError:
+                pass
+
+    latencies, skipped, matches = [], 0, 0
+    digest = hashlib.sha1()
+    started = time.perf_counter()
+    for symbol, query_day, (start_time, end_time) in queries:
+        query_started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()): # The matcher prints per-query timings
+                results = pattern_matcher.find_similar_historical_patterns(
+                    symbol, start_time, end_time, args.threshold, args.k,
+                    query_date_override=query_day, metric=args.metric, query_source="local"
+                )
+        except ValueError: # No bars in the window that day
+            skipped += 1
+            continue
+        latencies.append(time.perf_counter() - query_started)
+        matches += len(results)
+        digest.update(f"{symbol} {query_day} {start_time}-{end_time}:".encode())
+        digest.update(";".join(f"{r['date']}={r['similarity_score']:.6f}" for r in results).encode())
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print(f"All {len(queries)} queries skipped (no bars in the windows).")
+        return
+    latencies_ms = np.array(latencies) * 1000
+    print(f"{len(latencies)} queries replayed ({skipped} skipped) over {len(symbols)} symbols, "
+          f"metric={args.metric}, k={args.k}, threshold={args.threshold}: {matches} matches")
+    print(f"throughput : {len(latencies) / elapsed:.1f} queries/s")
+    print(f"latency    : p50={np.percentile(latencies_ms, 50):.2f}ms p95={np.percentile(latencies_ms, 95):.2f}ms "
+          f"p99={np.percentile(latencies_ms, 99):.2f}ms max={latencies_ms.max():.2f}ms")
+    print(f"digest     : {digest.hexdigest()} (equal across runs with the same data, seed and arguments)")
+
+
+if __name__ == "__main__":
+    main()
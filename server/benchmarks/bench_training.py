@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_training.py
+# Wall time per training epoch of the forecast LSTM with each training loop: "dataloader" (StockWindowDataset
+# batches through a shuffled torch DataLoader) and "tensor" (one contiguous tensor, batches sliced from a
+# permuted copy). Trains on synthetic features shaped like prepare_prediction_features output (no network),
+# with the default model size unless overridden, and reports the median epoch time and final loss per loop.
+# Run from the backend root:  python -m benchmarks.bench_training --rows 700 --epochs 20 --threads 1 4
+import argparse
+import contextlib
+import io
+import statistics
+import time
+import numpy as np
+import pandas as pd
+import torch
+
+from app.config import settings
+from app.core_logic.prediction.stock_predictor import StockPredictorPrototype
+
+FEATURE_COLUMNS = [
+    'Returns', 'log_volume', 'sentiment_score_mean', 'sentiment_strength',
+    'sentiment_ma_5d', 'sentiment_std_5d', 'RSI', 'MACD', 'Volatility', 'price_momentum_5d',
+    'SMA_20', 'SMA_50'
+]
+
+
+def synthetic_features(rows: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    features_df = pd.DataFrame(rng.normal(size=(rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS,
+                               index=pd.bdate_range("2020-01-01", periods=rows))
+    features_df['target'] = rng.integers(0, 2, size=rows)
+    return features_df
+
+
+def time_training(features_df: pd.DataFrame, engine: str, args) -> tuple:
+    """(epoch wall times in seconds, final loss) of one training run."""
+    torch.manual_seed(args.seed)
+    epoch_times = []
+    last_epoch_end = [0.0]
+
+    def on_epoch(epoch: int, epochs: int, loss: float):
+        now = time.perf_counter()
+        epoch_times.append(now - last_epoch_end[0])
+        last_epoch_end[0] = now
+
+    predictor = StockPredictorPrototype()
+    with contextlib.redirect_stdout(io.StringIO()):
+        last_epoch_end[0] = time.perf_counter()
+        predictor.train(
+            features_df, epochs=args.epochs, batch_size=args.batch_size, sequence_length=args.sequence_length,
+            learning_rate=settings.DEFAULT_PREDICTION_LR, hidden_size=args.hidden_size, num_layers=args.num_layers,
+            progress_callback=on_epoch, early_stopping_patience=0, engine=engine
+        )
+    return epoch_times[1:] or epoch_times, predictor.final_loss # The first epoch includes setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-epoch training time of the DataLoader and tensor loops.")
+    parser.add_argument("--rows", type=int, default=700, help="Days of features (sequences = rows - sequence length)")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=settings.DEFAULT_LSTM_BATCH_SIZE)
+    parser.add_argument("--sequence-length", type=int, default=settings.DEFAULT_LSTM_SEQUENCE_LENGTH)
+    parser.add_argument("--hidden-size", type=int, default=settings.DEFAULT_LSTM_HIDDEN_SIZE)
+    parser.add_argument("--num-layers", type=int, default=settings.DEFAULT_LSTM_NUM_LAYERS)
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="Intra-op thread counts to try (0: torch default)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    features_df = synthetic_features(args.rows, args.seed)
+    print(f"{args.rows - args.sequence_length} sequences of {args.sequence_length}x{len(FEATURE_COLUMNS)}, batch {args.batch_size}, "
+          f"hidden {args.hidden_size}x{args.num_layers}, {args.epochs} epochs")
+    default_threads = torch.get_num_threads()
+    for threads in args.threads:
+        torch.set_num_threads(threads or default_threads)
+        medians = {}
+        for engine in ("dataloader", "tensor"):
+            epoch_times, final_loss = time_training(features_df, engine, args)
+            medians[engine] = statistics.median(epoch_times)
+            print(f"threads={torch.get_num_threads():<3d} {engine:<10s} median epoch {medians[engine] * 1000:8.1f} ms  "
+                  f"(min {min(epoch_times) * 1000:.1f} ms)  final loss {final_loss:.4f}")
+        print(f"threads={torch.get_num_threads():<3d} speedup {medians['dataloader'] / medians['tensor']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+# backend/tests/conftest.py
+# Settings without defaults, so the app modules import without a .env (the tests need no database or APIs)
+import os
+
+for name, value in {
+    "PROJECT_NAME": "stocker-tests",
+    "FRONTEND_URL": "http://localhost:5173",
+    "DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REDDIT_CLIENT_ID": "test",
+    "REDDIT_CLIENT_SECRET": "test",
+    "REDDIT_USER_AGENT": "test",
+}.items():
+    os.environ.setdefault(name, value)
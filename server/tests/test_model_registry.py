@@ -0,0 +1,106 @@
+# backend/tests/test_model_registry.py
+# CPU round trip of the forecast model registry in a temporary directory
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from sklearn.preprocessing import RobustScaler
+
+from app.config import settings
+from app.core_logic.models.sentiment_lstm import SentimentLSTM
+from app.core_logic.prediction import model_registry
+from app.core_logic.prediction.stock_predictor import StockPredictorPrototype
+
+FEATURE_COLUMNS = ["close", "volume", "sentiment"]
+HYPERPARAMETERS = {"epochs": 2, "batch_size": 8, "sequence_length": 5, "learning_rate": 0.001,
+                   "hidden_size": 8, "num_layers": 1, "sources": ["news", "reddit"]}
+
+
+@pytest.fixture(autouse=True)
+def registry_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_REGISTRY_PATH", str(tmp_path / "registry"))
+    monkeypatch.setattr(settings, "MODEL_REGISTRY_KEEP_VERSIONS", 2)
+    monkeypatch.setattr(settings, "MODEL_MAX_AGE_DAYS", 7)
+    return tmp_path / "registry"
+
+
+def _features(rows: int = 30, seed: int = 0) -> pd.DataFrame:
+    return pd.DataFrame(np.random.default_rng(seed).normal(size=(rows, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+
+
+def _predictor(seed: int = 0) -> StockPredictorPrototype:
+    torch.manual_seed(seed)
+    predictor = StockPredictorPrototype()
+    predictor.device = torch.device("cpu")
+    predictor.trained_feature_columns = list(FEATURE_COLUMNS)
+    predictor.input_feature_size = len(FEATURE_COLUMNS)
+    predictor.sequence_length = HYPERPARAMETERS["sequence_length"]
+    predictor.model = SentimentLSTM(input_size=len(FEATURE_COLUMNS), hidden_size=HYPERPARAMETERS["hidden_size"], num_layers=HYPERPARAMETERS["num_layers"])
+    predictor.model.eval()
+    predictor.scaler = RobustScaler().fit(_features(seed=seed))
+    predictor.final_loss = 0.5
+    return predictor
+
+
+def _save(predictor=None, data_end=dt.date(2024, 3, 1), **kwargs):
+    return model_registry.save_model("gland", predictor or _predictor(), HYPERPARAMETERS, dt.date(2023, 1, 2), data_end, **kwargs)
+
+
+def test_save_and_load_round_trip():
+    predictor = _predictor()
+    meta = _save(predictor)
+    loaded = model_registry.load_latest("GLAND", HYPERPARAMETERS, FEATURE_COLUMNS)
+    assert loaded is not None
+    loaded_predictor, loaded_meta = loaded
+    assert loaded_meta == meta and meta["symbol"] == "GLAND" and meta["training_mode"] == "full"
+    for key, value in predictor.model.state_dict().items():
+        assert torch.equal(value, loaded_predictor.model.state_dict()[key])
+    features = _features(seed=1)
+    assert loaded_predictor.predict_next_step(features) == pytest.approx(predictor.predict_next_step(features))
+    assert model_registry.list_models("gland") == [meta]
+
+
+def test_load_matches_config_key_and_feature_columns():
+    _save()
+    # Source order does not change the features, so it does not change the key
+    assert model_registry.load_latest("GLAND", dict(HYPERPARAMETERS, sources=["reddit", "news"])) is not None
+    assert model_registry.load_latest("GLAND", dict(HYPERPARAMETERS, hidden_size=16)) is None
+    assert model_registry.load_latest("GLAND", HYPERPARAMETERS, FEATURE_COLUMNS[::-1]) is None
+    assert model_registry.load_latest("OTHER", HYPERPARAMETERS) is None
+
+
+def test_newest_version_wins_and_old_versions_are_pruned(registry_dir):
+    first = _save(data_end=dt.date(2024, 3, 1))
+    second = _save(_predictor(seed=1), data_end=dt.date(2024, 3, 4), fine_tuned_from=first)
+    third = _save(_predictor(seed=2), data_end=dt.date(2024, 3, 5), fine_tuned_from=second)
+    _, meta = model_registry.load_latest("GLAND", HYPERPARAMETERS)
+    assert meta == third and meta["training_mode"] == "fine_tune"
+    assert meta["fine_tuned_from"] == second["version"] and meta["fine_tune_chain"] == 2
+    assert [m["version"] for m in model_registry.list_models("GLAND")] == [third["version"], second["version"]]
+    assert not any(p.name.endswith(".tmp") for p in registry_dir.rglob("*"))
+
+
+def test_damaged_version_falls_back_to_the_previous_one(registry_dir):
+    first = _save()
+    second = _save(_predictor(seed=1), data_end=dt.date(2024, 3, 4))
+    (registry_dir / "GLAND" / second["config_key"] / second["version"] / "model.pt").write_bytes(b"not a model")
+    _, meta = model_registry.load_latest("GLAND", HYPERPARAMETERS)
+    assert meta == first
+
+
+def test_new_data_staleness_and_checks():
+    meta = _save(data_end=dt.date(2024, 3, 1))
+    assert not model_registry.has_new_data(meta, dt.date(2024, 3, 1))
+    assert model_registry.has_new_data(meta, dt.date(2024, 3, 4))
+    assert not model_registry.is_stale(meta, dt.date(2024, 3, 8))
+    assert model_registry.is_stale(meta, dt.date(2024, 3, 9))
+
+    checked = model_registry.mark_checked(meta, dt.date(2024, 3, 4))
+    assert not model_registry.has_new_data(checked, dt.date(2024, 3, 4))
+    assert model_registry.has_new_data(checked, dt.date(2024, 3, 5))
+    _, stored = model_registry.load_latest("GLAND", HYPERPARAMETERS)
+    assert stored["last_checked"] == "2024-03-04" and stored["data_end"] == "2024-03-01"
@@ -0,0 +1,89 @@
+# backend/tests/test_training_engine.py
+# CPU checks of StockPredictorPrototype's training loops (run from the backend root: python -m pytest tests)
+import numpy as np
+import pandas as pd
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from app.config import settings
+from app.core_logic.models.sentiment_lstm import SentimentLSTM
+from app.core_logic.models.stock_dataset import StockWindowDataset
+from app.core_logic.prediction import feature_engineering
+from app.core_logic.prediction.stock_predictor import StockPredictorPrototype
+
+SEQUENCE_LENGTH = 5
+NUM_FEATURES = 4
+
+
+def _dataset(rows: int = 60, seed: int = 0) -> StockWindowDataset:
+    rng = np.random.default_rng(seed)
+    return StockWindowDataset(rng.normal(size=(rows, NUM_FEATURES)), rng.integers(0, 2, size=rows), SEQUENCE_LENGTH)
+
+
+def _predictor(seed: int = 0) -> StockPredictorPrototype:
+    # No dropout, so a step depends only on the weights and the batch
+    torch.manual_seed(seed)
+    predictor = StockPredictorPrototype()
+    predictor.device = torch.device("cpu")
+    predictor.model = SentimentLSTM(input_size=NUM_FEATURES, hidden_size=8, num_layers=1, dropout=0.0)
+    return predictor
+
+
+def test_window_dataset_matches_materialized_sequences():
+    dataset = _dataset()
+    X_seq, y_seq = feature_engineering.create_lstm_sequences(pd.DataFrame(dataset.rows.numpy()), dataset.row_targets.numpy(), SEQUENCE_LENGTH)
+    X_all, y_all = dataset.tensors()
+    assert len(dataset) == len(X_seq)
+    assert np.array_equal(X_all.numpy(), X_seq) and np.array_equal(y_all.numpy(), y_seq)
+    X_item, y_item = dataset[7]
+    assert np.array_equal(X_item.numpy(), X_seq[7]) and y_item.item() == y_seq[7]
+
+
+def test_tensor_and_loader_epochs_are_equivalent():
+    # One batch holding every sequence: the shuffle order cannot change the step, so both loops must agree
+    dataset = _dataset()
+    results = {}
+    for engine in ("tensor", "dataloader"):
+        predictor = _predictor()
+        predictor._fit(dataset, epochs=3, batch_size=len(dataset), learning_rate=0.01, engine=engine)
+        results[engine] = (predictor.final_loss, [p.detach().clone() for p in predictor.model.parameters()])
+    (tensor_loss, tensor_params), (loader_loss, loader_params) = results["tensor"], results["dataloader"]
+    assert tensor_loss == pytest.approx(loader_loss, rel=1e-5)
+    for tensor_param, loader_param in zip(tensor_params, loader_params):
+        assert torch.allclose(tensor_param, loader_param, atol=1e-6)
+
+
+def test_tensor_epoch_returns_summed_loss_over_every_sequence():
+    dataset = _dataset()
+    predictor = _predictor()
+    X_train, y_train = dataset.tensors()
+    criterion = torch.nn.BCELoss()
+    optimizer = torch.optim.SGD(predictor.model.parameters(), lr=0.0) # Weights fixed, so batching and order do not matter
+    with torch.no_grad():
+        expected = criterion(predictor.model(X_train), y_train.unsqueeze(1)).item() * len(X_train)
+    assert predictor._tensor_epoch(X_train, y_train, 7, criterion, optimizer) == pytest.approx(expected, rel=1e-5)
+
+
+def test_early_stopping_stops_after_patience_and_keeps_best_epoch(monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_PREDICTION_TEST_SIZE", 0.2)
+    predictor = _predictor()
+    epoch_losses = []
+    # With a zero learning rate the held-out loss never improves after the first epoch
+    predictor._fit(_dataset(rows=80), epochs=20, batch_size=16, learning_rate=0.0,
+                   progress_callback=lambda epoch, epochs, loss: epoch_losses.append(loss), early_stopping_patience=2)
+    assert len(epoch_losses) == 3 # The best epoch and `patience` epochs without improvement
+    assert predictor.final_loss == epoch_losses[0]
+
+
+def test_early_stopping_holds_out_the_most_recent_sequences(monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_PREDICTION_TEST_SIZE", 0.25)
+    subsets = []
+    original_subset = StockWindowDataset.subset
+    def recording_subset(self, starts):
+        subsets.append(list(starts))
+        return original_subset(self, starts)
+    monkeypatch.setattr(StockWindowDataset, "subset", recording_subset)
+    _predictor()._fit(_dataset(rows=45), epochs=1, batch_size=8, learning_rate=0.01, early_stopping_patience=1) # 40 sequences
+    validation_starts, train_starts = subsets
+    assert train_starts == list(range(30)) and validation_starts == list(range(30, 40))